@@ -0,0 +1,97 @@
+# MIT License
+
+# Copyright (c) 2021 PowerAPI
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Benchmark of the debug logging cost on the VirtualWatts formula hot path
+
+The formula actor is driven directly, without actor system, with a procfs
+report that contains hundreds of targets. The same workload is run twice
+with the root logger level set to WARNING :
+ - eager : the actor build every debug string, as it did before the log level
+           was checked at initialization
+ - lazy  : the actor skip the debug strings as it check the log level once
+
+usage : python -m benchmarks.bench_debug_logging [targets] [pairs]
+"""
+
+import datetime
+import logging
+import sys
+import timeit
+
+from powerapi.report import PowerReport, ProcfsReport
+
+from virtualwatts.context import VirtualWattsFormulaConfig
+
+from benchmarks.common import start_formula
+
+
+def gen_pairs(targets, pairs):
+    """
+    Generate pairs of power and procfs report with the given number of targets
+    """
+    start = datetime.datetime(2021, 9, 14)
+    usage = {'cgroup_' + str(i): 0.1 + i % 10 for i in range(targets)}
+    global_cpu_usage = sum(usage.values()) * 1.1
+    for i in range(pairs):
+        timestamp = start + datetime.timedelta(milliseconds=500 * i)
+        yield (PowerReport(timestamp, 'bench', 'all', 42, {}),
+               ProcfsReport(timestamp, 'bench', 'all', usage,
+                            global_cpu_usage))
+
+
+def run(targets, pairs, eager_debug):
+    """
+    :return: the time spent (in seconds) to process the pairs
+    """
+    config = VirtualWattsFormulaConfig(500, datetime.timedelta(milliseconds=250))
+    formula, _ = start_formula(config)
+    formula.debug = eager_debug
+    reports = list(gen_pairs(targets, pairs))
+
+    def process():
+        for power_report, procfs_report in reports:
+            formula.receiveMsg_ProcfsReport(procfs_report, None)
+            formula.receiveMsg_PowerReport(power_report, None)
+
+    return timeit.timeit(process, number=1)
+
+
+def main():
+    """
+    Run the benchmark and print the per-report cost of both logging modes
+    """
+    targets = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    pairs = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    logging.getLogger().setLevel(logging.WARNING)
+
+    eager = run(targets, pairs, True)
+    lazy = run(targets, pairs, False)
+    emitted = targets * pairs
+    print('targets: %d, pairs: %d' % (targets, pairs))
+    print('eager debug strings : %.3f us/report' % (eager / emitted * 1e6))
+    print('lazy debug strings  : %.3f us/report' % (lazy / emitted * 1e6))
+    print('saving              : %.1f %%' % ((1 - lazy / eager) * 100))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,255 @@
+# MIT License
+
+# Copyright (c) 2021 PowerAPI
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Micro-benchmark suite of the VirtualWatts formula pipeline
+
+The formula actor is driven directly, without actor system, with synthetic
+timelines generated by virtualwatts.test_utils.reports. Reports are fed in
+timestamp order, so the timestamp of a report is also its arrival time.
+Each case measures :
+ - reports_per_s : input reports processed per second
+ - attributions_per_s : target powers computed per second
+ - pair_wait_ms_p50/p99 : time the first report of a pair waited in the sync
+ - processing_us_p50/p99 : time to attribute and send a pair once formed
+ - peak_memory_mb : peak memory allocated while processing the timeline
+
+The attribution engines are also measured alone. Results are written as
+JSON lines. With --compare, the throughput of each case is compared to a
+previous result file and the command fails if it regressed.
+
+usage : python -m benchmarks.bench_formula [--targets 10,100,1000,10000]
+            [--intervals 500] [--jitters 0,0.5,1.5] [--pushers 1,4]
+            [--reports 200000] [--output results.jsonl]
+            [--compare baseline.jsonl] [--tolerance 0.2]
+"""
+
+import argparse
+import datetime
+import itertools
+import json
+import sys
+import time
+import timeit
+import tracemalloc
+
+from powerapi.report import PowerReport, ProcfsReport
+
+from virtualwatts.attribution import get_attribution_engine, numpy
+from virtualwatts.context import VirtualWattsFormulaConfig
+from virtualwatts.test_utils.reports import VirtualWattsTimeline
+
+from benchmarks.common import start_formula
+
+DELAY_MS = 250
+CASE_KEYS = ('benchmark', 'engine', 'targets', 'interval_ms', 'jitter_ms', 'pushers')
+
+
+def percentile(values, ratio):
+    """
+    :return: The value at the given ratio of the sorted values
+    """
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(ratio * len(values)))]
+
+
+def gen_reports(targets, ticks, interval, jitter):
+    """
+    :return: The power and procfs reports of a synthetic timeline, sorted by
+             timestamp
+    """
+    timeline = VirtualWattsTimeline(targets, duration=ticks * interval / 1000, interval=interval, jitter=jitter)
+    return [PowerReport.from_json(data) if 'power' in data else ProcfsReport.from_json(data)
+            for data in timeline.reports()]
+
+
+def feed(formula, reports, pair_waits=None, processing=None):
+    """
+    Send the reports to the formula and record the pairing latencies
+    """
+    sync = formula.sync
+    request = sync.request
+
+    def recording_request():
+        pair = request()
+        if pair is not None and pair_waits is not None:
+            pair_waits.append(abs(pair[0].timestamp - pair[1].timestamp) / datetime.timedelta(milliseconds=1))
+        return pair
+
+    sync.request = recording_request
+    for report in reports:
+        pairs = sync.pairs
+        start = time.perf_counter()
+        if isinstance(report, PowerReport):
+            formula.receiveMsg_PowerReport(report, None)
+        else:
+            formula.receiveMsg_ProcfsReport(report, None)
+        if processing is not None and sync.pairs != pairs:
+            processing.append((time.perf_counter() - start) * 1e6)
+
+
+def bench_formula(targets, interval, jitter_ratio, pushers, ticks):
+    """
+    :return: The result of one formula benchmark case
+    """
+    jitter = jitter_ratio * DELAY_MS
+    reports = gen_reports(targets, ticks, interval, jitter)
+    config = VirtualWattsFormulaConfig(interval, datetime.timedelta(milliseconds=DELAY_MS))
+
+    formula, sender = start_formula(config, pushers)
+    pair_waits = []
+    processing = []
+    start = time.perf_counter()
+    feed(formula, reports, pair_waits, processing)
+    duration = time.perf_counter() - start
+    statistics = formula.sync.statistics()
+
+    formula, _ = start_formula(config, pushers)
+    tracemalloc.start()
+    feed(formula, reports)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'benchmark': 'formula',
+        'engine': config.attribution_engine,
+        'targets': targets,
+        'interval_ms': interval,
+        'jitter_ms': jitter,
+        'delay_ms': DELAY_MS,
+        'pushers': pushers,
+        'ticks': ticks,
+        'pairs': statistics['pairs'],
+        'sent_messages': sender.messages,
+        'unpaired': statistics['power']['unpaired'] + statistics['procfs']['unpaired'],
+        'evicted': statistics['power']['evicted'] + statistics['procfs']['evicted'],
+        'reports_per_s': len(reports) / duration,
+        'attributions_per_s': statistics['pairs'] * targets / duration,
+        'pair_wait_ms_p50': percentile(pair_waits, 0.5),
+        'pair_wait_ms_p99': percentile(pair_waits, 0.99),
+        'processing_us_p50': percentile(processing, 0.5),
+        'processing_us_p99': percentile(processing, 0.99),
+        'peak_memory_mb': peak / 2 ** 20,
+    }
+
+
+def bench_attribution(engine_name, targets, ticks):
+    """
+    :return: The result of one attribution engine benchmark case
+    """
+    engine = get_attribution_engine(engine_name)
+    timeline = VirtualWattsTimeline(targets, duration=8)
+    pairs = [(42, data['usage'], data['global_cpu_usage']) for data in timeline.procfs_reports()]
+    number = max(1, ticks // len(pairs))
+    duration = timeit.timeit(lambda: engine.attribute_many(pairs), number=number)
+    return {
+        'benchmark': 'attribution',
+        'engine': engine_name,
+        'targets': targets,
+        'interval_ms': None,
+        'jitter_ms': None,
+        'pushers': None,
+        'ticks': number * len(pairs),
+        'attributions_per_s': number * len(pairs) * targets / duration,
+    }
+
+
+def compare(results, baseline_file, tolerance):
+    """
+    Compare the throughput of the results with the baseline ones
+    :return: The descriptions of the regressions
+    """
+    def key(result):
+        return tuple(result.get(name) for name in CASE_KEYS)
+
+    with open(baseline_file) as baseline:
+        baseline_results = {key(result): result for result in map(json.loads, baseline)}
+
+    regressions = []
+    for result in results:
+        reference = baseline_results.get(key(result))
+        if reference is None:
+            continue
+        for metric in ('reports_per_s', 'attributions_per_s'):
+            if metric in result and result[metric] < reference[metric] * (1 - tolerance):
+                regressions.append('%s %s : %.0f -> %.0f' % (dict(zip(CASE_KEYS, key(result))), metric,
+                                                             reference[metric], result[metric]))
+    return regressions
+
+
+def int_list(value):
+    """
+    :return: The list of int given as a comma separated string
+    """
+    return [int(item) for item in value.split(',')]
+
+
+def float_list(value):
+    """
+    :return: The list of float given as a comma separated string
+    """
+    return [float(item) for item in value.split(',')]
+
+
+def main():
+    """
+    Run every benchmark case and write the results
+    """
+    parser = argparse.ArgumentParser(description='VirtualWatts formula micro-benchmarks')
+    parser.add_argument('--targets', type=int_list, default=[10, 100, 1000, 10000])
+    parser.add_argument('--intervals', type=int_list, default=[500])
+    parser.add_argument('--jitters', type=float_list, default=[0, 0.5, 1.5],
+                        help='jitter of the timestamps, relative to the delay threshold')
+    parser.add_argument('--pushers', type=int_list, default=[1, 4])
+    parser.add_argument('--reports', type=int, default=200000,
+                        help='number of target usages processed by each case')
+    parser.add_argument('--output', help='file where the results are written (default : stdout)')
+    parser.add_argument('--compare', help='result file of a previous run')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    args = parser.parse_args()
+
+    engines = ['python'] + (['numpy'] if numpy is not None else [])
+    results = []
+    for targets, interval, jitter, pushers in itertools.product(args.targets, args.intervals, args.jitters, args.pushers):
+        ticks = max(10, args.reports // targets)
+        results.append(bench_formula(targets, interval, jitter, pushers, ticks))
+    for engine, targets in itertools.product(engines, args.targets):
+        results.append(bench_attribution(engine, targets, max(10, args.reports // targets)))
+
+    output = open(args.output, 'w') if args.output else sys.stdout
+    for result in results:
+        output.write(json.dumps(result) + '\n')
+    if args.output:
+        output.close()
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.tolerance)
+        for regression in regressions:
+            print('regression : ' + regression, file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
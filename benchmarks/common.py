@@ -0,0 +1,61 @@
+# MIT License
+
+# Copyright (c) 2021 PowerAPI
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Helpers shared by the VirtualWatts benchmarks
+"""
+
+from powerapi.formula import CpuDramDomainValues
+from powerapi.message import FormulaStartMessage
+
+from virtualwatts.actor import (VirtualWattsFormulaActor,
+                                VirtualWattsFormulaValues)
+
+
+class CountingSender:
+    """
+    Replace the send method of an actor and count the sent messages
+    """
+
+    def __init__(self):
+        self.messages = 0
+
+    def __call__(self, _, __):
+        self.messages += 1
+
+
+def start_formula(config, pushers=1):
+    """
+    Create and initialize a formula actor outside any actor system.
+    Messages sent by the formula are counted and dropped.
+    :return: The formula and its CountingSender
+    """
+    formula = VirtualWattsFormulaActor()
+    sender = CountingSender()
+    formula.send = sender
+    formula.wakeupAfter = lambda *_: None
+    values = VirtualWattsFormulaValues({'pusher_' + str(i): 'pusher_' + str(i) for i in range(pushers)},
+                                       config)
+    start_message = FormulaStartMessage('system', 'bench_formula', values,
+                                        CpuDramDomainValues('bench', ('bench_sensor', 0, 0)))
+    formula._initialization(start_message)
+    return formula, sender
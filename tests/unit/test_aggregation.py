@@ -0,0 +1,99 @@
+# MIT License
+
+# Copyright (c) 2021 PowerAPI
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import datetime
+
+import pytest
+
+from virtualwatts.aggregation import EnergyAggregator
+
+
+def ts(seconds):
+    return datetime.datetime(2021, 1, 1) + datetime.timedelta(seconds=seconds)
+
+
+@pytest.fixture
+def aggregator():
+    return EnergyAggregator(datetime.timedelta(seconds=10), datetime.timedelta(milliseconds=500))
+
+
+def test_add_estimations_of_the_same_window_return_nothing(aggregator):
+    for i in range(20):
+        assert aggregator.add(ts(i * 0.5), {'t1': 10}) is None
+
+
+def test_add_estimation_of_next_window_return_energy_and_mean_power_of_previous_one(aggregator):
+    for i in range(20):
+        aggregator.add(ts(i * 0.5), {'t1': 10, 't2': 4 if i % 2 else 0})
+
+    window = aggregator.add(ts(10), {'t1': 1})
+
+    assert window.start == ts(0)
+    assert window.samples == 20
+    assert window.energy == pytest.approx({'t1': 100, 't2': 20})
+    assert window.powers() == pytest.approx({'t1': 10, 't2': 2})
+    assert window.metadata()['t1'] == {'energy': pytest.approx(100), 'window': 10.0, 'samples': 20}
+
+
+def test_windows_are_aligned_on_the_epoch(aggregator):
+    aggregator.add(ts(7.5), {'t1': 10})
+
+    window = aggregator.add(ts(12), {'t1': 10})
+
+    assert window.start == ts(0)
+    assert aggregator.current.start == ts(10)
+
+
+def test_late_estimation_is_added_to_current_window(aggregator):
+    aggregator.add(ts(10), {'t1': 10})
+
+    assert aggregator.add(ts(9.5), {'t1': 10}) is None
+    assert aggregator.current.energy == pytest.approx({'t1': 10})
+
+
+def test_flush_return_unfinished_window_and_forget_it(aggregator):
+    aggregator.add(ts(1), {'t1': 10})
+
+    window = aggregator.flush()
+
+    assert window.samples == 1
+    assert aggregator.flush() is None
+
+
+def test_missing_estimation_is_integrated_over_the_actual_gap(aggregator):
+    for i in range(20):
+        if i != 5:
+            aggregator.add(ts(i * 0.5), {'t1': 10 if i < 5 else 20})
+
+    window = aggregator.add(ts(10), {'t1': 1})
+
+    assert window.samples == 19
+    assert window.energy == pytest.approx({'t1': 2.5 * 10 + 7.5 * 20})
+    assert window.powers() == pytest.approx({'t1': 17.5})
+
+
+def test_gap_covered_by_an_estimation_is_capped(aggregator):
+    aggregator.add(ts(0), {'t1': 10})
+    aggregator.add(ts(9), {'t1': 10})
+
+    assert aggregator.current.covered == pytest.approx(0.5 + 3 * 0.5)
+    assert aggregator.current.energy == pytest.approx({'t1': 20})
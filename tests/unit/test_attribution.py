@@ -0,0 +1,89 @@
+# MIT License
+
+# Copyright (c) 2021 PowerAPI
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import datetime
+
+import pytest
+
+from powerapi.report import ProcfsReport
+
+from virtualwatts.attribution import (PythonAttributionEngine, NumpyAttributionEngine, UnknownAttributionEngine,
+                                      get_attribution_engine, numpy, report_cpu_usage)
+from virtualwatts.dispatch_rule import split_procfs_report
+
+
+ENGINES = ['python', pytest.param('numpy', marks=pytest.mark.skipif(numpy is None, reason='numpy is not installed'))]
+
+
+@pytest.fixture(params=ENGINES)
+def engine(request):
+    return get_attribution_engine(request.param)
+
+
+def test_attribute_split_power_proportionally_to_global_cpu_usage(engine):
+    powers = engine.attribute(100, {'t1': 0.7, 't2': 0.3}, 2)
+    assert powers == pytest.approx({'t1': 35, 't2': 15})
+
+
+def test_attribute_with_null_global_cpu_usage_use_targets_usage(engine):
+    powers = engine.attribute(100, {'t1': 3, 't2': 1}, 0)
+    assert powers == pytest.approx({'t1': 75, 't2': 25})
+
+
+def test_attribute_with_missing_global_cpu_usage_use_targets_usage(engine):
+    powers = engine.attribute(100, {'t1': 3, 't2': 1}, None)
+    assert powers == pytest.approx({'t1': 75, 't2': 25})
+
+
+def test_attribute_without_any_cpu_usage_attribute_no_power(engine):
+    assert engine.attribute(100, {'t1': 0, 't2': 0}, 0) == {'t1': 0, 't2': 0}
+
+
+def test_attribute_shards_with_null_global_cpu_usage_split_the_power_once(engine):
+    usage = {'cgroup_' + str(i): i + 1 for i in range(20)}
+    report = ProcfsReport(datetime.datetime(1970, 1, 1), 'sensor', 'all', usage, 0)
+
+    shards = split_procfs_report(report, 4)
+    powers = [engine.attribute(100, shard.usage, report_cpu_usage(shard)) for shard in shards]
+
+    assert sum(sum(shard_powers.values()) for shard_powers in powers) == pytest.approx(100)
+    assert report_cpu_usage(report) == 0
+
+
+def test_attribute_many_return_powers_of_each_pair_in_order(engine):
+    pairs = [(100, {'t1': 0.5}, 1), (42, {}, 1), (10, {'t1': 1, 't2': 4}, 10)]
+    assert engine.attribute_many(pairs) == [pytest.approx({'t1': 50}), {}, pytest.approx({'t1': 1, 't2': 4})]
+
+
+def test_attribute_many_without_pair_return_empty_list(engine):
+    assert engine.attribute_many([]) == []
+
+
+def test_get_attribution_engine_return_engine_with_given_name():
+    assert isinstance(get_attribution_engine('python'), PythonAttributionEngine)
+    if numpy is not None:
+        assert isinstance(get_attribution_engine('numpy'), NumpyAttributionEngine)
+
+
+def test_get_unknown_attribution_engine_raise_UnknownAttributionEngine():
+    with pytest.raises(UnknownAttributionEngine):
+        get_attribution_engine('fortran')
@@ -0,0 +1,61 @@
+# MIT License
+
+# Copyright (c) 2021 PowerAPI
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import pytest
+
+from virtualwatts.balance import IDLE_TARGET, UNATTRIBUTED_TARGET, EnergyBalance, StaticPowerEstimator
+
+
+def test_estimate_without_enough_samples_return_none():
+    estimator = StaticPowerEstimator()
+    estimator.update(0.5, 70)
+
+    assert estimator.estimate() is None
+
+
+def test_estimate_return_intercept_of_power_against_usage():
+    estimator = StaticPowerEstimator()
+    for i in range(100):
+        usage = (i % 10) / 10
+        estimator.update(usage, 20 + 100 * usage)
+
+    assert estimator.estimate() == pytest.approx(20)
+
+
+def test_balance_send_power_not_attributed_as_unattributed():
+    powers = EnergyBalance().balance(100, {'t1': 6, 't2': 2}, 10, {'t1': 60, 't2': 20})
+
+    assert powers == pytest.approx({'t1': 60, 't2': 20, UNATTRIBUTED_TARGET: 20})
+
+
+def test_balance_with_idle_baseline_split_only_dynamic_power_between_targets():
+    balance = EnergyBalance(idle_baseline=True)
+    for i in range(100):
+        usage = (i % 10) / 10
+        power = 20 + 100 * usage
+        powers = balance.balance(power, {'t1': usage * 5, 't2': usage * 5}, usage * 10,
+                                 {'t1': power / 2, 't2': power / 2})
+
+    assert powers[IDLE_TARGET] == pytest.approx(20)
+    assert powers['t1'] == pytest.approx(powers['t2'])
+    assert powers[UNATTRIBUTED_TARGET] == pytest.approx(0, abs=1e-6)
+    assert sum(powers.values()) == pytest.approx(power)
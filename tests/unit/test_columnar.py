@@ -0,0 +1,128 @@
+# MIT License
+
+# Copyright (c) 2021 PowerAPI
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import datetime
+import io
+import math
+
+import pytest
+
+from powerapi.report import PowerReport
+
+from virtualwatts.columnar import (ColumnarWriter, ColumnarDB, ColumnarFormatError, iter_row_groups, read_columnar,
+                                   MAGIC)
+
+
+def reports(tick, targets, sensor='virtualwatts'):
+    timestamp = datetime.datetime(2021, 9, 14) + datetime.timedelta(milliseconds=500 * tick)
+    return [PowerReport(timestamp, sensor, target, 10.0 * tick + i, {}) for i, target in enumerate(targets)]
+
+
+def write(tmp_path, groups, **kwargs):
+    filename = str(tmp_path / 'output.vwc')
+    with open(filename, 'wb') as output:
+        writer = ColumnarWriter(output, **kwargs)
+        for group in groups:
+            writer.write(group)
+        writer.close()
+    return filename
+
+
+def test_read_columnar_return_the_written_reports(tmp_path):
+    written = reports(0, ['t1', 't2']) + reports(1, ['t2', 't3'], 'other')
+    written[0].metadata = {'energy': 5.0}
+
+    read = list(read_columnar(write(tmp_path, [written])))
+
+    assert [(r.timestamp, r.sensor, r.target, r.power) for r in read] == \
+        [(r.timestamp, r.sensor, r.target, r.power) for r in written]
+    assert read[0].metadata == {'energy': 5.0}
+    assert read[1].metadata == {}
+
+
+def test_row_group_only_store_names_unknown_to_the_previous_ones(tmp_path):
+    filename = write(tmp_path, [reports(0, ['t1', 't2']), reports(1, ['t2', 't3'])], row_group_size=2)
+
+    with open(filename, 'rb') as input_file:
+        groups = list(iter_row_groups(input_file))
+
+    assert len(groups) == 2
+    assert groups[1]['names'] == ['virtualwatts', 't1', 't2', 't3']
+    assert list(groups[1]['target']) == [2, 3]
+
+
+def test_row_group_is_flushed_when_flush_interval_elapsed(tmp_path):
+    output = io.BytesIO()
+    writer = ColumnarWriter(output, flush_interval=0)
+
+    writer.write(reports(0, ['t1']))
+
+    assert writer.rows == 1
+    assert len(output.getvalue()) > len(MAGIC)
+
+
+def test_row_group_is_not_flushed_before_size_or_time_trigger():
+    output = io.BytesIO()
+    writer = ColumnarWriter(output, row_group_size=10, flush_interval=3600)
+
+    writer.write(reports(0, ['t%d' % i for i in range(9)]))
+
+    assert writer.rows == 0
+    writer.write(reports(1, ['t1']))
+    assert writer.rows == 10
+
+
+def test_concatenated_files_are_read_with_their_own_dictionary(tmp_path):
+    first = write(tmp_path, [reports(0, ['t1', 't2'])])
+    with open(first, 'rb') as input_file:
+        content = input_file.read()
+    second = str(tmp_path / 'second.vwc')
+    with open(second, 'wb') as output:
+        writer = ColumnarWriter(output)
+        writer.write(reports(1, ['t3']))
+        writer.close()
+    with open(second, 'rb') as input_file:
+        content += input_file.read()
+    concatenated = tmp_path / 'concatenated.vwc'
+    concatenated.write_bytes(content)
+
+    assert [r.target for r in read_columnar(str(concatenated))] == ['t1', 't2', 't3']
+
+
+def test_read_file_that_is_not_columnar_raise_ColumnarFormatError(tmp_path):
+    filename = tmp_path / 'output.vwc'
+    filename.write_bytes(b'{"timestamp": 0}\n')
+
+    with pytest.raises(ColumnarFormatError):
+        list(read_columnar(str(filename)))
+
+
+def test_columnar_db_append_reports_to_the_file(tmp_path):
+    filename = str(tmp_path / 'output.vwc')
+    for tick in range(2):
+        database = ColumnarDB(PowerReport, filename)
+        database.connect()
+        database.save(reports(tick, ['t1'])[0])
+        database.save_many(reports(tick, ['t2', 't3']))
+        database.close()
+
+    assert len(list(read_columnar(filename))) == 6
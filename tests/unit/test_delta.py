@@ -0,0 +1,83 @@
+# MIT License
+
+# Copyright (c) 2021 PowerAPI
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import datetime
+
+from virtualwatts.delta import DeltaFilter
+from virtualwatts.targets import TargetTable
+
+
+def ts(seconds):
+    return datetime.datetime(2021, 1, 1) + datetime.timedelta(seconds=seconds)
+
+
+def test_first_estimation_of_each_target_is_sent():
+    delta = DeltaFilter(TargetTable())
+
+    assert delta.filter(ts(0), {'t1': 10, 't2': 0}) == {'t1': 10, 't2': 0}
+
+
+def test_without_epsilon_only_equal_estimations_are_dropped():
+    delta = DeltaFilter(TargetTable())
+    delta.filter(ts(0), {'t1': 10, 't2': 5})
+
+    assert delta.filter(ts(1), {'t1': 10, 't2': 5.001}) == {'t2': 5.001}
+    assert delta.sent == 3
+    assert delta.dropped == 1
+
+
+def test_estimation_within_relative_or_absolute_epsilon_is_dropped():
+    delta = DeltaFilter(TargetTable(), relative=0.1, absolute=0.5)
+    delta.filter(ts(0), {'big': 100, 'small': 1})
+
+    assert delta.filter(ts(1), {'big': 109, 'small': 1.4}) == {}
+    assert delta.filter(ts(2), {'big': 111, 'small': 1.6}) == {'big': 111, 'small': 1.6}
+
+
+def test_change_is_compared_with_last_sent_estimation():
+    delta = DeltaFilter(TargetTable(), absolute=1)
+    delta.filter(ts(0), {'t1': 10})
+
+    assert delta.filter(ts(1), {'t1': 10.6}) == {}
+    assert delta.filter(ts(2), {'t1': 11.2}) == {'t1': 11.2}
+
+
+def test_steady_estimation_is_sent_again_after_max_silence():
+    delta = DeltaFilter(TargetTable(), max_silence=datetime.timedelta(seconds=2))
+    delta.filter(ts(0), {'t1': 10})
+
+    assert delta.filter(ts(1), {'t1': 10}) == {}
+    assert delta.filter(ts(2), {'t1': 10}) == {'t1': 10}
+    assert delta.filter(ts(3), {'t1': 10}) == {}
+
+
+def test_target_reusing_a_pruned_id_is_sent():
+    targets = TargetTable(max_idle=1)
+    delta = DeltaFilter(targets)
+    targets.update(['t1'])
+    delta.filter(ts(0), {'t1': 10})
+    for _ in range(3):
+        targets.update([])
+
+    targets.update(['t2'])
+    assert targets.get('t2') == 0
+    assert delta.filter(ts(1), {'t2': 10}) == {'t2': 10}
@@ -0,0 +1,72 @@
+# MIT License
+
+# Copyright (c) 2021 PowerAPI
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import datetime
+
+from powerapi.report import PowerReport, ProcfsReport
+
+from virtualwatts.dispatch_rule import (ShardedPowerDispatchRule, ShardedProcfsDispatchRule, shard_of,
+                                        split_procfs_report)
+
+
+def procfs_report(usage):
+    return ProcfsReport(datetime.datetime(1970, 1, 1), 'sensor', 'all', usage, 10)
+
+
+def test_shard_of_is_stable_and_in_range():
+    assert shard_of('firefox_cgroup', 4) == shard_of('firefox_cgroup', 4)
+    assert all(0 <= shard_of('cgroup_' + str(i), 4) < 4 for i in range(100))
+
+
+def test_split_procfs_report_give_each_target_to_its_shard():
+    usage = {'cgroup_' + str(i): i for i in range(100)}
+    reports = split_procfs_report(procfs_report(usage), 4)
+
+    assert [report.shard for report in reports] == [0, 1, 2, 3]
+    merged = {}
+    for report in reports:
+        assert all(shard_of(target, 4) == report.shard for target in report.usage)
+        assert report.global_cpu_usage == 10
+        assert report.usage_total == sum(usage.values())
+        merged.update(report.usage)
+    assert merged == usage
+
+
+def test_split_procfs_report_send_a_report_to_shards_without_target():
+    reports = split_procfs_report(procfs_report({'t1': 1}), 3)
+
+    assert len(reports) == 3
+    assert sum(len(report.usage) for report in reports) == 1
+
+
+def test_sharded_power_dispatch_rule_send_report_to_every_shard():
+    rule = ShardedPowerDispatchRule(3, primary=True)
+    report = PowerReport(datetime.datetime(1970, 1, 1), 'sensor', 'all', 42, {})
+
+    assert rule.get_formula_id(report) == [('sensor', 0), ('sensor', 1), ('sensor', 2)]
+
+
+def test_sharded_procfs_dispatch_rule_send_report_to_its_shard():
+    rule = ShardedProcfsDispatchRule()
+    reports = split_procfs_report(procfs_report({'t1': 1}), 3)
+
+    assert [rule.get_formula_id(report) for report in reports] == [[('sensor', 0)], [('sensor', 1)], [('sensor', 2)]]
@@ -0,0 +1,111 @@
+# MIT License
+
+# Copyright (c) 2021 PowerAPI
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import datetime
+import time
+
+import pytest
+
+from thespian.actors import ActorExitRequest
+
+from powerapi.dispatch_rule import PowerDispatchRule, PowerDepthLevel, ProcfsDispatchRule, ProcfsDepthLevel
+from powerapi.dispatcher import RouteTable
+from powerapi.report import PowerReport, ProcfsReport
+from powerapi.test_utils.abstract_test import AbstractTestActor, recv_from_pipe
+from powerapi.test_utils.actor import system
+from powerapi.test_utils.dummy_actor import logger
+
+from virtualwatts.actor import VirtualWattsFormulaActor, VirtualWattsFormulaValues
+from virtualwatts.context import VirtualWattsFormulaConfig
+from virtualwatts.dispatcher import VirtualWattsDispatcherActor, VirtualWattsDispatcherStartMessage
+
+
+def route_table():
+    table = RouteTable()
+    table.dispatch_rule(PowerReport, PowerDispatchRule(PowerDepthLevel.SENSOR, primary=True))
+    table.dispatch_rule(ProcfsReport, ProcfsDispatchRule(ProcfsDepthLevel.SENSOR, primary=False))
+    return table
+
+
+def power(sensor, second, value):
+    return PowerReport(datetime.datetime(1970, 1, 1, 0, 0, second), sensor, 'all', value, {})
+
+
+def procfs(sensor, second, usage):
+    return ProcfsReport(datetime.datetime(1970, 1, 1, 0, 0, second), sensor, 'all', usage, 1)
+
+
+class TestVirtualWattsDispatcherPool(AbstractTestActor):
+    @pytest.fixture
+    def actor(self, system):
+        actor = system.createActor(VirtualWattsDispatcherActor)
+        yield actor
+        system.tell(actor, ActorExitRequest())
+
+    @pytest.fixture
+    def pool_options(self):
+        return {'max_formulas': 1}
+
+    @pytest.fixture
+    def actor_start_message(self, logger, pool_options):
+        config = VirtualWattsFormulaConfig(1000, datetime.timedelta(500))
+        values = VirtualWattsFormulaValues({'logger': logger}, config)
+        return VirtualWattsDispatcherStartMessage('system', 'test_dispatcher', VirtualWattsFormulaActor, values,
+                                                  route_table(), 'cpu', 1, **pool_options)
+
+    def test_reports_of_a_new_sensor_reap_the_least_recently_used_formula_and_restore_its_sync_when_it_resume(self, system, started_actor, dummy_pipe_out):
+        system.tell(started_actor, procfs('s1', 0, {'t1': 1}))
+        time.sleep(0.2)
+        system.tell(started_actor, procfs('s2', 0, {'t2': 1}))
+        system.tell(started_actor, power('s2', 0, 20))
+        assert recv_from_pipe(dummy_pipe_out, 2)[1].target == 't2'
+
+        # The procfs report of s1 buffered by the reaped formula pairs with
+        # its power report
+        system.tell(started_actor, power('s1', 0, 10))
+        _, report = recv_from_pipe(dummy_pipe_out, 2)
+        assert report.target == 't1'
+        assert report.power == 10
+
+    @pytest.mark.parametrize('pool_options', [{'idle_timeout': 0.2}])
+    def test_idle_formula_is_reaped_and_restored_when_its_sensor_resume(self, system, started_actor, dummy_pipe_out):
+        system.tell(started_actor, procfs('s1', 0, {'t1': 1}))
+        time.sleep(0.5)
+
+        system.tell(started_actor, power('s1', 0, 10))
+        _, report = recv_from_pipe(dummy_pipe_out, 2)
+        assert report.target == 't1'
+        assert report.power == 10
+
+
+@pytest.mark.parametrize('shards', [1, 3])
+def test_procfs_report_is_only_split_between_several_shards(monkeypatch, shards):
+    dispatcher = VirtualWattsDispatcherActor()
+    dispatcher.shards = shards
+    dispatched = []
+    monkeypatch.setattr(dispatcher, 'receiveMsg_Report', lambda report, _: dispatched.append(report))
+    report = procfs('s1', 0, {'t1': 1})
+
+    dispatcher.receiveMsg_ProcfsReport(report, None)
+
+    assert len(dispatched) == shards
+    assert (dispatched[0] is report) == (shards == 1)
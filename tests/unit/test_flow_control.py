@@ -0,0 +1,91 @@
+# MIT License
+
+# Copyright (c) 2021 PowerAPI
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import datetime
+
+import pytest
+
+from virtualwatts.context import BackpressurePolicy
+from virtualwatts.flow_control import PusherFlowControl
+
+
+def ts(seconds):
+    return datetime.datetime(2021, 1, 1) + datetime.timedelta(seconds=seconds)
+
+
+def flow_control(policy):
+    return PusherFlowControl('pusher', 2, policy, datetime.timedelta(seconds=1))
+
+
+def test_pusher_is_behind_when_max_pending_ticks_are_not_acknowledged():
+    flow = flow_control(BackpressurePolicy.DROP)
+    flow.sent = 2
+    assert not flow.ready()
+
+    flow.ack(1)
+    assert flow.ready()
+    assert flow.pending == 1
+
+
+def test_ack_of_an_old_tick_is_ignored():
+    flow = flow_control(BackpressurePolicy.DROP)
+    flow.sent = 3
+    flow.ack(2)
+    flow.ack(1)
+
+    assert flow.acked == 2
+
+
+def test_hold_with_drop_policy_count_dropped_estimations():
+    flow = flow_control(BackpressurePolicy.DROP)
+    flow.hold(ts(0), {'t1': 10, 't2': 2})
+
+    assert flow.dropped == 2
+    assert flow.release() is None
+
+
+def test_release_with_coalesce_policy_return_mean_power_over_held_ticks():
+    flow = flow_control(BackpressurePolicy.COALESCE)
+    flow.hold(ts(0), {'t1': 10, 't2': 2})
+    flow.hold(ts(1), {'t1': 20})
+
+    window = flow.release()
+
+    assert window.start == ts(0)
+    assert window.powers() == pytest.approx({'t1': 15, 't2': 1})
+    assert window.metadata()['t1'] == {'energy': pytest.approx(30), 'window': 2.0, 'samples': 2}
+    assert flow.release() is None
+
+
+def test_pusher_stays_behind_from_the_first_held_tick_until_it_is_ready():
+    flow = flow_control(BackpressurePolicy.DROP)
+    flow.sent = 3
+    assert not flow.behind
+
+    flow.hold(ts(0), {'t1': 10})
+    flow.hold(ts(1), {'t1': 10})
+    assert flow.behind
+
+    assert not flow.ack(1)
+    assert flow.behind
+    assert flow.ack(2)
+    assert not flow.behind
@@ -20,6 +20,10 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+import json
+import os
+import time
+
 import pytest
 
 from thespian.actors import ActorExitRequest
@@ -34,6 +38,9 @@ from powerapi.test_utils.dummy_actor import logger
 import datetime
 from virtualwatts.actor import VirtualWattsFormulaValues
 from virtualwatts.context import VirtualWattsFormulaConfig
+from virtualwatts.report import PowerReportBatch
+from virtualwatts.message import (AckMessage, AckRequestMessage, FormulaStateMessage, GetSyncStatisticsMessage,
+                                  ReapFormulaMessage, SyncStatisticsMessage)
 
 
 class TestVirtualWattsFormula(AbstractTestActor):
@@ -107,3 +114,239 @@ class TestVirtualWattsFormula(AbstractTestActor):
             assert msg.power == 35
         if msg.target == "t2":
             assert msg.power == 15
+
+    def test_send_GetSyncStatisticsMessage_answer_statistics_of_the_sync(self, system, started_actor, dummy_pipe_out):
+        report1 = PowerReport(datetime.datetime(1970, 1, 1), "toto", "t1", 100, {})
+        report2 = ProcfsReport(datetime.datetime(1970, 1, 1), "totoproc", "t1", {"t1": 1}, 1)
+        system.tell(started_actor, report2)
+        system.tell(started_actor, report1)
+
+        answer = system.ask(started_actor, GetSyncStatisticsMessage('system'), 1)
+        assert isinstance(answer, SyncStatisticsMessage)
+        assert answer.statistics['pairs'] == 1
+        assert answer.statistics['power'] == {'buffered': 0, 'evicted': 0, 'unpaired': 0}
+
+
+class TestVirtualWattsFormulaBatchOutput(AbstractTestActor):
+    @pytest.fixture
+    def actor(self, system):
+        actor = system.createActor(VirtualWattsFormulaActor)
+        yield actor
+        system.tell(actor, ActorExitRequest())
+
+    @pytest.fixture
+    def actor_start_message(self, logger):
+        config = VirtualWattsFormulaConfig(1000, datetime.timedelta(500), batch_output=True)
+        values = VirtualWattsFormulaValues({'logger': logger}, config)
+        return FormulaStartMessage('system', 'test_virtualwatts_formula', values, CpuDramDomainValues('test_device', ('test_sensor', 0, 0)))
+
+    def test_send_track_two_process_with_batch_output_return_one_batch_with_all_targets(self, system, started_actor, dummy_pipe_out):
+        report1 = PowerReport(datetime.datetime(1970, 1, 1), "toto", "t1", 100, {})
+        usage_dic = {"t1": 0.7, "t2": 0.3}
+        report2 = ProcfsReport(datetime.datetime(1970, 1, 1), "totoproc", "t1", usage_dic, 2)
+
+        system.tell(started_actor, report2)
+        system.tell(started_actor, report1)
+
+        _, msg = recv_from_pipe(dummy_pipe_out, 1)
+        assert isinstance(msg, PowerReportBatch)
+        assert msg.timestamp == datetime.datetime(1970, 1, 1)
+        assert msg.powers == pytest.approx({"t1": 35, "t2": 15})
+
+        reports = msg.to_power_reports()
+        assert len(reports) == 2
+        assert all(isinstance(report, PowerReport) for report in reports)
+
+        assert recv_from_pipe(dummy_pipe_out, 0.5) == (None, None)
+
+
+class TestVirtualWattsFormulaInstrumentation(AbstractTestActor):
+    @pytest.fixture
+    def instrumentation_file(self, tmp_path):
+        return str(tmp_path / 'instrumentation.jsonl')
+
+    @pytest.fixture
+    def actor(self, system):
+        actor = system.createActor(VirtualWattsFormulaActor)
+        yield actor
+        system.tell(actor, ActorExitRequest())
+
+    @pytest.fixture
+    def actor_start_message(self, logger, instrumentation_file):
+        config = VirtualWattsFormulaConfig(1000, datetime.timedelta(500), instrumentation='file',
+                                           instrumentation_period=0.1, instrumentation_file=instrumentation_file)
+        values = VirtualWattsFormulaValues({'logger': logger}, config)
+        return FormulaStartMessage('system', 'test_virtualwatts_formula', values, CpuDramDomainValues('test_device', ('test_sensor', 0, 0)))
+
+    def test_send_pair_with_file_instrumentation_record_one_value_per_stage(self, system, started_actor, dummy_pipe_out, instrumentation_file):
+        report1 = PowerReport(datetime.datetime.now(), "toto", "t1", 100, {})
+        report2 = ProcfsReport(report1.timestamp, "totoproc", "t1", {"t1": 1}, 1)
+        system.tell(started_actor, report2)
+        system.tell(started_actor, report1)
+
+        _, msg = recv_from_pipe(dummy_pipe_out, 1)
+        assert isinstance(msg, PowerReport)
+
+        deadline = time.time() + 5
+        snapshot = None
+        while time.time() < deadline:
+            if os.path.exists(instrumentation_file):
+                with open(instrumentation_file) as input_file:
+                    snapshot = json.loads(input_file.readlines()[-1])
+                if snapshot['histograms']['fanout']['count'] == 1:
+                    break
+            time.sleep(0.1)
+
+        assert snapshot is not None
+        assert snapshot['formula'] == 'test_virtualwatts_formula'
+        for stage in ('sync_wait', 'attribution', 'fanout', 'end_to_end_lag'):
+            assert snapshot['histograms'][stage]['count'] == 1
+
+
+class TestVirtualWattsFormulaAggregation(AbstractTestActor):
+    @pytest.fixture
+    def actor(self, system):
+        actor = system.createActor(VirtualWattsFormulaActor)
+        yield actor
+        system.tell(actor, ActorExitRequest())
+
+    @pytest.fixture
+    def actor_start_message(self, logger):
+        config = VirtualWattsFormulaConfig(1000, datetime.timedelta(500), aggregation_window=2)
+        values = VirtualWattsFormulaValues({'logger': logger}, config)
+        return FormulaStartMessage('system', 'test_virtualwatts_formula', values, CpuDramDomainValues('test_device', ('test_sensor', 0, 0)))
+
+    def test_send_pairs_with_aggregation_window_return_one_report_per_window(self, system, started_actor, dummy_pipe_out):
+        for second, power in ((0, 100), (1, 50), (2, 10)):
+            timestamp = datetime.datetime(1970, 1, 1, second=second)
+            system.tell(started_actor, ProcfsReport(timestamp, "totoproc", "t1", {"t1": 1}, 1))
+            system.tell(started_actor, PowerReport(timestamp, "toto", "t1", power, {}))
+
+        _, msg = recv_from_pipe(dummy_pipe_out, 1)
+        assert isinstance(msg, PowerReport)
+        assert msg.timestamp == datetime.datetime(1970, 1, 1)
+        assert msg.power == pytest.approx(75)
+        assert msg.metadata == {'energy': pytest.approx(150), 'window': 2.0, 'samples': 2}
+
+        assert recv_from_pipe(dummy_pipe_out, 0.5) == (None, None)
+
+
+class TestVirtualWattsFormulaDeltaOutput(AbstractTestActor):
+    @pytest.fixture
+    def actor(self, system):
+        actor = system.createActor(VirtualWattsFormulaActor)
+        yield actor
+        system.tell(actor, ActorExitRequest())
+
+    @pytest.fixture
+    def actor_start_message(self, logger):
+        config = VirtualWattsFormulaConfig(1000, datetime.timedelta(500), delta_output=True, delta_absolute_epsilon=1)
+        values = VirtualWattsFormulaValues({'logger': logger}, config)
+        return FormulaStartMessage('system', 'test_virtualwatts_formula', values, CpuDramDomainValues('test_device', ('test_sensor', 0, 0)))
+
+    def test_send_pairs_with_delta_output_only_return_changed_targets(self, system, started_actor, dummy_pipe_out):
+        for second, power in ((0, 100), (1, 100.5), (2, 110)):
+            timestamp = datetime.datetime(1970, 1, 1, second=second)
+            system.tell(started_actor, ProcfsReport(timestamp, "totoproc", "t1", {"t1": 1, "t2": 0}, 1))
+            system.tell(started_actor, PowerReport(timestamp, "toto", "t1", power, {}))
+
+        received = [recv_from_pipe(dummy_pipe_out, 1)[1] for _ in range(3)]
+        assert [(msg.timestamp.second, msg.target, msg.power) for msg in received] == [(0, 't1', 100), (0, 't2', 0), (2, 't1', 110)]
+
+        assert recv_from_pipe(dummy_pipe_out, 0.5) == (None, None)
+
+
+class TestVirtualWattsFormulaTopTargets(AbstractTestActor):
+    @pytest.fixture
+    def actor(self, system):
+        actor = system.createActor(VirtualWattsFormulaActor)
+        yield actor
+        system.tell(actor, ActorExitRequest())
+
+    @pytest.fixture
+    def actor_start_message(self, logger):
+        config = VirtualWattsFormulaConfig(1000, datetime.timedelta(500), batch_output=True, top_targets=1)
+        values = VirtualWattsFormulaValues({'logger': logger}, config)
+        return FormulaStartMessage('system', 'test_virtualwatts_formula', values, CpuDramDomainValues('test_device', ('test_sensor', 0, 0)))
+
+    def test_send_pair_with_top_targets_return_top_consumer_and_other(self, system, started_actor, dummy_pipe_out):
+        timestamp = datetime.datetime(1970, 1, 1)
+        system.tell(started_actor, ProcfsReport(timestamp, "totoproc", "t1", {"t1": 6, "t2": 1, "t3": 1}, 10))
+        system.tell(started_actor, PowerReport(timestamp, "toto", "t1", 100, {}))
+
+        _, msg = recv_from_pipe(dummy_pipe_out, 1)
+        assert isinstance(msg, PowerReportBatch)
+        assert msg.powers == pytest.approx({'t1': 60, 'other': 20})
+
+
+class TestVirtualWattsFormulaEnergyBalance(AbstractTestActor):
+    @pytest.fixture
+    def actor(self, system):
+        actor = system.createActor(VirtualWattsFormulaActor)
+        yield actor
+        system.tell(actor, ActorExitRequest())
+
+    @pytest.fixture
+    def actor_start_message(self, logger):
+        config = VirtualWattsFormulaConfig(1000, datetime.timedelta(500), batch_output=True, energy_balance=True)
+        values = VirtualWattsFormulaValues({'logger': logger}, config)
+        return FormulaStartMessage('system', 'test_virtualwatts_formula', values, CpuDramDomainValues('test_device', ('test_sensor', 0, 0)))
+
+    def test_send_pair_with_energy_balance_return_unattributed_power(self, system, started_actor, dummy_pipe_out):
+        timestamp = datetime.datetime(1970, 1, 1)
+        system.tell(started_actor, ProcfsReport(timestamp, "totoproc", "t1", {"t1": 6, "t2": 2}, 10))
+        system.tell(started_actor, PowerReport(timestamp, "toto", "t1", 100, {}))
+
+        _, msg = recv_from_pipe(dummy_pipe_out, 1)
+        assert isinstance(msg, PowerReportBatch)
+        assert msg.powers == pytest.approx({'t1': 60, 't2': 20, 'unattributed': 20})
+
+
+class TestVirtualWattsFormulaBackpressure(AbstractTestActor):
+    @pytest.fixture
+    def actor(self, system):
+        actor = system.createActor(VirtualWattsFormulaActor)
+        yield actor
+        system.tell(actor, ActorExitRequest())
+
+    @pytest.fixture
+    def actor_start_message(self, logger):
+        config = VirtualWattsFormulaConfig(1000, datetime.timedelta(500), pusher_max_pending=1)
+        values = VirtualWattsFormulaValues({'logger': logger}, config)
+        return FormulaStartMessage('system', 'test_virtualwatts_formula', values, CpuDramDomainValues('test_device', ('test_sensor', 0, 0)))
+
+    def test_send_pairs_to_pusher_behind_coalesce_them_until_it_acknowledge(self, system, started_actor, dummy_pipe_out):
+        for second, power in ((0, 100), (1, 50), (2, 10)):
+            timestamp = datetime.datetime(1970, 1, 1, second=second)
+            system.tell(started_actor, ProcfsReport(timestamp, "totoproc", "t1", {"t1": 1}, 1))
+            system.tell(started_actor, PowerReport(timestamp, "toto", "t1", power, {}))
+
+        _, msg = recv_from_pipe(dummy_pipe_out, 1)
+        assert isinstance(msg, PowerReport)
+        assert msg.power == 100
+        _, msg = recv_from_pipe(dummy_pipe_out, 1)
+        assert isinstance(msg, AckRequestMessage)
+        assert recv_from_pipe(dummy_pipe_out, 0.5) == (None, None)
+
+        system.tell(started_actor, AckMessage('logger', msg.pusher, msg.tick))
+
+        _, msg = recv_from_pipe(dummy_pipe_out, 1)
+        assert isinstance(msg, PowerReport)
+        assert msg.timestamp == datetime.datetime(1970, 1, 1, second=1)
+        assert msg.power == pytest.approx(30)
+        assert msg.metadata == {'energy': pytest.approx(60), 'window': 2.0, 'samples': 2}
+
+    def test_reap_formula_with_pusher_behind_send_coalesced_estimations(self, system, started_actor, dummy_pipe_out):
+        for second, power in ((0, 100), (1, 50), (2, 10)):
+            timestamp = datetime.datetime(1970, 1, 1, second=second)
+            system.tell(started_actor, ProcfsReport(timestamp, "totoproc", "t1", {"t1": 1}, 1))
+            system.tell(started_actor, PowerReport(timestamp, "toto", "t1", power, {}))
+        recv_from_pipe(dummy_pipe_out, 1)
+        recv_from_pipe(dummy_pipe_out, 1)
+
+        answer = system.ask(started_actor, ReapFormulaMessage('system'), 1)
+
+        assert isinstance(answer, FormulaStateMessage)
+        _, msg = recv_from_pipe(dummy_pipe_out, 1)
+        assert isinstance(msg, PowerReport)
+        assert msg.power == pytest.approx(30)
@@ -0,0 +1,119 @@
+# MIT License
+
+# Copyright (c) 2021 PowerAPI
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import json
+import urllib.request
+
+import pytest
+
+from virtualwatts.instrumentation import (Histogram, FormulaInstrumentation,
+                                          LogInstrumentationSink,
+                                          FileInstrumentationSink,
+                                          PrometheusInstrumentationSink,
+                                          UnknownInstrumentationSink,
+                                          get_instrumentation_sink,
+                                          SYNC_WAIT, STAGES)
+
+
+def test_histogram_count_each_value_in_the_first_bucket_above_it():
+    histogram = Histogram(buckets=(0.001, 0.01, 0.1))
+    for value in (0.0005, 0.001, 0.005, 0.05, 1):
+        histogram.observe(value)
+
+    assert histogram.counts == [2, 1, 1, 1]
+    assert histogram.count == 5
+    assert histogram.sum == pytest.approx(1.0565)
+
+
+def test_histogram_quantile_return_the_upper_bound_of_the_bucket():
+    histogram = Histogram(buckets=(0.001, 0.01, 0.1))
+    for _ in range(98):
+        histogram.observe(0.0005)
+    histogram.observe(0.05)
+    histogram.observe(1)
+
+    assert histogram.quantile(0.5) == 0.001
+    assert histogram.quantile(0.99) == 0.1
+    assert histogram.quantile(1) == float('inf')
+    assert Histogram().quantile(0.5) is None
+
+
+def test_log_sink_log_a_summary_of_each_stage():
+    logs = []
+    instrumentation = FormulaInstrumentation('formula', LogInstrumentationSink(logs.append))
+    instrumentation.observe(SYNC_WAIT, 0.002)
+    instrumentation.flush()
+
+    assert len(logs) == 1
+    assert logs[0].startswith('instrumentation formula : ')
+    for stage in STAGES:
+        assert stage + ': count=' in logs[0]
+
+
+def test_file_sink_append_one_json_snapshot_per_flush(tmp_path):
+    filename = str(tmp_path / 'instrumentation.jsonl')
+    instrumentation = FormulaInstrumentation('formula', FileInstrumentationSink(filename))
+    instrumentation.observe(SYNC_WAIT, 0.002)
+    instrumentation.flush()
+    instrumentation.flush()
+
+    with open(filename) as input_file:
+        snapshots = [json.loads(line) for line in input_file]
+    assert len(snapshots) == 2
+    assert snapshots[0]['formula'] == 'formula'
+    assert snapshots[0]['histograms'][SYNC_WAIT]['count'] == 1
+    assert snapshots[0]['histograms'][SYNC_WAIT]['p50'] == 0.0025
+
+
+def test_prometheus_sink_expose_the_histograms_on_an_http_endpoint():
+    sink = PrometheusInstrumentationSink(0)
+    try:
+        instrumentation = FormulaInstrumentation('formula', sink)
+        instrumentation.observe(SYNC_WAIT, 0.002)
+        instrumentation.flush()
+
+        url = 'http://127.0.0.1:' + str(sink.port) + '/metrics'
+        with urllib.request.urlopen(url, timeout=5) as response:
+            body = response.read().decode()
+    finally:
+        sink.close()
+
+    assert '# TYPE virtualwatts_sync_wait_seconds histogram' in body
+    assert 'virtualwatts_sync_wait_seconds_bucket{formula="formula",le="0.001"} 0' in body
+    assert 'virtualwatts_sync_wait_seconds_bucket{formula="formula",le="0.0025"} 1' in body
+    assert 'virtualwatts_sync_wait_seconds_count{formula="formula"} 1' in body
+
+
+def test_prometheus_sink_use_the_next_port_when_the_given_one_is_taken():
+    first = PrometheusInstrumentationSink(0)
+    try:
+        second = PrometheusInstrumentationSink(first.port)
+        second.close()
+    finally:
+        first.close()
+
+    assert second.port > first.port
+
+
+def test_get_instrumentation_sink_with_unknown_name_raise_UnknownInstrumentationSink():
+    with pytest.raises(UnknownInstrumentationSink):
+        get_instrumentation_sink('statsd')
@@ -0,0 +1,106 @@
+# MIT License
+
+# Copyright (c) 2021 PowerAPI
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import importlib.util
+import subprocess
+import sys
+
+import pytest
+
+from virtualwatts.__main__ import generate_virtualwatts_parser, VirtualWattsConfigValidator
+
+
+def test_parse_config_without_virtualwatts_arguments_use_valid_defaults(monkeypatch):
+    monkeypatch.setattr(sys, 'argv', ['virtualwatts', '--input', 'socket', '-p', '9000', '-m', 'ProcfsReport',
+                                      '-n', 'puller', '--output', 'csv', '-d', 'output'])
+
+    config = generate_virtualwatts_parser().parse()
+
+    assert VirtualWattsConfigValidator.validate(config)
+    assert config['aggregation-window'] == 0
+    assert config['sync-stats-period'] == 0
+    assert config['instrumentation-period'] == 10
+    assert config['delta-output'] is False
+    assert config['delta-max-silence'] == 60
+    assert config['runtime'] == 'thespian'
+    assert config['max-formulas'] == 0
+    assert config['output-bulk-size'] == 1
+    assert config['formula-idle-timeout'] == 0
+    assert config['energy-balance'] is False
+    assert config['idle-baseline'] is False
+    assert config['idle-baseline-half-life'] == 7200
+
+
+def test_parse_config_with_energy_balance_flags_enable_them(monkeypatch):
+    monkeypatch.setattr(sys, 'argv', ['virtualwatts', '--input', 'socket', '-p', '9000', '-m', 'ProcfsReport',
+                                      '-n', 'puller', '--output', 'columnar', '-f', 'output.vwc',
+                                      '--energy-balance', '--idle-baseline'])
+
+    config = generate_virtualwatts_parser().parse()
+
+    assert VirtualWattsConfigValidator.validate(config)
+    assert config['energy-balance'] is True
+    assert config['idle-baseline'] is True
+
+
+def test_validate_config_with_unknown_choice_or_negative_option_fail(monkeypatch):
+    monkeypatch.setattr(sys, 'argv', ['virtualwatts', '--input', 'socket', '-p', '9000', '-m', 'ProcfsReport',
+                                      '-n', 'puller', '--output', 'columnar', '-f', 'output.vwc'])
+    parser = generate_virtualwatts_parser()
+
+    assert not VirtualWattsConfigValidator.validate(dict(parser.parse(), **{'sync-mode': 'closest'}))
+    assert not VirtualWattsConfigValidator.validate(dict(parser.parse(), **{'top-targets': -1}))
+    assert not VirtualWattsConfigValidator.validate(dict(parser.parse(), **{'formula-shards': 0}))
+
+
+def test_validate_config_with_shards_and_target_selection_fail(monkeypatch):
+    monkeypatch.setattr(sys, 'argv', ['virtualwatts', '--input', 'socket', '-p', '9000', '-m', 'ProcfsReport',
+                                      '-n', 'puller', '--output', 'columnar', '-f', 'output.vwc',
+                                      '--formula-shards', '4', '--top-targets', '10'])
+
+    assert not VirtualWattsConfigValidator.validate(generate_virtualwatts_parser().parse())
+
+
+@pytest.mark.parametrize('flag', ['--energy-balance', '--idle-baseline'])
+def test_validate_config_with_shards_and_energy_balance_fail(monkeypatch, flag):
+    monkeypatch.setattr(sys, 'argv', ['virtualwatts', '--input', 'socket', '-p', '9000', '-m', 'ProcfsReport',
+                                      '-n', 'puller', '--output', 'columnar', '-f', 'output.vwc',
+                                      '--formula-shards', '4', flag])
+
+    assert not VirtualWattsConfigValidator.validate(generate_virtualwatts_parser().parse())
+
+
+def test_validate_config_with_output_client_not_installed_fail(monkeypatch):
+    monkeypatch.setattr(sys, 'argv', ['virtualwatts', '--input', 'socket', '-p', '9000', '-m', 'ProcfsReport',
+                                      '-n', 'puller', '--output', 'mongodb', '-u', 'mongodb://localhost',
+                                      '-d', 'db', '-c', 'power'])
+    monkeypatch.setattr(importlib.util, 'find_spec', lambda name: None)
+
+    assert not VirtualWattsConfigValidator.validate(generate_virtualwatts_parser().parse())
+
+
+def test_import_main_module_dont_import_the_database_modules():
+    modules = subprocess.run([sys.executable, '-c', 'import sys, virtualwatts.__main__; print(*sys.modules)'],
+                             capture_output=True, check=True, text=True).stdout.split()
+
+    assert 'virtualwatts.__main__' in modules
+    assert 'powerapi.database' not in modules
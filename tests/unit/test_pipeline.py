@@ -0,0 +1,86 @@
+# MIT License
+
+# Copyright (c) 2021 PowerAPI
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import datetime
+
+import pytest
+
+from powerapi.report import PowerReport, ProcfsReport
+
+from virtualwatts.context import VirtualWattsFormulaConfig
+from virtualwatts.pipeline import EstimationPipeline
+
+
+def ts(seconds):
+    return datetime.datetime(2021, 1, 1) + datetime.timedelta(seconds=seconds)
+
+
+def estimate(pipeline, seconds, power, usage):
+    pair = (PowerReport(ts(seconds), 's', 'all', power, {}), ProcfsReport(ts(seconds), 's', 'all', usage, 1))
+    powers, = pipeline.attribute([pair])
+    return pipeline.estimate(pair[0], pair[1], powers)
+
+
+def test_estimate_return_timestamp_and_power_of_each_target():
+    pipeline = EstimationPipeline(VirtualWattsFormulaConfig(1000, datetime.timedelta(milliseconds=250)))
+
+    timestamp, powers, metadata = estimate(pipeline, 0, 100, {'t1': 0.5, 't2': 0.25})
+
+    assert timestamp == ts(0)
+    assert powers == pytest.approx({'t1': 50, 't2': 25})
+    assert metadata is None
+
+
+def test_estimate_with_aggregation_and_delta_output_return_changed_windows():
+    config = VirtualWattsFormulaConfig(1000, datetime.timedelta(milliseconds=250), aggregation_window=2,
+                                       delta_output=True, energy_balance=True)
+    pipeline = EstimationPipeline(config)
+
+    estimations = [estimate(pipeline, i, 100, {'t1': 0.5 if i < 4 else 0.75}) for i in range(7)]
+    estimations.append(pipeline.flush())
+
+    # a window is sent by the first estimation of the next one, the last one by the flush
+    assert [estimation is None for estimation in estimations] == [True, True, False, True, True, True, False, True]
+    timestamp, powers, metadata = estimations[2]
+    assert timestamp == ts(0)
+    assert powers == pytest.approx({'t1': 50, 'unattributed': 50})
+    assert metadata['t1']['energy'] == pytest.approx(100)
+    assert estimations[6][1] == pytest.approx({'t1': 75, 'unattributed': 25})
+
+
+def test_restore_resume_the_delta_output_of_another_pipeline():
+    config = VirtualWattsFormulaConfig(1000, datetime.timedelta(milliseconds=250), delta_output=True)
+    reaped = EstimationPipeline(config)
+    estimate(reaped, 0, 100, {'t1': 0.5})
+
+    pipeline = EstimationPipeline(config)
+    pipeline.restore(reaped.state())
+
+    assert estimate(pipeline, 1, 100, {'t1': 0.5}) is None
+    assert pipeline.delta.dropped == 1
+
+
+def test_estimate_without_aggregation_nor_delta_output_do_not_intern_targets():
+    pipeline = EstimationPipeline(VirtualWattsFormulaConfig(1000, datetime.timedelta(milliseconds=250)))
+
+    estimate(pipeline, 0, 100, {'t1': 0.5, 't2': 0.25})
+
+    assert len(pipeline.targets) == 0
@@ -0,0 +1,129 @@
+# MIT License
+
+# Copyright (c) 2021 PowerAPI
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import datetime
+
+import pytest
+
+from thespian.actors import ActorExitRequest
+
+from powerapi.message import OKMessage, PusherStartMessage
+from powerapi.report import PowerReport
+from powerapi.test_utils.abstract_test import AbstractTestActorWithDB, recv_from_pipe
+from powerapi.test_utils.actor import system
+
+from virtualwatts.message import AckMessage, AckRequestMessage, FlushMessage
+from virtualwatts.pusher import VirtualWattsPusherActor, VirtualWattsPusherStartMessage
+from virtualwatts.report import PowerReportBatch
+
+
+class TestVirtualWattsPusher(AbstractTestActorWithDB):
+    @pytest.fixture
+    def actor(self, system):
+        actor = system.createActor(VirtualWattsPusherActor)
+        yield actor
+        system.tell(actor, ActorExitRequest())
+
+    @pytest.fixture
+    def content(self):
+        return []
+
+    @pytest.fixture
+    def actor_start_message(self, fake_db):
+        return PusherStartMessage('system', 'test_virtualwatts_pusher', fake_db)
+
+    def test_send_PowerReport_to_pusher_make_it_save_it(self, system, started_actor, pipe_out):
+        report = PowerReport(datetime.datetime(1970, 1, 1), 'virtualwatts', 't1', 42, {})
+        system.tell(started_actor, report)
+
+        assert recv_from_pipe(pipe_out, 1) == report
+
+    def test_send_PowerReportBatch_to_pusher_make_it_save_all_reports_at_once(self, system, started_actor, pipe_out):
+        batch = PowerReportBatch(datetime.datetime(1970, 1, 1), 'virtualwatts', {'t1': 35, 't2': 15})
+        system.tell(started_actor, batch)
+
+        saved = recv_from_pipe(pipe_out, 1)
+        assert isinstance(saved, list)
+        assert sorted(report.target for report in saved) == ['t1', 't2']
+        assert sorted(report.power for report in saved) == [15, 35]
+
+    def test_send_PowerReportBatch_with_metadata_to_pusher_make_it_save_metadata_of_each_report(self, system, started_actor, pipe_out):
+        batch = PowerReportBatch(datetime.datetime(1970, 1, 1), 'virtualwatts', {'t1': 35, 't2': 15},
+                                 {'t1': {'energy': 70}, 't2': {'energy': 30}})
+        system.tell(started_actor, batch)
+
+        saved = recv_from_pipe(pipe_out, 1)
+        assert {report.target: report.metadata for report in saved} == {'t1': {'energy': 70}, 't2': {'energy': 30}}
+
+    def test_send_AckRequestMessage_to_pusher_answer_AckMessage_once_previous_reports_are_saved(self, system, started_actor, pipe_out):
+        report = PowerReport(datetime.datetime(1970, 1, 1), 'virtualwatts', 't1', 42, {})
+        system.tell(started_actor, report)
+
+        answer = system.ask(started_actor, AckRequestMessage('formula', 'pusher', 3), 1)
+
+        assert recv_from_pipe(pipe_out, 1) == report
+        assert isinstance(answer, AckMessage)
+        assert (answer.pusher, answer.tick) == ('pusher', 3)
+
+
+class TestVirtualWattsPusherWithBulkWrites(AbstractTestActorWithDB):
+    @pytest.fixture
+    def actor(self, system):
+        actor = system.createActor(VirtualWattsPusherActor)
+        yield actor
+        system.tell(actor, ActorExitRequest())
+
+    @pytest.fixture
+    def content(self):
+        return []
+
+    @pytest.fixture
+    def actor_start_message(self, fake_db):
+        return VirtualWattsPusherStartMessage('system', 'test_virtualwatts_pusher', fake_db, bulk_size=3, flush_interval=0.5)
+
+    def test_send_as_many_PowerReport_as_bulk_size_to_pusher_make_it_save_them_at_once(self, system, started_actor, pipe_out):
+        for target in ('t1', 't2', 't3'):
+            system.tell(started_actor, PowerReport(datetime.datetime(1970, 1, 1), 'virtualwatts', target, 42, {}))
+
+        saved = recv_from_pipe(pipe_out, 0.3)
+        assert [report.target for report in saved] == ['t1', 't2', 't3']
+
+    def test_send_PowerReport_to_pusher_make_it_save_it_after_flush_interval(self, system, started_actor, pipe_out):
+        system.tell(started_actor, PowerReport(datetime.datetime(1970, 1, 1), 'virtualwatts', 't1', 42, {}))
+
+        assert recv_from_pipe(pipe_out, 0.2) == (None, None)
+        saved = recv_from_pipe(pipe_out, 1)
+        assert [report.target for report in saved] == ['t1']
+
+    def test_send_AckRequestMessage_to_pusher_answer_AckMessage_once_buffered_reports_are_saved(self, system, started_actor, pipe_out):
+        system.tell(started_actor, PowerReport(datetime.datetime(1970, 1, 1), 'virtualwatts', 't1', 42, {}))
+        answer = system.ask(started_actor, AckRequestMessage('formula', 'pusher', 1), 1)
+
+        assert isinstance(answer, AckMessage)
+        assert [report.target for report in recv_from_pipe(pipe_out, 0.1)] == ['t1']
+
+    def test_send_FlushMessage_to_pusher_make_it_save_buffered_reports(self, system, started_actor, pipe_out):
+        batch = PowerReportBatch(datetime.datetime(1970, 1, 1), 'virtualwatts', {'t1': 35, 't2': 15})
+        system.tell(started_actor, batch)
+
+        assert isinstance(system.ask(started_actor, FlushMessage('system'), 0.3), OKMessage)
+        assert sorted(report.target for report in recv_from_pipe(pipe_out, 0.1)) == ['t1', 't2']
@@ -0,0 +1,281 @@
+# MIT License
+
+# Copyright (c) 2021 PowerAPI
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import datetime
+import json
+
+import pytest
+
+from powerapi.report import PowerReport, ProcfsReport
+
+from virtualwatts.columnar import read_columnar
+from virtualwatts.context import VirtualWattsFormulaConfig
+import virtualwatts.replay
+from virtualwatts.replay import (read_reports, merge_reports, replay, main, ReplayFormula, ReplayWriter,
+                                 ReplayException, replay_chunks, partition_filename, time_range)
+from virtualwatts.test_utils.reports import VirtualWattsTimeline, fixture_timeline, write_json_lines
+
+
+class ListReplayWriter(ReplayWriter):
+    def __init__(self, bulk_size=10000):
+        ReplayWriter.__init__(self, bulk_size)
+        self.writes = []
+
+    def _save_many(self, reports):
+        self.writes.append(list(reports))
+
+
+@pytest.fixture
+def config():
+    return VirtualWattsFormulaConfig(500, datetime.timedelta(milliseconds=250))
+
+
+@pytest.fixture
+def timeline_files(tmp_path):
+    timeline = fixture_timeline()
+    power_file = str(tmp_path / 'power.jsonl')
+    procfs_file = str(tmp_path / 'procfs.jsonl')
+    write_json_lines(power_file, timeline.power_reports())
+    write_json_lines(procfs_file, timeline.procfs_reports())
+    return power_file, procfs_file
+
+
+def test_read_reports_from_json_lines_file(timeline_files):
+    reports = list(read_reports(timeline_files[0], PowerReport))
+
+    assert len(reports) == 39
+    assert all(isinstance(report, PowerReport) for report in reports)
+
+
+def test_read_reports_from_mongoexport_json_array(tmp_path):
+    filename = tmp_path / 'power.json'
+    filename.write_text(json.dumps([{'_id': {'$oid': '6140a1'}, 'timestamp': {'$date': '2021-09-14T12:37:37.168Z'},
+                                     'sensor': 's', 'target': 'all', 'power': {'$numberDouble': '42.5'}}]))
+
+    report, = read_reports(str(filename), PowerReport)
+
+    assert report.timestamp == datetime.datetime(2021, 9, 14, 12, 37, 37, 168000)
+    assert report.power == 42.5
+
+
+def test_read_reports_from_csv_file_group_procfs_lines_by_timestamp(tmp_path):
+    filename = tmp_path / 'procfs.csv'
+    filename.write_text('timestamp,sensor,target,cgroup,usage,global_cpu_usage\n'
+                        '2021-09-14T12:37:37.000000,s,all,c1,1.5,4\n'
+                        '2021-09-14T12:37:37.000000,s,all,c2,2.5,4\n'
+                        '2021-09-14T12:37:38.000000,s,all,c1,3,4\n')
+
+    reports = list(read_reports(str(filename), ProcfsReport))
+
+    assert [report.usage for report in reports] == [{'c1': 1.5, 'c2': 2.5}, {'c1': 3}]
+    assert reports[0].global_cpu_usage == 4
+
+
+def test_read_reports_from_missing_file_raise_ReplayException(tmp_path):
+    with pytest.raises(ReplayException):
+        list(read_reports(str(tmp_path / 'missing.jsonl'), PowerReport))
+
+
+
+@pytest.mark.parametrize('bad_line', ['{"timestamp": "2021-09-14T12:37:3', '{"sensor": "s"}', '42'])
+def test_read_reports_with_bad_json_line_raise_ReplayException_with_line_number(timeline_files, bad_line):
+    with open(timeline_files[0]) as input_file:
+        lines = input_file.readlines()
+    lines[2] = bad_line + '\n'
+    with open(timeline_files[0], 'w') as output_file:
+        output_file.writelines(lines)
+
+    with pytest.raises(ReplayException) as exn_info:
+        list(read_reports(timeline_files[0], PowerReport))
+
+    assert exn_info.value.msg.startswith('bad line 3 in ' + timeline_files[0])
+
+
+def test_read_reports_with_bad_csv_line_raise_ReplayException_with_line_number(tmp_path):
+    filename = tmp_path / 'procfs.csv'
+    filename.write_text('timestamp,sensor,target,cgroup,usage,global_cpu_usage\n'
+                        '2021-09-14T12:37:37.000000,s,all,c1,1.5,4\n'
+                        '2021-09-14T12:37:37.000000,s,all,c2,high,4\n')
+
+    with pytest.raises(ReplayException) as exn_info:
+        list(read_reports(str(filename), ProcfsReport))
+
+    assert exn_info.value.msg.startswith('bad line 3 in ')
+
+def test_merge_reports_sort_streams_by_timestamp():
+    timeline = VirtualWattsTimeline(targets=2, duration=5, skew=100)
+    power = [PowerReport.from_json(r) for r in timeline.power_reports()]
+    procfs = [ProcfsReport.from_json(r) for r in timeline.procfs_reports()]
+
+    merged = list(merge_reports(power, procfs))
+
+    assert len(merged) == 20
+    assert [r.timestamp for r in merged] == sorted(r.timestamp for r in merged)
+
+
+def test_replay_formula_attribute_power_like_the_actor(config):
+    formula = ReplayFormula(config)
+    timestamp = datetime.datetime(1970, 1, 1)
+
+    assert formula.process(ProcfsReport(timestamp, 's', 'all', {'t1': 0.7, 't2': 0.3}, 2)) == []
+    reports = formula.process(PowerReport(timestamp, 's', 'all', 100, {}))
+
+    assert {r.target: r.power for r in reports} == pytest.approx({'t1': 35, 't2': 15})
+    assert all(r.sensor == 'virtualwatts' for r in reports)
+
+
+def test_replay_write_estimations_in_bulk(timeline_files, config):
+    writer = ListReplayWriter(bulk_size=50)
+
+    statistics = replay(read_reports(timeline_files[0], PowerReport),
+                        read_reports(timeline_files[1], ProcfsReport), config, writer)
+
+    assert statistics['reports'] == 78
+    assert statistics['pairs'] == 39
+    assert statistics['written'] == 39 * 4
+    assert [len(write) for write in writer.writes] == [52, 52, 52]
+
+
+def test_replay_with_aggregation_window_flush_unfinished_window(timeline_files):
+    config = VirtualWattsFormulaConfig(500, datetime.timedelta(milliseconds=250), aggregation_window=3600)
+    writer = ListReplayWriter()
+
+    replay(read_reports(timeline_files[0], PowerReport), read_reports(timeline_files[1], ProcfsReport), config, writer)
+
+    reports, = writer.writes
+    assert len(reports) == 4
+    assert sum(r.metadata['energy'] for r in reports) == pytest.approx(sum(r.power for r in reports) * 19.5)
+
+
+def test_main_write_json_lines_readable_as_power_reports(timeline_files, tmp_path):
+    output = str(tmp_path / 'output.jsonl')
+
+    assert main(['--power', timeline_files[0], '--procfs', timeline_files[1], '--output', output]) == 0
+
+    reports = list(read_reports(output, PowerReport))
+    assert len(reports) == 39 * 4
+
+
+def test_main_with_missing_input_return_error_code(tmp_path):
+    assert main(['--power', str(tmp_path / 'missing'), '--procfs', str(tmp_path / 'missing'),
+                 '--output', str(tmp_path / 'output.jsonl')]) == -1
+
+
+@pytest.fixture
+def jittered_files(tmp_path):
+    timeline = VirtualWattsTimeline(targets=5, duration=60, jitter=100, skew=50, seed=3)
+    power_file = str(tmp_path / 'power.jsonl')
+    procfs_file = str(tmp_path / 'procfs.jsonl')
+    write_json_lines(power_file, timeline.power_reports())
+    write_json_lines(procfs_file, timeline.procfs_reports())
+    return power_file, procfs_file
+
+
+def test_replay_chunks_are_aligned_on_the_epoch():
+    first = datetime.datetime(2021, 1, 1, 0, 0, 25)
+    last = datetime.datetime(2021, 1, 1, 0, 1, 5)
+
+    chunks = replay_chunks(first, last, datetime.timedelta(seconds=20))
+
+    assert chunks[0] == (datetime.datetime(2021, 1, 1, 0, 0, 20), datetime.datetime(2021, 1, 1, 0, 0, 40))
+    assert chunks[-1][0] <= last < chunks[-1][1]
+    assert len(chunks) == 3
+
+
+def test_replay_chunks_duration_is_rounded_up_to_alignment():
+    first = datetime.datetime(2021, 1, 1)
+
+    chunks = replay_chunks(first, first, datetime.timedelta(seconds=50), datetime.timedelta(seconds=60))
+
+    assert chunks == [(first, first + datetime.timedelta(seconds=60))]
+
+
+def test_partition_filename_keep_the_extension():
+    assert partition_filename('/tmp/output.csv', 3) == '/tmp/output.0003.csv'
+
+
+def test_time_range_read_first_and_last_line(timeline_files):
+    first, last = time_range(timeline_files[0], PowerReport)
+
+    assert first == datetime.datetime(2021, 9, 14, 12, 37, 37, 168817)
+    assert last == first + datetime.timedelta(milliseconds=500 * 38)
+
+
+def test_read_reports_between_start_and_end_seek_in_the_file(jittered_files, monkeypatch):
+    monkeypatch.setattr(virtualwatts.replay, 'SEEK_BLOCK', 512)
+    reports = list(read_reports(jittered_files[1], ProcfsReport))
+    start, end = reports[40].timestamp, reports[80].timestamp
+
+    selected = list(read_reports(jittered_files[1], ProcfsReport, start, end))
+
+    assert [r.timestamp for r in selected] == [r.timestamp for r in reports if start <= r.timestamp < end]
+
+
+@pytest.mark.parametrize('options', [[], ['--aggregation-window', '10'], ['--sync-mode', 'interpolate'],
+                                     ['--energy-balance']])
+def test_main_with_workers_write_the_same_output_as_sequential_replay(jittered_files, tmp_path, options):
+    sequential = str(tmp_path / 'sequential.csv')
+    parallel = str(tmp_path / 'parallel.csv')
+    arguments = ['--power', jittered_files[0], '--procfs', jittered_files[1], '--output-format', 'csv'] + options
+
+    assert main(arguments + ['--output', sequential]) == 0
+    assert main(arguments + ['--output', parallel, '--workers', '2', '--chunk-duration', '7']) == 0
+
+    with open(sequential) as sequential_file, open(parallel) as parallel_file:
+        assert parallel_file.read() == sequential_file.read()
+    assert not list(tmp_path.glob('parallel.0*'))
+
+
+def test_main_with_workers_and_idle_baseline_return_error_code(jittered_files, tmp_path):
+    assert main(['--power', jittered_files[0], '--procfs', jittered_files[1], '--output', str(tmp_path / 'output.csv'),
+                 '--idle-baseline', '--workers', '2']) == -1
+
+
+def test_main_with_workers_and_bad_line_return_error_code(jittered_files, tmp_path):
+    with open(jittered_files[1]) as input_file:
+        lines = input_file.readlines()
+    lines[60] = '{"timestamp": "2021-01-01T00:00:00.000000"\n'
+    with open(jittered_files[1], 'w') as output_file:
+        output_file.writelines(lines)
+
+    assert main(['--power', jittered_files[0], '--procfs', jittered_files[1], '--output', str(tmp_path / 'output.csv'),
+                 '--workers', '2', '--chunk-duration', '7']) == -1
+
+
+def test_main_with_partitioned_output_write_one_file_per_chunk(jittered_files, tmp_path):
+    output = str(tmp_path / 'output.jsonl')
+
+    assert main(['--power', jittered_files[0], '--procfs', jittered_files[1], '--output', output,
+                 '--workers', '2', '--chunk-duration', '20', '--partitioned']) == 0
+
+    partitions = sorted(tmp_path.glob('output.0*.jsonl'))
+    assert len(partitions) >= 3
+    assert sum(len(list(read_reports(str(p), PowerReport))) for p in partitions) == 120 * 5
+
+
+def test_main_with_workers_and_columnar_output_concatenate_partitions(jittered_files, tmp_path):
+    output = str(tmp_path / 'output.vwc')
+
+    assert main(['--power', jittered_files[0], '--procfs', jittered_files[1], '--output', output,
+                 '--output-format', 'columnar', '--workers', '2', '--chunk-duration', '20']) == 0
+
+    assert len(list(read_columnar(output))) == 120 * 5
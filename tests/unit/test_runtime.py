@@ -0,0 +1,160 @@
+# MIT License
+
+# Copyright (c) 2021 PowerAPI
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import asyncio
+import datetime
+import json
+
+import pytest
+
+from powerapi.database import BaseDB
+from powerapi.report import PowerReport, ProcfsReport
+
+from virtualwatts.context import VirtualWattsFormulaConfig
+from virtualwatts.replay import ReplayWriter
+from virtualwatts.runtime import AsyncioRuntime, BinarySocketSource, DatabaseSource, SocketSource
+from virtualwatts.test_utils.reports import fixture_timeline
+from virtualwatts.wire import ProcfsFrameEncoder
+
+
+class ListWriter(ReplayWriter):
+    def __init__(self, bulk_size=10):
+        ReplayWriter.__init__(self, bulk_size)
+        self.reports = []
+        self.closed = False
+
+    def _save_many(self, reports):
+        self.reports.extend(reports)
+
+    def close(self):
+        ReplayWriter.close(self)
+        self.closed = True
+
+
+class ListDB(BaseDB):
+    def __init__(self, report_type, reports):
+        BaseDB.__init__(self, report_type)
+        self.reports = reports
+
+    def connect(self):
+        pass
+
+    def iter(self, stream_mode):
+        return iter(self.reports)
+
+
+@pytest.fixture
+def config():
+    return VirtualWattsFormulaConfig(500, datetime.timedelta(milliseconds=250))
+
+
+def test_run_with_database_sources_write_every_estimation_and_close_writers(config):
+    timeline = fixture_timeline()
+    power = [PowerReport.from_json(report) for report in timeline.power_reports()]
+    procfs = [ProcfsReport.from_json(report) for report in timeline.procfs_reports()]
+    writer = ListWriter()
+    runtime = AsyncioRuntime(config, [DatabaseSource('power', ListDB(PowerReport, power), False),
+                                      DatabaseSource('procfs', ListDB(ProcfsReport, procfs), False)],
+                             {'output': writer}, queue_size=4)
+
+    asyncio.run(runtime.run())
+
+    assert runtime.reports == 78
+    assert len(writer.reports) == 39 * 4
+    assert writer.closed
+    assert sum(report.power for report in writer.reports[:4]) == pytest.approx(42 * 14.53 / 27.6)
+
+
+def test_run_with_socket_sources_process_reports_until_stopped(config):
+    timeline = fixture_timeline()
+    power_source = SocketSource('power', PowerReport, 0)
+    procfs_source = SocketSource('procfs', ProcfsReport, 0)
+    writer = ListWriter()
+    runtime = AsyncioRuntime(config, [power_source, procfs_source], {'output': writer}, flush_interval=0.1)
+
+    async def send(source, reports):
+        while source.server is None:
+            await asyncio.sleep(0.01)
+        _, stream_writer = await asyncio.open_connection('127.0.0.1', source.port)
+        for report in reports:
+            stream_writer.write(json.dumps(report).encode())
+        await stream_writer.drain()
+        stream_writer.close()
+
+    async def scenario():
+        task = asyncio.create_task(runtime.run())
+        await send(power_source, timeline.power_reports())
+        await send(procfs_source, timeline.procfs_reports())
+        while len(writer.reports) < 39 * 4:
+            await asyncio.sleep(0.01)
+        runtime.stop()
+        await task
+
+    asyncio.run(asyncio.wait_for(scenario(), 10))
+
+    assert len(writer.reports) == 39 * 4
+    assert writer.closed
+
+
+def test_socket_source_read_json_object_split_between_reads():
+    reports = list(fixture_timeline().power_reports())[:3]
+    data = b''.join(json.dumps(report).encode() for report in reports)
+
+    async def read():
+        stream_reader = asyncio.StreamReader()
+        stream_reader.feed_data(data[:50])
+        asyncio.get_running_loop().call_soon(stream_reader.feed_data, data[50:])
+        asyncio.get_running_loop().call_soon(stream_reader.feed_eof)
+        return [report async for report in SocketSource('power', PowerReport, 0)._read(stream_reader)]
+
+    assert asyncio.run(read()) == [PowerReport.from_json(report) for report in reports]
+
+
+def test_run_with_binary_socket_source_decode_procfs_reports(config):
+    timeline = fixture_timeline()
+    power_source = SocketSource('power', PowerReport, 0)
+    procfs_source = BinarySocketSource('procfs', ProcfsReport, 0)
+    writer = ListWriter()
+    runtime = AsyncioRuntime(config, [power_source, procfs_source], {'output': writer}, flush_interval=0.1)
+
+    async def send(source, data):
+        while source.server is None:
+            await asyncio.sleep(0.01)
+        _, stream_writer = await asyncio.open_connection('127.0.0.1', source.port)
+        stream_writer.write(data)
+        await stream_writer.drain()
+        stream_writer.close()
+
+    async def scenario():
+        task = asyncio.create_task(runtime.run())
+        await send(power_source, b''.join(json.dumps(report).encode() for report in timeline.power_reports()))
+        encoder = ProcfsFrameEncoder()
+        await send(procfs_source, b''.join(encoder.encode(ProcfsReport.from_json(report))
+                                           for report in timeline.procfs_reports()))
+        while len(writer.reports) < 39 * 4:
+            await asyncio.sleep(0.01)
+        runtime.stop()
+        await task
+
+    asyncio.run(asyncio.wait_for(scenario(), 10))
+
+    assert len(writer.reports) == 39 * 4
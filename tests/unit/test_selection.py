@@ -0,0 +1,52 @@
+# MIT License
+
+# Copyright (c) 2021 PowerAPI
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import pytest
+
+from virtualwatts.selection import OTHER_TARGET, TargetSelector
+
+POWERS = {'firefox': 20.0, 'emacs': 13.0, 'zsh': 0.03, 'mongo': 1.5}
+
+
+def test_select_without_threshold_return_all_targets():
+    assert TargetSelector().select(42, POWERS) is POWERS
+
+
+def test_select_gather_targets_under_min_share_in_other():
+    selected = TargetSelector(min_share=0.01).select(42, POWERS)
+
+    assert selected == pytest.approx({'firefox': 20.0, 'emacs': 13.0, 'mongo': 1.5, OTHER_TARGET: 0.03})
+
+
+def test_select_keep_top_consumers_and_gather_others():
+    selected = TargetSelector(top=2).select(42, POWERS)
+
+    assert selected == pytest.approx({'firefox': 20.0, 'emacs': 13.0, OTHER_TARGET: 1.53})
+
+
+def test_select_conserve_attributed_power():
+    powers = {'t' + str(i): i * 0.1 for i in range(1000)}
+
+    selected = TargetSelector(min_share=0.0001, top=10).select(1000, powers)
+
+    assert len(selected) == 11
+    assert sum(selected.values()) == pytest.approx(sum(powers.values()))
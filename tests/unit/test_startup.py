@@ -0,0 +1,72 @@
+# MIT License
+
+# Copyright (c) 2021 PowerAPI
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import importlib
+import sys
+
+import pytest
+
+from virtualwatts.startup import ImportProfiler
+
+
+@pytest.fixture
+def modules(tmp_path, monkeypatch):
+    (tmp_path / 'vw_profiled_outer.py').write_text('import vw_profiled_inner\nVALUE = vw_profiled_inner.VALUE\n')
+    (tmp_path / 'vw_profiled_inner.py').write_text('VALUE = 42\n')
+    monkeypatch.syspath_prepend(str(tmp_path))
+    yield
+    for name in ('vw_profiled_outer', 'vw_profiled_inner'):
+        sys.modules.pop(name, None)
+
+
+@pytest.fixture
+def profiler():
+    profiler = ImportProfiler()
+    profiler.install()
+    yield profiler
+    profiler.uninstall()
+
+
+def test_profiler_record_self_and_cumulative_time_of_each_imported_module(modules, profiler):
+    module = importlib.import_module('vw_profiled_outer')
+
+    assert module.VALUE == 42
+    outer_self, outer_cumulative = profiler.timings['vw_profiled_outer']
+    inner_self, inner_cumulative = profiler.timings['vw_profiled_inner']
+    assert inner_self == pytest.approx(inner_cumulative)
+    assert outer_cumulative >= outer_self + inner_cumulative - 1e-9
+
+
+def test_profiled_module_keep_its_original_loader(modules, profiler):
+    module = importlib.import_module('vw_profiled_inner')
+
+    assert type(module.__loader__).__name__ == 'SourceFileLoader'
+    assert module.__spec__.loader is module.__loader__
+
+
+def test_report_list_slowest_modules_first(modules, profiler):
+    importlib.import_module('vw_profiled_outer')
+
+    lines = profiler.report().splitlines()
+
+    assert lines[2].endswith('vw_profiled_outer')
+    assert lines[3].endswith('vw_profiled_inner')
@@ -0,0 +1,270 @@
+# MIT License
+
+# Copyright (c) 2021 PowerAPI
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import datetime
+
+import pytest
+
+from powerapi.report import PowerReport, ProcfsReport
+from powerapi.utils.sync import WrongFormatReport, WrongTypeParameter
+
+from virtualwatts.context import SyncEvictionPolicy, SyncMode
+from virtualwatts.sync import ReportBuffer, VirtualWattsSync, InterpolatedSync, get_sync
+
+
+START = datetime.datetime(2021, 9, 14)
+DELAY = datetime.timedelta(milliseconds=250)
+
+
+def power(ms):
+    return PowerReport(START + datetime.timedelta(milliseconds=ms), 'sensor', 'all', ms, {})
+
+
+def procfs(ms):
+    return ProcfsReport(START + datetime.timedelta(milliseconds=ms), 'sensor', 'all', {'t1': 1}, 1)
+
+
+@pytest.fixture
+def sync():
+    return VirtualWattsSync(DELAY)
+
+
+def test_create_sync_with_delay_that_is_not_a_timedelta_raise_WrongTypeParameter():
+    with pytest.raises(WrongTypeParameter):
+        VirtualWattsSync(250)
+
+
+def test_add_report_with_unknown_type_raise_WrongFormatReport(sync):
+    with pytest.raises(WrongFormatReport):
+        sync.add_report('report')
+
+
+def test_request_without_report_return_none(sync):
+    assert sync.request() is None
+
+
+def test_reports_with_close_timestamps_are_paired_in_power_procfs_order(sync):
+    procfs_report = procfs(0)
+    power_report = power(100)
+    sync.add_report(procfs_report)
+    sync.add_report(power_report)
+
+    pair = sync.request()
+    assert pair[0] is power_report
+    assert pair[1] is procfs_report
+    assert sync.request() is None
+
+
+def test_reports_with_timestamps_further_than_delay_are_not_paired(sync):
+    sync.add_report(power(0))
+    sync.add_report(procfs(300))
+    assert sync.request() is None
+
+
+def test_report_is_paired_with_nearest_report(sync):
+    sync.add_report(power(0))
+    sync.add_report(power(200))
+    sync.add_report(power(400))
+    sync.add_report(procfs(180))
+
+    assert sync.request()[0].power == 200
+
+
+def test_report_is_used_in_one_pair_only(sync):
+    sync.add_report(power(0))
+    sync.add_report(procfs(0))
+    sync.add_report(procfs(10))
+
+    assert sync.request() is not None
+    assert sync.request() is None
+    assert len(sync.procfs_buffer) == 1
+
+
+def test_pairing_drop_reports_older_than_paired_one(sync):
+    sync.add_report(power(0))
+    sync.add_report(power(400))
+    sync.add_report(procfs(450))
+
+    assert sync.request()[0].power == 400
+    assert len(sync.power_buffer) == 0
+
+
+def test_reports_too_old_to_be_paired_are_evicted(sync):
+    for ms in range(0, 5000, 500):
+        sync.add_report(power(ms))
+    sync.add_report(procfs(10000))
+
+    assert sync.request() is None
+    assert len(sync.power_buffer) == 0
+    assert len(sync.procfs_buffer) == 1
+
+
+def test_drifting_sensors_produce_one_pair_per_tick(sync):
+    for i in range(1000):
+        sync.add_report(power(500 * i))
+        sync.add_report(procfs(500 * i + 120))
+
+    pairs = []
+    pair = sync.request()
+    while pair is not None:
+        pairs.append(pair)
+        pair = sync.request()
+    assert len(pairs) == 1000
+    assert len(sync.power_buffer) == 0
+    assert len(sync.procfs_buffer) == 0
+
+
+def test_buffer_keep_out_of_order_reports_sorted():
+    buffer = ReportBuffer()
+    for ms in [0, 300, 100, 200]:
+        buffer.insert(power(ms))
+    assert [report.power for report in buffer] == [0, 100, 200, 300]
+
+
+def test_buffer_evict_older_than_remove_only_older_reports():
+    buffer = ReportBuffer()
+    for ms in range(0, 1000, 100):
+        buffer.insert(power(ms))
+
+    evicted = buffer.evict_older_than(START + datetime.timedelta(milliseconds=450))
+    assert [report.power for report in evicted] == [0, 100, 200, 300, 400]
+    assert [report.power for report in buffer] == [500, 600, 700, 800, 900]
+
+
+def test_pairing_count_reports_older_than_paired_one_as_unpaired(sync):
+    sync.add_report(power(0))
+    sync.add_report(power(400))
+    sync.add_report(procfs(450))
+
+    statistics = sync.statistics()
+    assert statistics['pairs'] == 1
+    assert statistics['power'] == {'buffered': 0, 'evicted': 0, 'unpaired': 1}
+
+
+def test_drop_oldest_policy_evict_oldest_report_when_buffer_is_full():
+    sync = VirtualWattsSync(DELAY, max_power_reports=3, eviction_policy=SyncEvictionPolicy.DROP_OLDEST)
+    for ms in range(0, 500, 100):
+        sync.add_report(power(ms))
+
+    assert [report.power for report in sync.power_buffer] == [200, 300, 400]
+    assert sync.statistics()['power']['evicted'] == 2
+
+
+def test_drop_newest_policy_drop_received_report_when_buffer_is_full():
+    sync = VirtualWattsSync(DELAY, max_procfs_reports=3, eviction_policy=SyncEvictionPolicy.DROP_NEWEST)
+    for ms in range(0, 500, 100):
+        sync.add_report(procfs(ms))
+
+    assert [report.timestamp for report in sync.procfs_buffer] == [procfs(ms).timestamp for ms in (0, 100, 200)]
+    assert sync.statistics()['procfs']['evicted'] == 2
+
+
+def test_max_age_policy_evict_reports_older_than_max_age():
+    sync = VirtualWattsSync(DELAY, eviction_policy=SyncEvictionPolicy.MAX_AGE,
+                            max_age=datetime.timedelta(milliseconds=1000))
+    for ms in range(0, 3000, 500):
+        sync.add_report(power(ms))
+
+    assert [report.power for report in sync.power_buffer] == [1500, 2000, 2500]
+    assert sync.statistics()['power']['evicted'] == 3
+
+
+def test_max_age_policy_without_max_age_raise_WrongTypeParameter():
+    with pytest.raises(WrongTypeParameter):
+        VirtualWattsSync(DELAY, eviction_policy=SyncEvictionPolicy.MAX_AGE)
+
+
+def test_stalled_sensor_keep_buffer_bounded():
+    sync = VirtualWattsSync(DELAY, max_power_reports=10)
+    for i in range(10000):
+        sync.add_report(power(500 * i))
+
+    assert len(sync.power_buffer) == 10
+    assert sync.statistics()['power']['evicted'] == 9990
+
+
+@pytest.fixture
+def interpolated_sync():
+    return InterpolatedSync(DELAY, max_gap=datetime.timedelta(seconds=5))
+
+
+def test_get_sync_return_sync_of_the_given_mode():
+    assert type(get_sync(SyncMode.NEAREST, DELAY)) is VirtualWattsSync
+    assert type(get_sync('interpolate', DELAY)) is InterpolatedSync
+
+
+def test_interpolated_sync_interpolate_power_at_procfs_timestamp(interpolated_sync):
+    interpolated_sync.add_power_report(power(0))
+    interpolated_sync.add_procfs_report(procfs(400))
+    assert interpolated_sync.request() is None
+
+    interpolated_sync.add_power_report(power(1000))
+
+    power_report, procfs_report = interpolated_sync.request()
+    assert procfs_report.timestamp == START + datetime.timedelta(milliseconds=400)
+    assert power_report.timestamp == procfs_report.timestamp
+    assert power_report.power == pytest.approx(400)
+
+
+def test_interpolated_sync_pair_every_procfs_report_between_two_power_reports(interpolated_sync):
+    interpolated_sync.add_power_report(power(0))
+    for ms in (100, 300, 500, 700, 900):
+        interpolated_sync.add_procfs_report(procfs(ms))
+    interpolated_sync.add_power_report(power(1000))
+
+    pairs = [interpolated_sync.request() for _ in range(5)]
+    assert [pair[0].power for pair in pairs] == pytest.approx([100, 300, 500, 700, 900])
+    assert interpolated_sync.request() is None
+    assert interpolated_sync.statistics()['pairs'] == 5
+
+
+def test_interpolated_sync_keep_only_two_power_reports(interpolated_sync):
+    for ms in range(0, 5000, 500):
+        interpolated_sync.add_power_report(power(ms))
+
+    assert len(interpolated_sync.power_buffer) == 2
+
+    interpolated_sync.add_procfs_report(procfs(4250))
+    assert interpolated_sync.request()[0].power == pytest.approx(4250)
+
+
+def test_interpolated_sync_use_nearest_power_report_when_gap_is_too_large(interpolated_sync):
+    interpolated_sync.add_power_report(power(0))
+    interpolated_sync.add_procfs_report(procfs(9900))
+    interpolated_sync.add_procfs_report(procfs(5000))
+    interpolated_sync.add_power_report(power(10000))
+
+    power_report, procfs_report = interpolated_sync.request()
+    assert procfs_report.timestamp == START + datetime.timedelta(milliseconds=9900)
+    assert power_report.power == 10000
+    assert interpolated_sync.request() is None
+    assert interpolated_sync.statistics()['procfs']['unpaired'] == 1
+
+
+def test_interpolated_sync_pair_procfs_report_older_than_power_reports_within_delay(interpolated_sync):
+    interpolated_sync.add_power_report(power(1000))
+    interpolated_sync.add_procfs_report(procfs(900))
+    interpolated_sync.add_procfs_report(procfs(500))
+
+    assert interpolated_sync.request()[0].power == 1000
+    assert interpolated_sync.request() is None
+    assert interpolated_sync.statistics()['procfs']['unpaired'] == 1
@@ -0,0 +1,142 @@
+# MIT License
+
+# Copyright (c) 2021 PowerAPI
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import json
+import os
+import threading
+import time
+
+import pytest
+
+from powerapi.report import BadInputData, PowerReport
+
+from virtualwatts.tail import TailFileDB
+
+
+def power_line(second, power=42, newline=True):
+    line = json.dumps({'timestamp': '2021-09-14T12:37:%02d.000000' % second, 'sensor': 'sensor',
+                       'target': 'vm', 'power': power})
+    return line + '\n' if newline else line
+
+
+def write(path, content, mode='a'):
+    with open(path, mode) as file:
+        file.write(content)
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'power.jsonl')
+
+
+@pytest.fixture
+def iterator(path):
+    database = TailFileDB(PowerReport, path, wait_timeout=0)
+    database.connect()
+    iterator = database.iter(True)
+    yield iterator
+    iterator.close()
+
+
+def read_all(iterator):
+    return [report.timestamp.second for report in iterator]
+
+
+def test_iterator_read_only_appended_lines(path, iterator):
+    write(path, power_line(1) + power_line(2))
+    assert read_all(iterator) == [1, 2]
+
+    write(path, power_line(3))
+    assert read_all(iterator) == [3]
+    assert read_all(iterator) == []
+
+
+def test_iterator_keep_a_partial_line_until_its_newline(path, iterator):
+    write(path, power_line(1) + power_line(2)[:20])
+    assert read_all(iterator) == [1]
+
+    write(path, power_line(2)[20:])
+    assert read_all(iterator) == [2]
+
+
+def test_iterator_read_a_file_rewritten_with_one_report(path, iterator):
+    write(path, power_line(1, newline=False), 'w')
+    assert read_all(iterator) == [1]
+
+    write(path, power_line(2, newline=False), 'w')
+    assert read_all(iterator) == [2]
+
+    write(path, power_line(3, power=4200, newline=False), 'w')
+    assert read_all(iterator) == [3]
+
+
+def test_iterator_read_a_truncated_file_from_its_beginning(path, iterator):
+    write(path, power_line(1) + power_line(2))
+    assert read_all(iterator) == [1, 2]
+
+    write(path, power_line(3), 'w')
+    assert read_all(iterator) == [3]
+
+
+def test_iterator_read_a_replaced_file(path, iterator):
+    write(path, power_line(1))
+    assert read_all(iterator) == [1]
+
+    write(path, power_line(2))
+    write(path + '.new', power_line(3))
+    os.replace(path + '.new', path)
+    assert read_all(iterator) == [2, 3]
+
+
+def test_iterator_raise_BadInputData_for_invalid_line(path, iterator):
+    write(path, '{"timestamp": \n')
+
+    with pytest.raises(BadInputData):
+        next(iterator)
+
+
+def test_iterator_wait_for_appended_lines_in_stream_mode(path):
+    write(path, '')
+    iterator = TailFileDB(PowerReport, path, wait_timeout=0).iter(True)
+    if iterator.inotify is None:
+        iterator.close()
+        pytest.skip('inotify is not available')
+    read_all(iterator)
+    iterator.wait_timeout = 2
+    writer = threading.Timer(0.1, write, (path, power_line(1)))
+    writer.start()
+
+    start = time.monotonic()
+    report = next(iterator)
+
+    assert report.timestamp.second == 1
+    assert time.monotonic() - start < 1.5
+    writer.join()
+    iterator.close()
+
+
+def test_iterator_stop_at_the_end_of_the_file_without_stream_mode(path):
+    write(path, power_line(1) + power_line(2, newline=False))
+    iterator = TailFileDB(PowerReport, path).iter(False)
+
+    assert read_all(iterator) == [1, 2]
+    iterator.close()
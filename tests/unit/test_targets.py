@@ -0,0 +1,78 @@
+# MIT License
+
+# Copyright (c) 2021 PowerAPI
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+from virtualwatts.targets import TargetArray, TargetTable
+
+
+def test_intern_give_same_id_to_same_name_and_new_ids_to_new_names():
+    table = TargetTable()
+
+    assert table.intern('t1') == 0
+    assert table.intern('t2') == 1
+    assert table.intern('t1') == 0
+    assert table.name(1) == 't2'
+    assert len(table) == 2
+
+
+def test_update_prune_targets_idle_for_max_idle_updates():
+    table = TargetTable(max_idle=2)
+    table.update(['t1', 't2'])
+
+    table.update(['t1'])
+    table.update(['t1'])
+    table.update(['t1'])
+
+    assert 't1' in table
+    assert 't2' not in table
+    assert table.get('t2') is None
+
+
+def test_released_id_is_reused_by_next_new_target():
+    table = TargetTable(max_idle=1)
+    table.update(['t1', 't2'])
+    table.update(['t2'])
+    table.update(['t2'])
+
+    assert table.update(['t2', 't3']) == [1, 0]
+    assert table.name(0) == 't3'
+    assert table.capacity == 2
+
+
+def test_never_prune_when_max_idle_is_zero():
+    table = TargetTable()
+    table.update(['t1'])
+    for _ in range(1000):
+        table.update(['t2'])
+
+    assert 't1' in table
+
+
+def test_target_array_give_default_value_to_unset_targets():
+    values = TargetArray(default=-1.0)
+    values.add(3, 2.0)
+
+    assert values.get(3) == 1.0
+    assert values.get(1) == -1.0
+    assert values.get(42) == -1.0
+
+    values.reset(3)
+    assert values.get(3) == -1.0
@@ -0,0 +1,96 @@
+# MIT License
+
+# Copyright (c) 2021 PowerAPI
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import json
+import types
+
+from powerapi.report import PowerReport, ProcfsReport
+
+from virtualwatts.test_utils.reports import (VirtualWattsTimeline, FIXTURE_USAGE, constant_usage, idle_usage,
+                                             write_json_lines, virtualwatts_power_timeline,
+                                             virtualwatts_procfs_timeline)
+
+
+def test_fixtures_contain_one_report_per_tick_with_the_same_timestamps(virtualwatts_procfs_timeline,
+                                                                      virtualwatts_power_timeline):
+    assert len(virtualwatts_procfs_timeline) == 39
+    assert [r['timestamp'] for r in virtualwatts_procfs_timeline] == [r['timestamp'] for r in virtualwatts_power_timeline]
+    assert virtualwatts_procfs_timeline[0]['timestamp'] == '2021-09-14T12:37:37.168817'
+    assert virtualwatts_power_timeline[1]['timestamp'] == '2021-09-14T12:37:37.669237'
+    assert all(r['target'] == list(FIXTURE_USAGE) for r in virtualwatts_procfs_timeline)
+    assert virtualwatts_procfs_timeline[0]['global_cpu_usage'] == 27.610000000000014
+    assert all(r['power'] == 42 for r in virtualwatts_power_timeline)
+
+
+def test_timeline_reports_are_generated_lazily():
+    timeline = VirtualWattsTimeline(targets=10000, duration=3600 * 24)
+    reports = timeline.procfs_reports()
+
+    assert isinstance(reports, types.GeneratorType)
+    assert len(next(reports)['usage']) == 10000
+
+
+def test_timeline_reports_are_sorted_by_timestamp_and_parsable():
+    timeline = VirtualWattsTimeline(targets=3, duration=10, jitter=200, skew=100)
+    reports = list(timeline.reports())
+
+    assert len(reports) == 40
+    assert [r['timestamp'] for r in reports] == sorted(r['timestamp'] for r in reports)
+    for report in reports:
+        if 'power' in report:
+            assert isinstance(PowerReport.from_json(report), PowerReport)
+        else:
+            assert isinstance(ProcfsReport.from_json(report), ProcfsReport)
+
+
+def test_timeline_is_reproducible_with_the_same_seed():
+    first = list(VirtualWattsTimeline(targets=5, duration=5, jitter=50, seed=3).reports())
+    second = list(VirtualWattsTimeline(targets=5, duration=5, jitter=50, seed=3).reports())
+    assert first == second
+
+
+def test_timeline_drop_samples_with_drop_rate():
+    timeline = VirtualWattsTimeline(targets=1, duration=500, drop_rate=0.5)
+    count = sum(1 for _ in timeline.power_reports())
+    assert 400 < count < 600
+
+
+def test_procfs_global_cpu_usage_include_untracked_usage():
+    usage = {'a': 1.0, 'b': 2.0}
+    timeline = VirtualWattsTimeline(targets=['a', 'b'], duration=1, usage=constant_usage(usage), untracked_usage=3)
+    assert all(report['global_cpu_usage'] == 6 for report in timeline.procfs_reports())
+
+
+def test_idle_usage_make_most_targets_idle():
+    timeline = VirtualWattsTimeline(targets=1000, duration=0.5, usage=idle_usage(idle_ratio=0.9))
+    usage = next(timeline.procfs_reports())['usage']
+    assert 800 < sum(1 for value in usage.values() if value == 0.01) < 1000
+
+
+def test_write_json_lines_write_one_report_per_line(tmp_path):
+    filename = str(tmp_path / 'timeline.jsonl')
+    count = write_json_lines(filename, VirtualWattsTimeline(targets=2, duration=5).reports())
+
+    with open(filename) as file_obj:
+        lines = file_obj.readlines()
+    assert count == len(lines) == 20
+    assert all(isinstance(json.loads(line), dict) for line in lines)
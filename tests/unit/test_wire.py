@@ -0,0 +1,129 @@
+# MIT License
+
+# Copyright (c) 2021 PowerAPI
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import asyncio
+import datetime
+import struct
+
+import pytest
+
+from powerapi.database import DBError
+from powerapi.report import PowerReport, ProcfsReport
+
+from virtualwatts.wire import (BinarySocketDB, FRAME_HEADER, MAX_FRAME_SIZE, ProcfsFrameDecoder, ProcfsFrameEncoder,
+                               REPORT_FRAME, TARGETS_FRAME, WireFormatError)
+
+
+def procfs_report(usage, second=0, target='all'):
+    return ProcfsReport(datetime.datetime(2021, 1, 1, 0, 0, second, 500000), 'sensor', target, usage, 3.5)
+
+
+def test_decode_encoded_reports_give_same_reports():
+    reports = [procfs_report({'t1': 0.25, 't2': 1.5}), procfs_report({'t2': 0.5, 't3': 2.0}, 1)]
+    encoder = ProcfsFrameEncoder()
+
+    decoded = ProcfsFrameDecoder().feed(b''.join(encoder.encode(report) for report in reports))
+
+    assert decoded == reports
+
+
+def test_decode_encoded_report_with_list_of_targets_give_same_report():
+    report = procfs_report({'t1': 0.25, 't2': 1.5}, target=['t1', 't2', 't3'])
+
+    decoded, = ProcfsFrameDecoder().feed(ProcfsFrameEncoder().encode(report))
+
+    assert decoded == report
+    assert decoded.target == ['t1', 't2', 't3']
+
+
+def test_encoder_send_target_names_once():
+    encoder = ProcfsFrameEncoder()
+    first = encoder.encode(procfs_report({'t1': 0.25, 't2': 1.5}))
+    second = encoder.encode(procfs_report({'t2': 0.5, 't1': 2.0}))
+
+    assert FRAME_HEADER.unpack_from(first)[1] == TARGETS_FRAME
+    assert FRAME_HEADER.unpack_from(second)[1] == REPORT_FRAME
+    assert len(second) < len(first)
+
+
+def test_decoder_handle_frames_cut_anywhere():
+    reports = [procfs_report({'t%d' % i: i / 3 for i in range(50)}, second) for second in range(3)]
+    encoder = ProcfsFrameEncoder()
+    data = b''.join(encoder.encode(report) for report in reports)
+    decoder = ProcfsFrameDecoder()
+
+    decoded = []
+    for i in range(0, len(data), 7):
+        decoded.extend(decoder.feed(data[i:i + 7]))
+
+    assert decoded == reports
+
+
+def test_decode_report_with_unknown_target_id_raise_WireFormatError():
+    data = ProcfsFrameEncoder().encode(procfs_report({'t1': 0.25}))
+    targets_length = FRAME_HEADER.size + FRAME_HEADER.unpack_from(data)[0]
+
+    with pytest.raises(WireFormatError):
+        ProcfsFrameDecoder().feed(data[targets_length:])
+
+
+@pytest.mark.parametrize('header', [FRAME_HEADER.pack(MAX_FRAME_SIZE + 1, REPORT_FRAME), FRAME_HEADER.pack(0, 42)])
+def test_decode_invalid_frame_raise_WireFormatError(header):
+    with pytest.raises(WireFormatError):
+        ProcfsFrameDecoder().feed(header)
+
+
+def test_decode_truncated_report_frame_raise_WireFormatError():
+    with pytest.raises(WireFormatError):
+        ProcfsFrameDecoder().feed(FRAME_HEADER.pack(4, REPORT_FRAME) + struct.pack('<I', 0))
+
+
+def test_decode_report_with_out_of_range_timestamp_raise_WireFormatError():
+    data = bytearray(ProcfsFrameEncoder().encode(procfs_report({'t1': 0.25})))
+    report_start = FRAME_HEADER.size + FRAME_HEADER.unpack_from(data)[0]
+    struct.pack_into('<q', data, report_start + FRAME_HEADER.size, 2 ** 62)
+
+    with pytest.raises(WireFormatError):
+        ProcfsFrameDecoder().feed(bytes(data))
+
+
+def test_binary_socket_db_give_reports_sent_by_sensor():
+    report = procfs_report({'t1': 0.25, 't2': 1.5})
+
+    async def scenario():
+        database = BinarySocketDB(ProcfsReport, 0)
+        await database.connect()
+        port = database.server.sockets[0].getsockname()[1]
+        _, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(ProcfsFrameEncoder().encode(report))
+        await writer.drain()
+        received = await database.iter(True).__anext__()
+        writer.close()
+        await database.stop()
+        return received
+
+    assert asyncio.run(scenario()) == report
+
+
+def test_binary_socket_db_refuse_other_reports_than_procfs():
+    with pytest.raises(DBError):
+        asyncio.run(BinarySocketDB(PowerReport, 0).connect())
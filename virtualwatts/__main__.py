@@ -25,7 +25,13 @@ Main module of VirtualWatts
  Initialize the system from the configuration and initiate the run
 """
 
+# imported first, to profile the imports of the other modules with
+# --profile-startup, hence out of the import order
+# pylint: disable=wrong-import-order,ungrouped-imports
+from virtualwatts.startup import report_startup
 
+import asyncio
+import importlib.util
 import logging
 import signal
 import sys
@@ -36,13 +42,7 @@ from powerapi import __version__ as powerapi_version
 from powerapi.dispatcher import DispatcherActor, RouteTable
 from powerapi.cli import ConfigValidator
 from powerapi.cli.tools import CommonCLIParser
-from powerapi.cli.generator import (
-    ReportModifierGenerator,
-    PullerGenerator,
-    PusherGenerator,
-
-)
-from powerapi.message import DispatcherStartMessage
+from powerapi.cli.config_parser import SubConfigParser
 from powerapi.report import PowerReport, ProcfsReport
 from powerapi.dispatch_rule import (
     PowerDispatchRule,
@@ -52,13 +52,117 @@ from powerapi.dispatch_rule import (
 )
 from powerapi.filter import Filter
 from powerapi.actor import InitializationException
-from powerapi.supervisor import Supervisor
+from powerapi.cli.parser import store_true
 
 
 from virtualwatts import __version__ as virtualwatts_version
 from virtualwatts.actor import (VirtualWattsFormulaActor,
                                 VirtualWattsFormulaValues)
-from virtualwatts.context import VirtualWattsFormulaConfig
+from virtualwatts.context import (VirtualWattsFormulaConfig,
+                                  BackpressurePolicy, SyncEvictionPolicy,
+                                  SyncMode)
+from virtualwatts.message import FlushMessage
+from virtualwatts.dispatch_rule import (ShardedPowerDispatchRule,
+                                        ShardedProcfsDispatchRule)
+from virtualwatts.dispatcher import (VirtualWattsDispatcherActor,
+                                     VirtualWattsDispatcherStartMessage)
+# pylint: enable=wrong-import-order,ungrouped-imports
+
+#: Maximum time (in seconds) waited for each pusher to save its buffered
+#: estimations when VirtualWatts is stopped
+PUSHER_FLUSH_TIMEOUT = 5
+
+#: Value of the VirtualWatts options missing from the configuration
+CONFIG_DEFAULTS = {
+    "sensor-reports-sampling-interval": 500,
+    "delay-threshold": 250.0,
+    "batch-output": False,
+    "aggregation-window": 0,
+    "delta-output": False,
+    "delta-relative-epsilon": 0.0,
+    "delta-absolute-epsilon": 0.0,
+    "delta-max-silence": 60.0,
+    "min-usage-share": 0.0,
+    "top-targets": 0,
+    "energy-balance": False,
+    "idle-baseline": False,
+    "idle-baseline-half-life": 7200.0,
+    "pusher-max-pending": 0,
+    "backpressure-policy": "coalesce",
+    "attribution-engine": "python",
+    "sync-mode": "nearest",
+    "sync-max-power-reports": 1000,
+    "sync-max-procfs-reports": 1000,
+    "sync-eviction-policy": "drop-oldest",
+    "sync-max-age": 10,
+    "sync-stats-period": 0,
+    "profile-startup": False,
+    "runtime": "thespian",
+    "runtime-queue-size": 1024,
+    "output-bulk-size": 1,
+    "output-flush-interval": 1.0,
+    "runtime-bulk-size": 1000,
+    "formula-shards": 1,
+    "max-formulas": 0,
+    "formula-idle-timeout": 0.0,
+    "instrumentation": "",
+    "instrumentation-period": 10,
+    "instrumentation-file": "virtualwatts_instrumentation.jsonl",
+    "instrumentation-port": 9101,
+}
+
+#: Options that can't be negative
+POSITIVE_OPTIONS = (
+    "aggregation-window", "delta-relative-epsilon", "delta-absolute-epsilon",
+    "delta-max-silence", "min-usage-share", "top-targets",
+    "pusher-max-pending", "max-formulas", "formula-idle-timeout",
+)
+
+#: Valid values of the options taking one value among a few
+CHOICE_OPTIONS = {
+    "sync-eviction-policy": [policy.value for policy in SyncEvictionPolicy],
+    "backpressure-policy": [policy.value for policy in BackpressurePolicy],
+    "sync-mode": [mode.value for mode in SyncMode],
+    "runtime": ["thespian", "asyncio"],
+}
+
+#: Checks of the option values, and of the options that can't be combined :
+#: a function returning True if the configuration is invalid and the error
+#: logged in this case
+CONFIG_CHECKS = (
+    (lambda conf: conf["formula-shards"] < 1,
+     "formula-shards must be greater than 0"),
+    (lambda conf: conf["output-bulk-size"] < 1 or
+     conf["output-flush-interval"] <= 0,
+     "output-bulk-size and output-flush-interval must be greater than 0"),
+    (lambda conf: conf["runtime-queue-size"] < 1 or
+     conf["runtime-bulk-size"] < 1,
+     "runtime-queue-size and runtime-bulk-size must be greater than 0"),
+    (lambda conf: conf["idle-baseline-half-life"] <= 0,
+     "idle-baseline-half-life must be greater than 0"),
+    (lambda conf: conf["instrumentation"] and
+     conf["instrumentation-period"] <= 0,
+     "instrumentation-period must be greater than 0"),
+    # each shard would keep its own top consumers and send its own "other"
+    (lambda conf: conf["formula-shards"] > 1 and
+     (conf["top-targets"] > 0 or conf["min-usage-share"] > 0),
+     "top-targets and min-usage-share can't be used with formula-shards"),
+    # each shard would send the unattributed and idle power of the whole VM
+    (lambda conf: conf["formula-shards"] > 1 and
+     (conf["energy-balance"] or conf["idle-baseline"]),
+     "energy-balance and idle-baseline can't be used with formula-shards"),
+)
+
+#: Client library used by the inputs and outputs of each type, and the extra
+#: of virtualwatts installing it
+DB_CLIENTS = {
+    "mongodb": ("pymongo", "mongodb"),
+    "influxdb": ("influxdb", "influxdb"),
+    "influxdb2": ("influxdb_client", "influxdb2"),
+    "opentsdb": ("opentsdb", "opentsdb"),
+    "prom": ("prometheus_client", "prometheus"),
+    "direct_prom": ("prometheus_client", "prometheus"),
+}
 
 
 def generate_virtualwatts_parser():
@@ -85,6 +189,327 @@ def generate_virtualwatts_parser():
         default=1000,
     )
 
+    # Output
+    parser.add_argument(
+        "batch-output",
+        help="Send the estimations of a synced pair to the pushers \
+        in a single message that is saved with one bulk write",
+        flag=True,
+        action=store_true,
+        default=False,
+    )
+
+    parser.add_argument(
+        "aggregation-window",
+        help="Send one report per target per window of this length \
+        (in seconds) with its mean power and its energy, instead of one \
+        report per target per synced pair (0 to disable)",
+        type=float,
+        default=0.0,
+    )
+
+    parser.add_argument(
+        "delta-output",
+        help="Only send the estimation of a target when its power changed \
+        by more than the delta epsilons since the last one sent",
+        flag=True,
+        action=store_true,
+        default=False,
+    )
+    parser.add_argument(
+        "delta-relative-epsilon",
+        help="With delta-output, relative change of the power \
+        (0.05 for five percent) under which an estimation is not sent",
+        type=float,
+        default=0.0,
+    )
+    parser.add_argument(
+        "delta-absolute-epsilon",
+        help="With delta-output, change of the power (in Watt) under which \
+        an estimation is not sent",
+        type=float,
+        default=0.0,
+    )
+    parser.add_argument(
+        "delta-max-silence",
+        help="With delta-output, maximal time between two estimations sent \
+        for a target (in seconds, 0 for no limit)",
+        type=float,
+        default=60.0,
+    )
+
+    parser.add_argument(
+        "min-usage-share",
+        help="Minimal share of the VM power a target must use to get its own \
+        estimation, the power of the others is sent as the target other \
+        (0 to disable)",
+        type=float,
+        default=0.0,
+    )
+    parser.add_argument(
+        "top-targets",
+        help="Only send the estimations of this number of greatest consumers, \
+        the power of the others is sent as the target other (0 to disable)",
+        type=int,
+        default=0,
+    )
+
+    # Energy balance
+    parser.add_argument(
+        "energy-balance",
+        help="Send the power not attributed to the targets as the target \
+        unattributed, so that the estimations sum up to the VM power",
+        flag=True,
+        action=store_true,
+        default=False,
+    )
+    parser.add_argument(
+        "idle-baseline",
+        help="Send the static power of the VM, estimated online, as the \
+        target idle. Only the dynamic power is split between the targets",
+        flag=True,
+        action=store_true,
+        default=False,
+    )
+    parser.add_argument(
+        "idle-baseline-half-life",
+        help="Number of estimations after which a sample weights half as much \
+        in the static power regression",
+        type=float,
+        default=7200.0,
+    )
+
+    parser.add_argument(
+        "pusher-max-pending",
+        help="Number of ticks a pusher can have received and not saved yet \
+        before the backpressure policy is applied (0 to disable the flow \
+        control)",
+        type=int,
+        default=0,
+    )
+    parser.add_argument(
+        "backpressure-policy",
+        help="Estimations of a pusher that falls behind : coalesce (send the \
+        mean power over the held ticks once it caught up), drop, or block \
+        (stop pairing reports until it caught up)",
+        default="coalesce",
+    )
+
+    # Attribution
+    parser.add_argument(
+        "attribution-engine",
+        help="Engine used to split the power between the targets : \
+        python or numpy (require the numpy extra)",
+        default="python",
+    )
+
+    # Sync
+    parser.add_argument(
+        "sync-mode",
+        help="Pairing of the reports : nearest (pair reports less than \
+        delay-threshold apart) or interpolate (interpolate the power at \
+        each procfs report, between power reports at most sync-max-age \
+        sampling intervals apart)",
+        default="nearest",
+    )
+    parser.add_argument(
+        "sync-max-power-reports",
+        help="Maximal number of power reports waiting to be synced \
+        (0 for no limit)",
+        type=int,
+        default=1000,
+    )
+    parser.add_argument(
+        "sync-max-procfs-reports",
+        help="Maximal number of procfs reports waiting to be synced \
+        (0 for no limit)",
+        type=int,
+        default=1000,
+    )
+    parser.add_argument(
+        "sync-eviction-policy",
+        help="Report dropped when a sync buffer is full : drop-oldest, \
+        drop-newest or max-age",
+        default="drop-oldest",
+    )
+    parser.add_argument(
+        "sync-max-age",
+        help="With the max-age policy, drop the reports waiting to be synced \
+        for more than this number of sampling intervals",
+        type=int,
+        default=10,
+    )
+    parser.add_argument(
+        "sync-stats-period",
+        help="Period between two logs of the sync statistics \
+        (in seconds, 0 to disable)",
+        type=float,
+        default=0.0,
+    )
+
+    # Instrumentation
+    parser.add_argument(
+        "instrumentation",
+        help="Record the latency of each stage of the formulas and export \
+        it to a sink : log, file or prometheus (disabled by default)",
+        default="",
+    )
+    parser.add_argument(
+        "instrumentation-period",
+        help="Period between two exports of the latency histograms \
+        (in seconds)",
+        type=float,
+        default=10.0,
+    )
+    parser.add_argument(
+        "instrumentation-file",
+        help="File the latency histograms are appended to by the file sink",
+        default="virtualwatts_instrumentation.jsonl",
+    )
+    parser.add_argument(
+        "instrumentation-port",
+        help="First port tried by the prometheus sink, each formula uses \
+        the next free one",
+        type=int,
+        default=9101,
+    )
+
+    parser.add_argument(
+        "profile-startup",
+        help="Log the time spent importing each module once the formula \
+        is started",
+        flag=True,
+        action=store_true,
+        default=False,
+    )
+
+    # Runtime
+    parser.add_argument(
+        "runtime",
+        help="Runtime of the formula : thespian (one actor per component) \
+        or asyncio (every component in a single process)",
+        default="thespian",
+    )
+    parser.add_argument(
+        "runtime-queue-size",
+        help="With the asyncio runtime, capacity of the queues between \
+        the inputs, the formulas and the outputs",
+        type=int,
+        default=1024,
+    )
+    parser.add_argument(
+        "output-bulk-size",
+        help="Number of estimations saved by each write of an output. \
+        1 to save each estimation when it is computed",
+        type=int,
+        default=1,
+    )
+    parser.add_argument(
+        "output-flush-interval",
+        help="Maximum time (in seconds) an estimation is buffered before \
+        being saved, when output-bulk-size is greater than 1",
+        type=float,
+        default=1.0,
+    )
+    parser.add_argument(
+        "runtime-bulk-size",
+        help="With the asyncio runtime, number of estimations saved by \
+        each write to an output",
+        type=int,
+        default=1000,
+    )
+
+    # Sharding
+    parser.add_argument(
+        "formula-shards",
+        help="Number of formula actors sharing the targets of a sensor",
+        type=int,
+        default=1,
+    )
+    parser.add_argument(
+        "max-formulas",
+        help="Maximum number of running formula actors, the least recently \
+        used one is stopped to start a new one. 0 for no limit",
+        type=int,
+        default=0,
+    )
+    parser.add_argument(
+        "formula-idle-timeout",
+        help="Time (in seconds) after which a formula actor that did not \
+        receive any report is stopped. Its state is restored if the reports \
+        of its sensor resume. 0 to never stop idle formulas",
+        type=float,
+        default=0.0,
+    )
+
+    # Binary socket input
+    subparser_binary_socket_input = SubConfigParser("binary_socket")
+    subparser_binary_socket_input.add_argument(
+        "p", "port", type=int, help="specify port to bind the socket"
+    )
+    subparser_binary_socket_input.add_argument(
+        "m", "model",
+        help="specify data type that will be sent through the socket, only \
+        ProcfsReport can be encoded with the binary wire format",
+        default="ProcfsReport",
+    )
+    subparser_binary_socket_input.add_argument(
+        "n", "name", help="specify puller name",
+        default="puller_binary_socket"
+    )
+    parser.add_subparser(
+        "input", subparser_binary_socket_input,
+        help="specify a database input : --db_input database_name ARG1 ARG2 ...",
+    )
+
+    # Tail-follow file input
+    subparser_tail_file_input = SubConfigParser("tailfile")
+    subparser_tail_file_input.add_argument(
+        "f", "filename",
+        help="specify the file the sensor appends its json reports to, one \
+        per line"
+    )
+    subparser_tail_file_input.add_argument(
+        "m", "model",
+        help="specify data type that will be read from the file",
+        default="PowerReport",
+    )
+    subparser_tail_file_input.add_argument(
+        "n", "name", help="specify puller name", default="puller_tailfile"
+    )
+    parser.add_subparser(
+        "input", subparser_tail_file_input,
+        help="specify a database input : --db_input database_name ARG1 ARG2 ...",
+    )
+
+    # Columnar output
+    subparser_columnar_output = SubConfigParser("columnar")
+    subparser_columnar_output.add_argument(
+        "f", "filename", help="specify the file the reports are appended to"
+    )
+    subparser_columnar_output.add_argument(
+        "r", "row_group_size",
+        help="specify the maximal number of reports of a row group",
+        type=int, default=65536,
+    )
+    subparser_columnar_output.add_argument(
+        "i", "flush_interval",
+        help="specify the maximal time (in seconds) a report is buffered",
+        type=float, default=60.0,
+    )
+    subparser_columnar_output.add_argument(
+        "m", "model",
+        help="specify data type that will be storen in the database",
+        default="PowerReport",
+    )
+    subparser_columnar_output.add_argument(
+        "n", "name", help="specify pusher name", default="pusher_columnar"
+    )
+    parser.add_subparser(
+        "output", subparser_columnar_output,
+        help="specify a database output : --db_output database_name ARG1 ARG2 ...",
+    )
+
     return parser
 
 
@@ -95,12 +520,115 @@ def filter_rule(_):
     return True
 
 
+def formula_config_from_args(fconf: Dict) -> VirtualWattsFormulaConfig:
+    """
+    :return: The configuration of the formulas given by the cli arguments
+    """
+    return VirtualWattsFormulaConfig(
+        fconf["sensor-reports-sampling-interval"],
+        fconf["delay-threshold"],
+        batch_output=fconf["batch-output"],
+        attribution_engine=fconf["attribution-engine"],
+        sync_max_power_reports=fconf["sync-max-power-reports"],
+        sync_max_procfs_reports=fconf["sync-max-procfs-reports"],
+        sync_eviction_policy=fconf["sync-eviction-policy"],
+        sync_max_age=fconf["sync-max-age"],
+        sync_stats_period=fconf["sync-stats-period"],
+        verbose=fconf["verbose"],
+        instrumentation=fconf["instrumentation"],
+        instrumentation_period=fconf["instrumentation-period"],
+        instrumentation_file=fconf["instrumentation-file"],
+        instrumentation_port=fconf["instrumentation-port"],
+        aggregation_window=fconf["aggregation-window"],
+        sync_mode=fconf["sync-mode"],
+        delta_output=fconf["delta-output"],
+        delta_relative_epsilon=fconf["delta-relative-epsilon"],
+        delta_absolute_epsilon=fconf["delta-absolute-epsilon"],
+        delta_max_silence=fconf["delta-max-silence"],
+        min_usage_share=fconf["min-usage-share"],
+        top_targets=fconf["top-targets"],
+        pusher_max_pending=fconf["pusher-max-pending"],
+        backpressure_policy=fconf["backpressure-policy"],
+        energy_balance=fconf["energy-balance"],
+        idle_baseline=fconf["idle-baseline"],
+        idle_baseline_half_life=fconf["idle-baseline-half-life"],
+    )
+
+
+def run_asyncio_virtualwatts(fconf: Dict) -> None:
+    """
+    Run the VirtualWatts formula with the asyncio runtime, in this process
+    :param fconf: CLI arguments
+    """
+    # pylint: disable=import-outside-toplevel
+    from powerapi.cli.generator import ReportModifierGenerator
+    from powerapi.database import SocketDB
+    from virtualwatts.replay import DatabaseReplayWriter
+    from virtualwatts.runtime import (AsyncioRuntime, BinarySocketSource,
+                                      DatabaseSource, SocketSource)
+    from virtualwatts.generator import (VirtualWattsPullerGenerator,
+                                        VirtualWattsPusherGenerator)
+    from virtualwatts.wire import BinarySocketDB
+
+    if fconf["batch-output"]:
+        logging.warning("batch-output is ignored by the asyncio runtime")
+    if fconf["instrumentation"]:
+        logging.warning("instrumentation is ignored by the asyncio runtime")
+    if fconf["formula-shards"] > 1:
+        logging.warning("formula-shards is ignored by the asyncio runtime")
+
+    report_modifier_list = ReportModifierGenerator().generate(fconf)
+    sources = []
+    for name, (_, start_message) in VirtualWattsPullerGenerator(
+            Filter(), report_modifier_list).generate(fconf).items():
+        database = start_message.database
+        if isinstance(database, SocketDB):
+            source_cls = (BinarySocketSource
+                          if isinstance(database, BinarySocketDB)
+                          else SocketSource)
+            sources.append(source_cls(name, database.report_type,
+                                      database.port,
+                                      report_modifiers=report_modifier_list))
+        else:
+            sources.append(DatabaseSource(name, database,
+                                          start_message.stream_mode,
+                                          report_modifier_list))
+
+    writers = {}
+    for name, (_, start_message) in VirtualWattsPusherGenerator().generate(
+            fconf).items():
+        start_message.database.connect()
+        writers[name] = DatabaseReplayWriter(start_message.database,
+                                             fconf["runtime-bulk-size"])
+
+    runtime = AsyncioRuntime(formula_config_from_args(fconf), sources,
+                             writers, fconf["runtime-queue-size"])
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        loop.add_signal_handler(signal.SIGTERM, runtime.stop)
+        loop.add_signal_handler(signal.SIGINT, runtime.stop)
+        await runtime.run()
+
+    report_startup()
+    logging.info("VirtualWatts is now running with the asyncio runtime...")
+    asyncio.run(run())
+    logging.info("VirtualWatts is shutting down...")
+
+
 def run_virtualwatts(args) -> None:
     """
     Run PowerAPI with the VirtualWatts formula.
     :param args: CLI arguments namespace
     :param logger: Logger to use for the actors
     """
+    # the database modules of PowerAPI are only imported to run the formula
+    # pylint: disable=import-outside-toplevel
+    from powerapi.cli.generator import ReportModifierGenerator
+    from powerapi.supervisor import Supervisor
+    from virtualwatts.generator import (VirtualWattsPullerGenerator,
+                                        VirtualWattsPusherGenerator)
+
     fconf = args
 
     logging.info(
@@ -109,14 +637,28 @@ def run_virtualwatts(args) -> None:
         powerapi_version,
     )
 
+    if fconf["runtime"] == "asyncio":
+        run_asyncio_virtualwatts(fconf)
+        return
+
+    shards = fconf["formula-shards"]
     route_table = RouteTable()
-    route_table.dispatch_rule(
-        PowerReport, PowerDispatchRule(PowerDepthLevel.SENSOR, primary=True)
-    )
-    route_table.dispatch_rule(
-        ProcfsReport, ProcfsDispatchRule(ProcfsDepthLevel.SENSOR,
-                                         primary=False)
-    )
+    if shards > 1:
+        route_table.dispatch_rule(
+            PowerReport, ShardedPowerDispatchRule(shards, primary=True)
+        )
+        route_table.dispatch_rule(
+            ProcfsReport, ShardedProcfsDispatchRule(primary=False)
+        )
+    else:
+        route_table.dispatch_rule(
+            PowerReport, PowerDispatchRule(PowerDepthLevel.SENSOR,
+                                           primary=True)
+        )
+        route_table.dispatch_rule(
+            ProcfsReport, ProcfsDispatchRule(ProcfsDepthLevel.SENSOR,
+                                             primary=False)
+        )
 
     report_filter = Filter()
 
@@ -124,7 +666,13 @@ def run_virtualwatts(args) -> None:
 
     supervisor = Supervisor(args["verbose"])
 
+    power_pushers = {}
+
     def term_handler(_, __):
+        # Save the estimations buffered by the pushers before stopping them
+        for pusher in power_pushers.values():
+            supervisor.system.ask(pusher, FlushMessage("system"),
+                                  PUSHER_FLUSH_TIMEOUT)
         supervisor.shutdown()
         sys.exit(0)
 
@@ -133,31 +681,36 @@ def run_virtualwatts(args) -> None:
     try:
         logging.info("Starting VirtualWatts actors...")
 
-        power_pushers = {}
-        pushers_info = PusherGenerator().generate(args)
+        pushers_info = VirtualWattsPusherGenerator(
+            fconf["output-bulk-size"],
+            fconf["output-flush-interval"]).generate(args)
         for pusher_name in pushers_info:
             pusher_cls, pusher_start_message = pushers_info[pusher_name]
             power_pushers[pusher_name] = supervisor.launch(
                 pusher_cls, pusher_start_message
             )
 
-        formula_config = VirtualWattsFormulaConfig(
-            fconf["sensor-reports-sampling-interval"], fconf["delay-threshold"]
-        )
-        dispatcher_start_message = DispatcherStartMessage(
+        formula_config = formula_config_from_args(fconf)
+        dispatcher_start_message = VirtualWattsDispatcherStartMessage(
             "system",
             "cpu_dispatcher",
             VirtualWattsFormulaActor,
             VirtualWattsFormulaValues(power_pushers, formula_config),
             route_table,
             "cpu",
+            shards,
+            fconf["max-formulas"],
+            fconf["formula-idle-timeout"],
         )
-        cpu_dispatcher = supervisor.launch(DispatcherActor,
-                                           dispatcher_start_message)
+        pooled = fconf["max-formulas"] > 0 or fconf["formula-idle-timeout"] > 0
+        cpu_dispatcher = supervisor.launch(
+            VirtualWattsDispatcherActor if shards > 1 or pooled
+            else DispatcherActor,
+            dispatcher_start_message)
         report_filter.filter(filter_rule, cpu_dispatcher)
 
-        pullers_info = PullerGenerator(report_filter,
-                                       report_modifier_list).generate(args)
+        pullers_info = VirtualWattsPullerGenerator(
+            report_filter, report_modifier_list).generate(args)
 
         for puller_name in pullers_info:
             puller_cls, puller_start_message = pullers_info[puller_name]
@@ -168,6 +721,7 @@ def run_virtualwatts(args) -> None:
         supervisor.shutdown()
         sys.exit(-1)
 
+    report_startup()
     logging.info("VirtualWatts is now running...")
     supervisor.monitor()
     logging.info("VirtualWatts is shutting down...")
@@ -180,10 +734,31 @@ class VirtualWattsConfigValidator(ConfigValidator):
         if not ConfigValidator.validate(conf):
             return False
 
-        if "sensor-reports-sampling-interval" not in conf:
-            conf["sensor-reports-sampling-interval"] = 500
-        if "delay-threshold" not in conf:
-            conf["delay-threshold"] = 250.0
+        for name, default in CONFIG_DEFAULTS.items():
+            conf.setdefault(name, default)
+
+        for name in POSITIVE_OPTIONS:
+            if conf[name] < 0:
+                logging.error("%s must be positive", name)
+                return False
+
+        for name, values in CHOICE_OPTIONS.items():
+            if conf[name] not in values:
+                logging.error("Unknown %s %s, expected one of %s", name,
+                              conf[name], ", ".join(values))
+                return False
+
+        for invalid, message in CONFIG_CHECKS:
+            if invalid(conf):
+                logging.error(message)
+                return False
+
+        for db_config in [*conf["input"].values(), *conf["output"].values()]:
+            client, extra = DB_CLIENTS.get(db_config["type"], (None, None))
+            if client is not None and importlib.util.find_spec(client) is None:
+                logging.error("%s is not installed, install virtualwatts[%s]"
+                              " to use %s", client, extra, db_config["name"])
+                return False
 
         conf["delay-threshold"] = datetime.timedelta(
             milliseconds=conf["delay-threshold"])
@@ -198,7 +773,15 @@ def get_config():
     return parser.parse()
 
 
-if __name__ == "__main__":
+def main():
+    """
+    Run VirtualWatts, or the offline replay with the replay command
+    """
+    if len(sys.argv) > 1 and sys.argv[1] == "replay":
+        logging.basicConfig(level=logging.INFO)
+        from virtualwatts.replay import main as replay_main  # pylint: disable=import-outside-toplevel
+        sys.exit(replay_main(sys.argv[2:]))
+
     logging.debug("Loading VirtualWatts' config")
     config = get_config()
     logging.debug("Validate config")
@@ -212,3 +795,7 @@ if __name__ == "__main__":
     logging.debug("Starting VirtualWatts")
     run_virtualwatts(config)
     sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -24,16 +24,35 @@
 Module that define the virtuallWatts actor
 """
 
-from typing import Dict
-from thespian.actors import ActorAddress
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List
+from thespian.actors import ActorAddress, ActorExitRequest, WakeupMessage
 
+from powerapi.actor import InitializationException
 from powerapi.formula import AbstractCpuDramFormula, FormulaValues
 from powerapi.message import FormulaStartMessage
 from powerapi.report import PowerReport
-from powerapi.utils.sync import Sync
 
 from powerapi.report import ProcfsReport
-from .context import VirtualWattsFormulaConfig
+from .attribution import UnknownAttributionEngine
+from .context import BackpressurePolicy, VirtualWattsFormulaConfig
+from .instrumentation import (FormulaInstrumentation, get_instrumentation_sink,
+                              UnknownInstrumentationSink, SYNC_WAIT,
+                              ATTRIBUTION, FANOUT, END_TO_END_LAG)
+from .flow_control import PusherFlowControl
+from .message import (AckMessage, AckRequestMessage, FormulaStateMessage,
+                      GetSyncStatisticsMessage, ReapFormulaMessage,
+                      SyncStatisticsMessage)
+from .pipeline import EstimationPipeline
+from .report import PowerReportBatch
+from .sync import get_sync
+
+#: Payload of the wakeup messages used to log the sync statistics
+SYNC_STATS_WAKEUP = 'sync_stats'
+#: Payload of the wakeup messages used to flush the instrumentation
+INSTRUMENTATION_WAKEUP = 'instrumentation'
 
 
 class VirtualWattsFormulaValues(FormulaValues):
@@ -59,40 +78,201 @@ class VirtualWattsFormulaActor(AbstractCpuDramFormula):
 
         self.config = None
         self.sync = None
+        self.pipeline = None
+        self.debug = False
+        self.instrumentation = None
+        self.flows: Dict[str, PusherFlowControl] = {}
 
     def _initialization(self, start_message: FormulaStartMessage):
 
         AbstractCpuDramFormula._initialization(self, start_message)
         self.config = start_message.values.config
 
-        self.sync = Sync(lambda x: isinstance(x, PowerReport),
-                         lambda x: isinstance(x, ProcfsReport),
-                         self.config.delay_threshold)
+        # Checked once so that no log string is built when debug is off.
+        # Thespian forwards every record of the actor processes to the
+        # logging actor, which filters them, so the verbose mode of the
+        # supervisor must also be checked.
+        self.debug = (self.config.verbose and
+                      logging.getLogger().isEnabledFor(logging.DEBUG))
+
+        self.sync = get_sync(
+            self.config.sync_mode,
+            self.config.delay_threshold,
+            max_power_reports=self.config.sync_max_power_reports,
+            max_procfs_reports=self.config.sync_max_procfs_reports,
+            eviction_policy=self.config.sync_eviction_policy,
+            max_age=self.config.sync_max_age * self.config.sampling_interval)
+
+        if self.config.sync_stats_period > 0:
+            self.wakeupAfter(timedelta(seconds=self.config.sync_stats_period),
+                             SYNC_STATS_WAKEUP)
+
+        try:
+            self.pipeline = EstimationPipeline(self.config)
+        except UnknownAttributionEngine as exn:
+            raise InitializationException(exn.msg) from exn
+
+        if self.config.pusher_max_pending > 0:
+            sample_duration = (
+                timedelta(seconds=self.config.aggregation_window)
+                if self.pipeline.aggregator is not None
+                else self.config.sampling_interval)
+            self.flows = {name: PusherFlowControl(
+                name, self.config.pusher_max_pending,
+                self.config.backpressure_policy, sample_duration)
+                for name in self.pushers}
+
+        if self.config.instrumentation:
+            try:
+                sink = get_instrumentation_sink(
+                    self.config.instrumentation,
+                    filename=self.config.instrumentation_file,
+                    port=self.config.instrumentation_port, log=self.log_info)
+            except UnknownInstrumentationSink as exn:
+                raise InitializationException(exn.msg) from exn
+            self.instrumentation = FormulaInstrumentation(self.name, sink)
+            self.wakeupAfter(
+                timedelta(seconds=self.config.instrumentation_period),
+                INSTRUMENTATION_WAKEUP)
 
     def process_synced_pair(self):
         """
-        :param pair: A power report and a procfs report sync in time
-
-        :return the power consumption of each process
+        Compute the power consumption of each process for every synced pair
+        available and send it to the pushers
         """
+        if self.flows and self._blocked():
+            # the reports wait in the sync, whose buffers are bounded
+            return
 
+        pairs = []
         pair = self.sync.request()
-        if pair is not None:
-            self.log_debug('Have synced pair :' + str(pair))
-            pw_report = pair[0]
-            use_report = pair[1]
+        while pair is not None:
+            if self.debug:
+                self.log_debug('Have synced pair :' + str(pair))
+            pairs.append(pair)
+            pair = self.sync.request()
 
-            for k in use_report.usage.keys():
-                used_power = pw_report.power * use_report.usage[k]
-                used_power = used_power / use_report.global_cpu_usage
+        if not pairs:
+            if self.debug:
+                self.log_debug('No synced pair yet')
+            return
+
+        if self.instrumentation is not None:
+            self._process_instrumented(pairs)
+            return
+
+        all_powers = self.pipeline.attribute(pairs)
+
+        for (pw_report, use_report), powers in zip(pairs, all_powers):
+            self._emit(pw_report, use_report, powers)
+
+    def _process_instrumented(self, pairs):
+        """
+        Same as process_synced_pair, but record the time spent in each stage.
+
+        The end to end lag compares the timestamp of the power report with the
+        local clock, it is only meaningful if the sensor clock is synchronized
+        with the formula one.
+        """
+        instrumentation = self.instrumentation
+        start = time.monotonic()
+        for pw_report, use_report in pairs:
+            instrumentation.observe(SYNC_WAIT, start - min(
+                pw_report.reception_time, use_report.reception_time))
 
-                report = PowerReport(pw_report.timestamp, "virtualwatts",
-                                     k, used_power, {})
-                for name, pusher in self.pushers.items():
-                    self.log_debug('send ' + str(report) + ' to ' + name)
-                    self.send(pusher, report)
+        all_powers = self.pipeline.attribute(pairs)
+        attributed = time.monotonic()
+        instrumentation.observe(ATTRIBUTION, attributed - start)
 
-        self.log_debug('No synced pair yet')
+        for (pw_report, use_report), powers in zip(pairs, all_powers):
+            self._emit(pw_report, use_report, powers)
+            sent = time.monotonic()
+            instrumentation.observe(FANOUT, sent - attributed)
+            attributed = sent
+            lag = datetime.now() - pw_report.timestamp
+            instrumentation.observe(END_TO_END_LAG, lag.total_seconds())
+
+    def _emit(self, pw_report: PowerReport, use_report: ProcfsReport,
+              powers: Dict[str, float]):
+        """
+        Send the estimations computed by the pipeline from a pair of reports
+        """
+        estimation = self.pipeline.estimate(pw_report, use_report, powers)
+        if estimation is not None:
+            self._send(*estimation)
+
+    def _flush_pipeline(self):
+        """
+        Send the estimations of the unfinished aggregation window
+        """
+        if self.pipeline is None:
+            return
+        estimation = self.pipeline.flush()
+        if estimation is not None:
+            self._send(*estimation)
+
+    def _release_flows(self):
+        """
+        Send the estimations coalesced for the pushers that are behind
+        """
+        for flow in self.flows.values():
+            window = flow.release()
+            if window is not None:
+                self._send_to(flow.name, self.pushers[flow.name],
+                              self._messages(window.start, window.powers(),
+                                             window.metadata()))
+
+    def _messages(self, timestamp: datetime, powers: Dict[str, float],
+                  metadata: Dict[str, Dict] = None) -> List:
+        """
+        :return: A PowerReport per target, or a single PowerReportBatch with
+                 the batch output
+        """
+        if self.config.batch_output:
+            return [PowerReportBatch(timestamp, "virtualwatts", powers,
+                                     metadata)]
+        return [PowerReport(timestamp, "virtualwatts", k, used_power,
+                            {} if metadata is None else metadata[k])
+                for k, used_power in powers.items()]
+
+    def _send(self, timestamp: datetime, powers: Dict[str, float],
+              metadata: Dict[str, Dict] = None):
+        """
+        Send the power consumption of each target to each pusher, or apply
+        the backpressure policy for the pushers that are behind
+        """
+        messages = self._messages(timestamp, powers, metadata)
+        for name, pusher in self.pushers.items():
+            flow = self.flows.get(name)
+            if flow is not None and not flow.ready() and \
+                    flow.policy is not BackpressurePolicy.BLOCK:
+                if not flow.behind:
+                    self.log_warning('pusher ' + name + ' is behind, ' +
+                                     flow.policy.value + ' its estimations')
+                flow.hold(timestamp, powers)
+                continue
+            self._send_to(name, pusher, messages)
+
+    def _send_to(self, name: str, pusher: ActorAddress, messages: List):
+        """
+        Send the messages of one tick to a pusher and, with the flow control,
+        ask for their acknowledgement
+        """
+        for message in messages:
+            if self.debug:
+                self.log_debug('send ' + str(message) + ' to ' + name)
+            self.send(pusher, message)
+        flow = self.flows.get(name)
+        if flow is not None:
+            flow.sent += 1
+            self.send(pusher, AckRequestMessage(self.name, name, flow.sent))
+
+    def _blocked(self) -> bool:
+        """
+        :return: True if a pusher that is behind blocks the pairing
+        """
+        return any(not flow.ready() for flow in self.flows.values()
+                   if flow.policy is BackpressurePolicy.BLOCK)
 
     def receiveMsg_ProcfsReport(self, message: ProcfsReport, _):
         """
@@ -100,8 +280,11 @@ class VirtualWattsFormulaActor(AbstractCpuDramFormula):
 
         Provide the report to the sync and call the compute if a pair is formed
         """
-        self.log_debug('receive Procfs Report :' + str(message))
-        self.sync.add_report(message)
+        if self.debug:
+            self.log_debug('receive Procfs Report :' + str(message))
+        if self.instrumentation is not None:
+            message.reception_time = time.monotonic()
+        self.sync.add_procfs_report(message)
         self.process_synced_pair()
 
     def receiveMsg_PowerReport(self, message: PowerReport, _):
@@ -110,6 +293,99 @@ class VirtualWattsFormulaActor(AbstractCpuDramFormula):
 
         Provide the report to the sync and call the compute if a pair is formed
         """
-        self.log_debug('receive Power Report :' + str(message))
-        self.sync.add_report(message)
+        if self.debug:
+            self.log_debug('receive Power Report :' + str(message))
+        if self.instrumentation is not None:
+            message.reception_time = time.monotonic()
+        self.sync.add_power_report(message)
         self.process_synced_pair()
+
+    def receiveMsg_GetSyncStatisticsMessage(self, _: GetSyncStatisticsMessage,
+                                            sender: ActorAddress):
+        """
+        Answer with the statistics of the sync
+        """
+        self.send(sender, SyncStatisticsMessage(self.name,
+                                                self.sync.statistics()))
+
+    def receiveMsg_AckMessage(self, message: AckMessage, _: ActorAddress):
+        """
+        Acknowledge the ticks saved by a pusher. Once it caught up, send it
+        the estimations coalesced while it was behind, or resume the pairing
+        if it was blocking it.
+        """
+        flow = self.flows.get(message.pusher)
+        if flow is None:
+            return
+        caught_up = flow.ack(message.tick)
+        if not flow.ready():
+            return
+        if caught_up:
+            self.log_info('pusher ' + flow.name + ' caught up')
+        window = flow.release()
+        if window is not None:
+            self._send_to(flow.name, self.pushers[flow.name],
+                          self._messages(window.start, window.powers(),
+                                         window.metadata()))
+        if flow.policy is BackpressurePolicy.BLOCK and not self._blocked():
+            self.process_synced_pair()
+
+    def receiveMsg_ReapFormulaMessage(self, _: ReapFormulaMessage,
+                                      sender: ActorAddress):
+        """
+        Send the unfinished aggregation window and the coalesced estimations,
+        as the formula is about to be stopped, and give the state needed to
+        resume the estimation of the sensor back to the dispatcher
+        """
+        self._flush_pipeline()
+        self._release_flows()
+        state = self.pipeline.state()
+        state['sync'] = self.sync
+        self.send(sender, FormulaStateMessage(self.name, state))
+
+    def receiveMsg_FormulaStateMessage(self, message: FormulaStateMessage,
+                                       _: ActorAddress):
+        """
+        Resume the estimation of the sensor from the state of a reaped
+        formula
+        """
+        self.sync = message.state['sync']
+        self.pipeline.restore(message.state)
+
+    def receiveMsg_WakeupMessage(self, message: WakeupMessage, _: ActorAddress):
+        """
+        Log the statistics of the sync or flush the instrumentation, and ask
+        to be waken up after the next period
+        """
+        if message.payload == INSTRUMENTATION_WAKEUP:
+            self.instrumentation.flush()
+            self.wakeupAfter(
+                timedelta(seconds=self.config.instrumentation_period),
+                INSTRUMENTATION_WAKEUP)
+            return
+        self.log_info('sync statistics : ' + str(self.sync.statistics()))
+        delta = self.pipeline.delta
+        if delta is not None:
+            self.log_info('delta output : %d estimations sent, %d dropped' %
+                          (delta.sent, delta.dropped))
+        for flow in self.flows.values():
+            self.log_info('pusher ' + flow.name + ' : ' +
+                          str(flow.statistics()))
+        self.wakeupAfter(timedelta(seconds=self.config.sync_stats_period),
+                         SYNC_STATS_WAKEUP)
+
+    def receiveMsg_ActorExitRequest(self, message: ActorExitRequest,
+                                    sender: ActorAddress):
+        """
+        Send the unfinished aggregation window and the coalesced estimations,
+        flush the instrumentation and release its sink before exiting
+        """
+        self._flush_pipeline()
+        self._release_flows()
+        if self.instrumentation is not None:
+            self.instrumentation.flush()
+            self.instrumentation.close()
+            self.instrumentation = None
+        self.pipeline = None
+        AbstractCpuDramFormula.receiveMsg_ActorExitRequest(self, message,
+                                                           sender)
@@ -0,0 +1,192 @@
+# MIT License
+
+# Copyright (c) 2021 PowerAPI
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Module that define the aggregation of the estimations over time windows
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from .targets import DEFAULT_MAX_IDLE, TargetArray, TargetTable
+
+EPOCH = datetime(1970, 1, 1)
+
+#: Maximal number of sample durations an estimation covers when the previous
+#: ones are missing
+MAX_GAP_SAMPLES = 3
+
+
+def target_max_idle(window: timedelta, sample_duration: timedelta,
+                    default: int = DEFAULT_MAX_IDLE) -> int:
+    """
+    :return: Number of updates after which an idle target can be pruned from
+             the TargetTable used by an aggregator, long enough to never
+             release an id still used by the current window
+    """
+    if not window:
+        return default
+    return max(default, 2 * -(-window // sample_duration))
+
+
+class EnergyWindow:
+    """
+    Energy consumed by each target during a time window
+
+    The energy is stored in an array indexed by the ids given to the targets
+    by a TargetTable. The ids of the targets seen in the window must not be
+    pruned from the table before the window is closed.
+
+    Each estimation covers the time since the previous estimation of the
+    window, at most MAX_GAP_SAMPLES sample durations, so that missing or
+    irregular samples are integrated over their actual duration. The first
+    estimation of the window, and a late one, cover one sample duration.
+    """
+
+    def __init__(self, start: datetime, duration: timedelta,
+                 sample_duration: timedelta, targets: TargetTable = None):
+        """
+        :param start: Beginning of the window
+        :param duration: Length of the window
+        :param sample_duration: Time covered by one estimation
+        :param targets: Table used to intern the target names
+        """
+        self.start = start
+        self.duration = duration
+        self.sample_duration = sample_duration.total_seconds()
+        self.samples = 0
+        #: Time (in seconds) covered by the estimations
+        self.covered = 0.0
+        self._last: Optional[datetime] = None
+        self.targets = targets if targets is not None else TargetTable()
+        self._energy = TargetArray()
+        self._seen = bytearray()
+        self._ids: List[int] = []
+
+    def add(self, timestamp: datetime, powers: Dict[str, float]):
+        """
+        Accumulate the energy of one estimation of each target, made at the
+        given timestamp
+        """
+        duration = self.sample_duration
+        if self._last is None or timestamp > self._last:
+            if self._last is not None:
+                duration = min((timestamp - self._last).total_seconds(),
+                               MAX_GAP_SAMPLES * self.sample_duration)
+            self._last = timestamp
+        self.samples += 1
+        self.covered += duration
+        intern = self.targets.intern
+        energy = self._energy
+        seen = self._seen
+        for target, power in powers.items():
+            target_id = intern(target)
+            if target_id >= len(seen):
+                seen.extend(bytes(target_id + 1 - len(seen)))
+            if not seen[target_id]:
+                seen[target_id] = 1
+                self._ids.append(target_id)
+            energy.add(target_id, power * duration)
+
+    @property
+    def energy(self) -> Dict[str, float]:
+        """
+        :return: The energy (in Joule) consumed by each target
+        """
+        name = self.targets.name
+        values = self._energy.values
+        return {name(target_id): values[target_id] for target_id in self._ids}
+
+    def powers(self) -> Dict[str, float]:
+        """
+        :return: The mean power (in Watt) of each target over the time covered
+                 by the estimations of the window. A target missing from an
+                 estimation counts as 0 W for this estimation.
+        """
+        covered = self.covered
+        return {target: energy / covered
+                for target, energy in self.energy.items()}
+
+    def metadata(self) -> Dict[str, Dict]:
+        """
+        :return: The metadata of the report of each target : its energy (in
+                 Joule), the window length (in seconds) and the number of
+                 estimations aggregated
+        """
+        duration = self.duration.total_seconds()
+        return {target: {'energy': energy, 'window': duration,
+                         'samples': self.samples}
+                for target, energy in self.energy.items()}
+
+
+class EnergyAggregator:
+    """
+    Accumulate the estimations of a formula and give back one EnergyWindow
+    each time a window is over.
+
+    Windows are aligned on the epoch so that every formula use the same
+    boundaries. An estimation older than the current window, that could
+    only be produced by a late pair, is added to the current window to keep
+    its energy.
+    """
+
+    def __init__(self, window: timedelta, sample_duration: timedelta,
+                 targets: TargetTable = None):
+        """
+        :param window: Length of the windows
+        :param sample_duration: Time covered by one estimation, the sampling
+                                interval of the sensors
+        :param targets: Table used to intern the target names, shared with
+                        the formula. Its targets must stay idle for more
+                        than one window before being pruned.
+        """
+        self.window = window
+        self.sample_duration = sample_duration
+        self.targets = targets if targets is not None else TargetTable()
+        self.current: Optional[EnergyWindow] = None
+        self._current_index = None
+
+    def add(self, timestamp: datetime,
+            powers: Dict[str, float]) -> Optional[EnergyWindow]:
+        """
+        Add the estimation of each target made at the given timestamp
+        :return: The previous window if the estimation starts a new one
+        """
+        index = (timestamp - EPOCH) // self.window
+        closed = None
+        if self.current is None or index > self._current_index:
+            closed = self.current
+            self.current = EnergyWindow(EPOCH + index * self.window,
+                                        self.window, self.sample_duration,
+                                        self.targets)
+            self._current_index = index
+        self.current.add(timestamp, powers)
+        return closed
+
+    def flush(self) -> Optional[EnergyWindow]:
+        """
+        :return: The current window, even if it is not over, and forget it
+        """
+        closed = self.current
+        self.current = None
+        self._current_index = None
+        return closed
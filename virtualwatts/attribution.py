@@ -0,0 +1,170 @@
+# MIT License
+
+# Copyright (c) 2021 PowerAPI
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Module that define the engines used to split the power consumption of a VM
+between its targets
+"""
+
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from powerapi.exception import PowerAPIExceptionWithMessage
+from powerapi.report import ProcfsReport
+
+from .report import ProcfsReportShard
+
+
+Usage = Dict[str, float]
+Powers = Dict[str, float]
+
+
+class UnknownAttributionEngine(PowerAPIExceptionWithMessage):
+    """
+    Exception raised when the requested attribution engine can't be used
+    """
+
+
+def cpu_usage_divisor(usage: Usage, global_cpu_usage: Optional[float]) -> float:
+    """
+    :return: The cpu usage the power consumption is divided by.
+             When the global cpu usage is missing or null, the sum of the
+             targets usage is used instead. If it is also null, 0 is returned
+             and every target is attributed no power.
+    """
+    if global_cpu_usage is not None and global_cpu_usage > 0:
+        return global_cpu_usage
+    total = sum(usage.values())
+    return total if total > 0 else 0.0
+
+
+def report_cpu_usage(report: ProcfsReport) -> Optional[float]:
+    """
+    :return: The global cpu usage given to the engines for a procfs report.
+             The usage of a ProcfsReportShard only holds the targets of its
+             shard, so when its global cpu usage is missing or null, the
+             usage sum of the whole report is given instead, for the power to
+             be divided by the usage of every target.
+    """
+    global_cpu_usage = report.global_cpu_usage
+    if isinstance(report, ProcfsReportShard) and \
+            (global_cpu_usage is None or global_cpu_usage <= 0):
+        return report.usage_total
+    return global_cpu_usage
+
+
+class AttributionEngine:
+    """
+    Split the power consumption of a VM between its targets proportionally to
+    their cpu usage
+    """
+
+    name = None
+
+    def attribute(self, power: float, usage: Usage,
+                  global_cpu_usage: Optional[float]) -> Powers:
+        """
+        :param power: Power consumption of the VM
+        :param usage: CPU usage of each target
+        :param global_cpu_usage: CPU usage of the whole VM
+        :return: The power consumption of each target
+        """
+        return self.attribute_many([(power, usage, global_cpu_usage)])[0]
+
+    def attribute_many(self, pairs: Iterable[Tuple[float, Usage, Optional[float]]]) -> List[Powers]:
+        """
+        :param pairs: (power, usage, global_cpu_usage) of each synced pair
+        :return: The power consumption of each target, for each pair
+        """
+        raise NotImplementedError()
+
+
+class PythonAttributionEngine(AttributionEngine):
+    """
+    Attribution engine that only use the python standard library
+    """
+
+    name = 'python'
+
+    def attribute(self, power, usage, global_cpu_usage):
+        ratio = _ratio(power, usage, global_cpu_usage)
+        return {target: value * ratio for target, value in usage.items()}
+
+    def attribute_many(self, pairs):
+        return [self.attribute(power, usage, global_cpu_usage)
+                for power, usage, global_cpu_usage in pairs]
+
+
+class NumpyAttributionEngine(AttributionEngine):
+    """
+    Attribution engine that store the usage of all the given pairs in one
+    column and compute the power of every target with a single vectorized
+    operation
+    """
+
+    name = 'numpy'
+
+    def __init__(self):
+        if numpy is None:
+            raise UnknownAttributionEngine('numpy is not installed, install virtualwatts[numpy]')
+
+    def attribute_many(self, pairs):
+        pairs = list(pairs)
+        if not pairs:
+            return []
+
+        counts = [len(usage) for _, usage, _ in pairs]
+        values = numpy.concatenate([numpy.fromiter(usage.values(), dtype=numpy.float64, count=len(usage))
+                                    for _, usage, _ in pairs])
+        ratios = numpy.array([_ratio(power, usage, global_cpu_usage)
+                              for power, usage, global_cpu_usage in pairs],
+                             dtype=numpy.float64)
+        powers = (values * numpy.repeat(ratios, counts)).tolist()
+
+        result = []
+        offset = 0
+        for (_, usage, _), count in zip(pairs, counts):
+            result.append(dict(zip(usage, powers[offset:offset + count])))
+            offset += count
+        return result
+
+
+def _ratio(power: float, usage: Usage,
+           global_cpu_usage: Optional[float]) -> float:
+    divisor = cpu_usage_divisor(usage, global_cpu_usage)
+    return power / divisor if divisor != 0 else 0.0
+
+
+def get_attribution_engine(name: str = 'python') -> AttributionEngine:
+    """
+    :param name: Name of the engine (numpy or python)
+    :return: An attribution engine
+    """
+    if name == NumpyAttributionEngine.name:
+        return NumpyAttributionEngine()
+    if name == PythonAttributionEngine.name:
+        return PythonAttributionEngine()
+    raise UnknownAttributionEngine('unknown attribution engine ' + str(name))
@@ -0,0 +1,145 @@
+# MIT License
+
+# Copyright (c) 2021 PowerAPI
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""
+Module that define the energy balance of the estimations : the power of the
+VM that is not attributed to its targets is sent as estimations of its own,
+so that the estimations of a tick always sum up to the VM power
+"""
+
+import math
+from typing import Dict, Optional
+
+from .attribution import cpu_usage_divisor
+
+#: Target of the estimation holding the power not attributed to any target
+#: (kernel, untracked processes...)
+UNATTRIBUTED_TARGET = 'unattributed'
+#: Target of the estimation holding the static power of the VM
+IDLE_TARGET = 'idle'
+
+#: Number of estimations after which a sample weights half as much in the
+#: static power regression
+DEFAULT_HALF_LIFE = 7200
+#: Number of samples needed before the static power is estimated
+MIN_SAMPLES = 10
+
+
+class StaticPowerEstimator:
+    """
+    Estimate the static power of a VM, its power when its cpu is idle, as the
+    intercept of a linear regression of its power against its cpu usage.
+
+    The regression is updated online, with exponentially decreasing weights
+    so that it follows the changes of the host.
+    """
+
+    def __init__(self, half_life: float = DEFAULT_HALF_LIFE):
+        """
+        :param half_life: Number of samples after which a sample weights half
+                          as much
+        """
+        self.forgetting = 0.5 ** (1 / half_life)
+        self.samples = 0
+        self.weight = 0.0
+        self.mean_usage = 0.0
+        self.mean_power = 0.0
+        self.usage_variance = 0.0
+        self.covariance = 0.0
+
+    def update(self, cpu_usage: float, power: float):
+        """
+        Add a sample to the regression
+        """
+        forgetting = self.forgetting
+        self.samples += 1
+        self.weight = forgetting * self.weight + 1
+        delta = cpu_usage - self.mean_usage
+        self.mean_usage += delta / self.weight
+        self.mean_power += (power - self.mean_power) / self.weight
+        self.usage_variance = forgetting * self.usage_variance + \
+            delta * (cpu_usage - self.mean_usage)
+        self.covariance = forgetting * self.covariance + \
+            delta * (power - self.mean_power)
+
+    def estimate(self) -> Optional[float]:
+        """
+        :return: The static power, or None while the cpu usage samples are
+                 too few or did not vary
+        """
+        if self.samples < MIN_SAMPLES or self.usage_variance <= 0:
+            return None
+        slope = self.covariance / self.usage_variance
+        return self.mean_power - slope * self.mean_usage
+
+
+class EnergyBalance:
+    """
+    Complete the estimations of a tick with the power that is not attributed
+    to the targets, and optionally with the static power of the VM.
+
+    Without idle baseline, the UNATTRIBUTED_TARGET estimation is the power of
+    the VM minus the power of the targets. With it, the static power
+    estimated online is sent as the IDLE_TARGET estimation and only the rest
+    of the power, the dynamic one, is split between the targets and the
+    UNATTRIBUTED_TARGET.
+    """
+
+    def __init__(self, idle_baseline: bool = False,
+                 half_life: float = DEFAULT_HALF_LIFE):
+        """
+        :param idle_baseline: True to send the static power estimation
+        :param half_life: Half-life (in estimations) of the samples of the
+                          static power regression
+        """
+        self.estimator = StaticPowerEstimator(half_life) if idle_baseline else None
+
+    def balance(self, power: float, usage: Dict[str, float],
+                global_cpu_usage: Optional[float],
+                powers: Dict[str, float]) -> Dict[str, float]:
+        """
+        :param power: Power consumption of the VM
+        :param usage: CPU usage of each target
+        :param global_cpu_usage: CPU usage of the whole VM
+        :param powers: Power consumption of each target
+        :return: The power consumption of each target, of the
+                 UNATTRIBUTED_TARGET and of the IDLE_TARGET, that sum up to
+                 the power of the VM
+        """
+        dynamic = power
+        static = None
+        if self.estimator is not None:
+            self.estimator.update(cpu_usage_divisor(usage, global_cpu_usage),
+                                  power)
+            static = self.estimator.estimate()
+            static = 0.0 if static is None else min(max(static, 0.0), power)
+            dynamic = power - static
+            if power > 0 and static > 0:
+                ratio = dynamic / power
+                powers = {target: value * ratio
+                          for target, value in powers.items()}
+        residual = dynamic - math.fsum(powers.values())
+        powers = dict(powers)
+        if static is not None:
+            powers[IDLE_TARGET] = powers.get(IDLE_TARGET, 0.0) + static
+        powers[UNATTRIBUTED_TARGET] = powers.get(UNATTRIBUTED_TARGET, 0.0) + \
+            residual
+        return powers
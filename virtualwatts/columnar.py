@@ -0,0 +1,280 @@
+# MIT License
+
+# Copyright (c) 2021 PowerAPI
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Module that define the columnar file format used to store the VirtualWatts
+estimations
+
+A file starts with the MAGIC bytes followed by row groups. Each row group
+starts with a header (ROW_GROUP_HEADER : marker, number of rows, number of
+new dictionary entries, base timestamp and length of each block) followed
+by zlib compressed blocks :
+ - the json list of the names added to the dictionary by the row group.
+   Sensor and target names are stored as their index in the dictionary,
+   that grows along the file.
+ - the timestamp column, in microseconds since the epoch, each value being
+   the delta with the previous row (the first with the base timestamp)
+ - the sensor and target columns, as dictionary indexes
+ - the power column
+ - the energy column, taken from the report metadata (NaN if missing)
+
+Other metadata are not stored. Files can be concatenated : a MAGIC found in
+place of a row group resets the dictionary.
+"""
+
+import json
+import math
+import struct
+import sys
+import time
+import zlib
+from array import array
+from datetime import timedelta
+from typing import BinaryIO, Dict, Iterator, List
+
+from powerapi.database import BaseDB, DBError
+from powerapi.report import PowerReport, Report
+
+from .aggregation import EPOCH
+
+MAGIC = b'VWCOL01\n'
+ROW_GROUP_MARKER = b'VWRG'
+ROW_GROUP_HEADER = struct.Struct('<4sIIq6I')
+
+MICROSECOND = timedelta(microseconds=1)
+
+#: Columns stored in a row group, with their array typecode
+COLUMNS = (('timestamp', 'q'), ('sensor', 'I'), ('target', 'I'),
+           ('power', 'd'), ('energy', 'd'))
+
+
+class ColumnarFormatError(DBError):
+    """
+    Error raised when a columnar file can't be decoded
+    """
+
+
+def _encode(values: array) -> bytes:
+    if sys.byteorder != 'little':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return zlib.compress(values.tobytes(), 1)
+
+
+def _decode(typecode: str, block: bytes) -> array:
+    values = array(typecode)
+    values.frombytes(zlib.decompress(block))
+    if sys.byteorder != 'little':
+        values.byteswap()
+    return values
+
+
+class ColumnarWriter:
+    """
+    Buffer reports and write them in a columnar file, one row group each
+    time row_group_size reports are buffered or flush_interval seconds
+    elapsed since the last row group
+    """
+
+    def __init__(self, output: BinaryIO, row_group_size: int = 65536,
+                 flush_interval: float = 60.0):
+        """
+        :param output: Binary file the row groups are appended to
+        :param row_group_size: Maximal number of rows of a row group
+        :param flush_interval: Maximal time (in seconds) a report stays in
+                               the buffer, checked when reports are written
+        """
+        self.output = output
+        self.row_group_size = row_group_size
+        self.flush_interval = flush_interval
+        self.dictionary: Dict[str, int] = {}
+        self.rows = 0
+        self._new_names: List[str] = []
+        self._columns = {name: array(typecode) for name, typecode in COLUMNS}
+        self._last_flush = time.monotonic()
+        self._timestamp = None
+        self._microseconds = 0
+        output.write(MAGIC)
+
+    def _index(self, name: str) -> int:
+        index = self.dictionary.get(name)
+        if index is None:
+            index = self.dictionary[name] = len(self.dictionary)
+            self._new_names.append(name)
+        return index
+
+    def write(self, reports: List[PowerReport]):
+        """
+        Add reports to the current row group and flush it if needed
+        """
+        timestamps = self._columns['timestamp']
+        sensors = self._columns['sensor']
+        targets = self._columns['target']
+        powers = self._columns['power']
+        energies = self._columns['energy']
+        for report in reports:
+            if report.timestamp != self._timestamp:
+                self._timestamp = report.timestamp
+                self._microseconds = (report.timestamp - EPOCH) // MICROSECOND
+            timestamps.append(self._microseconds)
+            sensors.append(self._index(report.sensor))
+            targets.append(self._index(report.target))
+            powers.append(report.power)
+            energies.append(report.metadata.get('energy', math.nan))
+
+        if len(timestamps) >= self.row_group_size or \
+           time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """
+        Write the buffered reports as a row group
+        """
+        self._last_flush = time.monotonic()
+        timestamps = self._columns['timestamp']
+        if not timestamps:
+            return
+
+        base = timestamps[0]
+        deltas = array('q', [0] * len(timestamps))
+        previous = base
+        for i, value in enumerate(timestamps):
+            deltas[i] = value - previous
+            previous = value
+
+        blocks = [zlib.compress(json.dumps(self._new_names).encode(), 1), _encode(deltas)]
+        blocks += [_encode(self._columns[name]) for name, _ in COLUMNS[1:]]
+        self.output.write(ROW_GROUP_HEADER.pack(ROW_GROUP_MARKER, len(timestamps), len(self._new_names),
+                                                base, *map(len, blocks)))
+        for block in blocks:
+            self.output.write(block)
+        self.output.flush()
+
+        self.rows += len(timestamps)
+        self._new_names = []
+        self._columns = {name: array(typecode) for name, typecode in COLUMNS}
+
+    def close(self):
+        """
+        Write the buffered reports
+        """
+        self.flush()
+
+
+def iter_row_groups(input_file: BinaryIO) -> Iterator[Dict]:
+    """
+    Iterate over the row groups of a columnar file
+    :return: Dict with the dictionary of the file so far ('names') and each
+             column, the timestamps being converted back to absolute values
+    """
+    names: List[str] = []
+    header = input_file.read(len(MAGIC))
+    if header != MAGIC:
+        raise ColumnarFormatError('not a VirtualWatts columnar file')
+    while True:
+        header = input_file.read(len(MAGIC))
+        if not header:
+            return
+        if header == MAGIC:
+            names = []
+            continue
+        header += input_file.read(ROW_GROUP_HEADER.size - len(MAGIC))
+        if len(header) != ROW_GROUP_HEADER.size:
+            raise ColumnarFormatError('truncated row group header')
+        marker, rows, _, base, *lengths = ROW_GROUP_HEADER.unpack(header)
+        if marker != ROW_GROUP_MARKER:
+            raise ColumnarFormatError('bad row group marker')
+        blocks = [input_file.read(length) for length in lengths]
+        if any(len(block) != length for block, length in zip(blocks, lengths)):
+            raise ColumnarFormatError('truncated row group')
+
+        names.extend(json.loads(zlib.decompress(blocks[0])))
+        group = {'names': names}
+        for (name, typecode), block in zip(COLUMNS, blocks[1:]):
+            group[name] = _decode(typecode, block)
+        timestamp = base
+        timestamps = group['timestamp']
+        for i, delta in enumerate(timestamps):
+            timestamp += delta
+            timestamps[i] = timestamp
+        if len(timestamps) != rows:
+            raise ColumnarFormatError('bad row count')
+        yield group
+
+
+def read_columnar(filename: str) -> Iterator[PowerReport]:
+    """
+    Iterate over the reports stored in a columnar file. The energy, when
+    stored, is set in the metadata of the reports.
+    """
+    with open(filename, 'rb') as input_file:
+        for group in iter_row_groups(input_file):
+            names = group['names']
+            for timestamp, sensor, target, power, energy in zip(
+                    group['timestamp'], group['sensor'], group['target'], group['power'], group['energy']):
+                metadata = {} if math.isnan(energy) else {'energy': energy}
+                yield PowerReport(EPOCH + timestamp * MICROSECOND, names[sensor], names[target],
+                                  power, metadata)
+
+
+class ColumnarDB(BaseDB):
+    """
+    Output database writing the reports in a columnar file
+    """
+
+    def __init__(self, report_type, filename: str, row_group_size: int = 65536,
+                 flush_interval: float = 60.0):
+        """
+        :param filename: File the reports are appended to
+        :param row_group_size: Maximal number of rows of a row group
+        :param flush_interval: Maximal time (in seconds) a report is buffered
+        """
+        BaseDB.__init__(self, report_type)
+        self.filename = filename
+        self.row_group_size = row_group_size
+        self.flush_interval = flush_interval
+        self.writer = None
+
+    def connect(self):
+        try:
+            output = open(self.filename, 'ab')  # pylint: disable=consider-using-with
+        except OSError as exn:
+            raise DBError('can\'t open ' + self.filename + ' : ' + str(exn)) from exn
+        self.writer = ColumnarWriter(output, self.row_group_size, self.flush_interval)
+
+    def iter(self, stream_mode: bool):
+        raise DBError('ColumnarDB don\'t support iter method')
+
+    def save(self, report: Report):
+        self.writer.write([report])
+
+    def save_many(self, reports: List[Report]):
+        self.writer.write(reports)
+
+    def close(self):
+        """
+        Write the buffered reports and close the file
+        """
+        if self.writer is not None:
+            self.writer.close()
+            self.writer.output.close()
+            self.writer = None
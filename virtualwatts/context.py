@@ -21,8 +21,11 @@
 # SOFTWARE.
 
 
+from datetime import timedelta
 from enum import Enum
 
+from .balance import DEFAULT_HALF_LIFE
+
 
 class VirtualWattsFormulaScope(Enum):
     """
@@ -33,18 +36,150 @@ class VirtualWattsFormulaScope(Enum):
     DRAM = "dram"
 
 
+class SyncEvictionPolicy(Enum):
+    """
+    Enum used to set the report dropped when a sync buffer is full.
+    """
+
+    DROP_OLDEST = "drop-oldest"
+    DROP_NEWEST = "drop-newest"
+    MAX_AGE = "max-age"
+
+
+class SyncMode(Enum):
+    """
+    Enum used to set how the sync pair the power and procfs reports.
+    """
+
+    NEAREST = "nearest"
+    INTERPOLATE = "interpolate"
+
+
+class BackpressurePolicy(Enum):
+    """
+    Enum used to set what the formula does with the estimations of a pusher
+    that falls behind.
+    """
+
+    COALESCE = "coalesce"
+    DROP = "drop"
+    BLOCK = "block"
+
+
 class VirtualWattsFormulaConfig:
     """
     Global config of the VirtualWatts formula.
     """
 
-    def __init__(self, reports_sampling_interval, delay_threshold):
+    def __init__(self, reports_sampling_interval, delay_threshold,
+                 batch_output=False, attribution_engine='python',
+                 sync_max_power_reports=None, sync_max_procfs_reports=None,
+                 sync_eviction_policy=SyncEvictionPolicy.DROP_OLDEST,
+                 sync_max_age=10, sync_stats_period=0, verbose=False,
+                 instrumentation=None, instrumentation_period=10,
+                 instrumentation_file='virtualwatts_instrumentation.jsonl',
+                 instrumentation_port=9101, aggregation_window=0,
+                 sync_mode=SyncMode.NEAREST, delta_output=False,
+                 delta_relative_epsilon=0.0, delta_absolute_epsilon=0.0,
+                 delta_max_silence=0, min_usage_share=0.0, top_targets=0,
+                 pusher_max_pending=0,
+                 backpressure_policy=BackpressurePolicy.COALESCE,
+                 energy_balance=False, idle_baseline=False,
+                 idle_baseline_half_life=DEFAULT_HALF_LIFE):
         """
         Initialize a new formula config object.
         :param reports_sampling_interval: The time interval
         between two reports (in milliseconds)
         :param delay_threshold: Delay threshold to pair
                                 two report (in milliseconds)
+        :param batch_output: Send one PowerReportBatch per synced pair
+                             instead of one PowerReport per target
+        :param attribution_engine: Engine used to split the power between
+                                   the targets (numpy or python)
+        :param sync_max_power_reports: Maximal number of power reports
+                                       buffered by the sync (None: no limit)
+        :param sync_max_procfs_reports: Maximal number of procfs reports
+                                        buffered by the sync (None: no limit)
+        :param sync_eviction_policy: Report dropped when a sync buffer is full
+        :param sync_max_age: With the max-age policy, buffered reports older
+                             than sync_max_age sampling intervals are dropped
+        :param sync_stats_period: Period (in seconds) between two logs of the
+                                  sync statistics (0: never)
+        :param verbose: True if debug logs are enabled
+        :param instrumentation: Sink of the latency histograms of the formula
+                                (log, file or prometheus, None: disabled)
+        :param instrumentation_period: Period (in seconds) between two flushes
+                                       of the histograms to the sink
+        :param instrumentation_file: File used by the file sink
+        :param instrumentation_port: First port tried by the prometheus sink
+        :param aggregation_window: Length (in seconds) of the windows the
+                                   estimations are aggregated over (0: no
+                                   aggregation)
+        :param sync_mode: Pair the reports with the nearest timestamp or
+                          interpolate the power at each procfs report
+        :param delta_output: Only send the estimations of the targets whose
+                             power changed since the last one sent
+        :param delta_relative_epsilon: Relative change under which an
+                                       estimation is not sent
+        :param delta_absolute_epsilon: Change (in Watt) under which an
+                                       estimation is not sent
+        :param delta_max_silence: Maximal time (in seconds) between two
+                                  estimations sent for a target (0: no limit)
+        :param min_usage_share: Minimal share of the VM power a target must
+                                use to get its own estimation, the others are
+                                gathered in the "other" target
+        :param top_targets: Number of greatest consumers that get their own
+                            estimation (0: all)
+        :param pusher_max_pending: Number of ticks a pusher can have unsaved
+                                   before the backpressure policy is applied
+                                   (0: no flow control)
+        :param backpressure_policy: What to do with the estimations of a
+                                    pusher that falls behind : coalesce them
+                                    into one window, drop them or stop pairing
+                                    reports until it catches up
+        :param energy_balance: True to send the power not attributed to the
+                               targets as the "unattributed" target, so that
+                               the estimations sum up to the VM power
+        :param idle_baseline: True to also send the static power of the VM,
+                              estimated online, as the "idle" target. It
+                              implies the energy balance
+        :param idle_baseline_half_life: Number of estimations after which a
+                                        sample weights half as much in the
+                                        static power regression
         """
         self.reports_sampling_interval = reports_sampling_interval
         self.delay_threshold = delay_threshold
+        self.batch_output = batch_output
+        self.attribution_engine = attribution_engine
+        self.sync_max_power_reports = sync_max_power_reports
+        self.sync_max_procfs_reports = sync_max_procfs_reports
+        self.sync_eviction_policy = SyncEvictionPolicy(sync_eviction_policy)
+        self.sync_max_age = sync_max_age
+        self.sync_stats_period = sync_stats_period
+        self.verbose = verbose
+        self.instrumentation = instrumentation
+        self.instrumentation_period = instrumentation_period
+        self.instrumentation_file = instrumentation_file
+        self.instrumentation_port = instrumentation_port
+        self.aggregation_window = aggregation_window
+        self.sync_mode = SyncMode(sync_mode)
+        self.delta_output = delta_output
+        self.delta_relative_epsilon = delta_relative_epsilon
+        self.delta_absolute_epsilon = delta_absolute_epsilon
+        self.delta_max_silence = delta_max_silence
+        self.min_usage_share = min_usage_share
+        self.top_targets = top_targets
+        self.pusher_max_pending = pusher_max_pending
+        self.backpressure_policy = BackpressurePolicy(backpressure_policy)
+        self.energy_balance = energy_balance
+        self.idle_baseline = idle_baseline
+        self.idle_baseline_half_life = idle_baseline_half_life
+
+    @property
+    def sampling_interval(self) -> timedelta:
+        """
+        :return: The time interval between two reports
+        """
+        if isinstance(self.reports_sampling_interval, timedelta):
+            return self.reports_sampling_interval
+        return timedelta(milliseconds=self.reports_sampling_interval)
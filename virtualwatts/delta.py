@@ -0,0 +1,97 @@
+# MIT License
+
+# Copyright (c) 2021 PowerAPI
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Module that define the change detection used to only send the estimations
+of the targets whose power changed
+
+Accuracy bound : a consumer that holds the last received power of each
+target knows, at any time, the power of every target seen in the last tick
+within max(absolute, relative * |last sent power|) Watt. The energy it
+computes by integrating these values is off by at most this bound times the
+sampling interval, per target and per tick. A held value is never older
+than max_silence, so a target missing for longer than max_silence (a
+stopped cgroup, for example) must be considered gone.
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict
+
+from .aggregation import EPOCH
+from .targets import TargetArray, TargetTable
+
+
+class DeltaFilter:
+    """
+    Keep the last power sent for each target and drop the estimations that
+    are within the tolerance of this power
+    """
+
+    def __init__(self, targets: TargetTable, relative: float = 0.0,
+                 absolute: float = 0.0, max_silence: timedelta = None):
+        """
+        :param targets: Table used to intern the target names
+        :param relative: Relative change (0.05 for 5%) under which an
+                         estimation is not sent
+        :param absolute: Change (in Watt) under which an estimation is not
+                         sent. With both tolerances null, only the estimations
+                         equal to the last sent one are dropped
+        :param max_silence: Maximal time between two estimations sent for the
+                            same target (None : no heartbeat)
+        """
+        self.targets = targets
+        self.relative = relative
+        self.absolute = absolute
+        self.max_silence = max_silence.total_seconds() if max_silence else 0.0
+        self.sent = 0
+        self.dropped = 0
+        self._last_power = TargetArray(float('nan'))
+        self._last_time = TargetArray(float('-inf'))
+        targets.track(self._last_power)
+        targets.track(self._last_time)
+
+    def filter(self, timestamp: datetime,
+               powers: Dict[str, float]) -> Dict[str, float]:
+        """
+        :return: The estimations that must be sent, the last sent power of
+                 their target is updated
+        """
+        now = (timestamp - EPOCH).total_seconds()
+        oldest = now - self.max_silence if self.max_silence else float('-inf')
+        intern = self.targets.intern
+        last_power = self._last_power
+        last_time = self._last_time
+        changed = {}
+        for target, power in powers.items():
+            target_id = intern(target)
+            previous = last_power.get(target_id)
+            # a never sent target has a nan power, always beyond the tolerance
+            tolerance = max(self.absolute, self.relative * abs(previous))
+            if abs(power - previous) <= tolerance and \
+                    last_time.get(target_id) > oldest:
+                continue
+            last_power.set(target_id, power)
+            last_time.set(target_id, now)
+            changed[target] = power
+        self.sent += len(changed)
+        self.dropped += len(powers) - len(changed)
+        return changed
@@ -0,0 +1,87 @@
+# MIT License
+
+# Copyright (c) 2021 PowerAPI
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Module that define the dispatch rules used to shard the VirtualWatts formula
+"""
+
+import zlib
+from typing import List
+
+from powerapi.dispatch_rule import DispatchRule
+from powerapi.report import PowerReport, ProcfsReport
+
+from virtualwatts.report import ProcfsReportShard
+
+
+def shard_of(target: str, shards: int) -> int:
+    """
+    :return: The index of the shard that handle the target. The index is
+             stable between processes, unlike the builtin hash
+    """
+    return zlib.crc32(target.encode()) % shards
+
+
+def split_procfs_report(report: ProcfsReport, shards: int) -> List[ProcfsReportShard]:
+    """
+    Split the usage of the report between the shards. Each shard receive a
+    report, even without target, to pair it with its copy of the power report.
+    :return: The report of each shard
+    """
+    usages = [{} for _ in range(shards)]
+    for target, usage in report.usage.items():
+        usages[shard_of(target, shards)][target] = usage
+    usage_total = sum(report.usage.values())
+    return [ProcfsReportShard(report.timestamp, report.sensor, report.target,
+                              usage, report.global_cpu_usage, shard,
+                              usage_total)
+            for shard, usage in enumerate(usages)]
+
+
+class ShardedPowerDispatchRule(DispatchRule):
+    """
+    Send the power report of a sensor to every shard of the formula
+    """
+
+    def __init__(self, shards: int, primary=False):
+        """
+        :param shards: Number of formula per sensor
+        """
+        DispatchRule.__init__(self, primary)
+        self.shards = shards
+        self.fields = ['sensor', 'shard']
+
+    def get_formula_id(self, report: PowerReport):
+        return [(report.sensor, shard) for shard in range(self.shards)]
+
+
+class ShardedProcfsDispatchRule(DispatchRule):
+    """
+    Send a procfs report shard to the formula of its shard
+    """
+
+    def __init__(self, primary=False):
+        DispatchRule.__init__(self, primary)
+        self.fields = ['sensor', 'shard']
+
+    def get_formula_id(self, report: ProcfsReportShard):
+        return [(report.sensor, report.shard)]
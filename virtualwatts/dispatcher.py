@@ -0,0 +1,193 @@
+# MIT License
+
+# Copyright (c) 2021 PowerAPI
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Module that define the dispatcher used to shard the VirtualWatts formula and
+to bound the number of formula actors
+"""
+
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Dict, List, Tuple
+
+from thespian.actors import ActorAddress, ActorExitRequest, WakeupMessage
+
+from powerapi.dispatcher import DispatcherActor
+from powerapi.message import DispatcherStartMessage
+from powerapi.report import ProcfsReport
+
+from virtualwatts.dispatch_rule import split_procfs_report
+from virtualwatts.message import FormulaStateMessage, ReapFormulaMessage
+
+#: Number of idle timeouts after which the state of a reaped formula is
+#: forgotten if the reports of its sensor did not resume
+PARKED_STATE_TIMEOUTS = 10
+#: Number of states of reaped formulas kept per formula of the pool
+PARKED_STATES_PER_FORMULA = 10
+
+
+class VirtualWattsDispatcherStartMessage(DispatcherStartMessage):
+    """
+    Message used to start a VirtualWattsDispatcherActor
+    """
+
+    def __init__(self, sender_name, name, formula_class, formula_values,
+                 route_table, device_id, shards: int, max_formulas: int = 0,
+                 idle_timeout: float = 0):
+        """
+        :param shards: Number of formula per sensor
+        :param max_formulas: Maximum number of running formulas, the least
+                             recently used one is reaped to start a new one.
+                             0 for no limit
+        :param idle_timeout: Time (in seconds) after which a formula that did
+                             not receive any report is reaped. 0 to never
+                             reap idle formulas
+        """
+        DispatcherStartMessage.__init__(self, sender_name, name, formula_class,
+                                        formula_values, route_table, device_id)
+        self.shards = shards
+        self.max_formulas = max_formulas
+        self.idle_timeout = idle_timeout
+
+
+class VirtualWattsDispatcherActor(DispatcherActor):
+    """
+    Dispatcher that split the usage of each procfs report between the shards
+    of the formula of its sensor, and that bound the number of formula actors
+    as the sensors come and go.
+
+    A formula is reaped when it is idle for too long or when the pool is full
+    and it is the least recently used one. Before exiting it sends its state
+    back to the dispatcher, that park it and give it to the new formula
+    created if the reports of its sensor resume. The reports received while
+    waiting for the state are kept and sent to this new formula.
+    """
+
+    def __init__(self):
+        DispatcherActor.__init__(self)
+        self.start_message_cls = VirtualWattsDispatcherStartMessage
+        self.shards = 1
+        self.max_formulas = 0
+        self.idle_timeout = 0
+        self.last_activity: Dict[str, float] = {}
+        self.reaping: Dict[str, List] = {}
+        self.parked: Dict[Tuple, Tuple[float, Dict]] = OrderedDict()
+
+    def _initialization(self, message: VirtualWattsDispatcherStartMessage):
+        DispatcherActor._initialization(self, message)
+        self.shards = message.shards
+        self.max_formulas = message.max_formulas
+        self.idle_timeout = message.idle_timeout
+        if self.idle_timeout > 0:
+            self.wakeupAfter(timedelta(seconds=self.idle_timeout / 2))
+
+    def _send_message(self, formula_name, message):
+        if formula_name in self.reaping:
+            self.reaping[formula_name].append(message)
+            return
+        if formula_name not in self.formula_pool and \
+           formula_name not in self.formula_waiting_service.formulas:
+            # Name of a reaped formula still in the tree of the name service
+            return
+        self.last_activity[formula_name] = time.monotonic()
+        DispatcherActor._send_message(self, formula_name, message)
+
+    def _create_formula(self, formula_id: Tuple,
+                        formula_name: str) -> ActorAddress:
+        if self.max_formulas > 0:
+            running = len(self.formula_pool) + \
+                len(self.formula_waiting_service.formulas)
+            if running >= self.max_formulas and self.formula_pool:
+                self._reap(min(self.formula_pool,
+                               key=lambda name: self.last_activity.get(name, 0)))
+        formula = DispatcherActor._create_formula(self, formula_id,
+                                                  formula_name)
+        self.last_activity[formula_name] = time.monotonic()
+        parked = self.parked.pop(formula_id, None)
+        if parked is not None:
+            self.log_debug('restore the state of ' + formula_name)
+            self.send(formula, FormulaStateMessage(self.name, parked[1]))
+        return formula
+
+    def _reap(self, formula_name: str):
+        """
+        Ask a running formula for its state before stopping it. The messages
+        for this formula are kept until its state is received.
+        """
+        self.log_info('reap formula ' + formula_name)
+        formula, _ = self.formula_pool.pop(formula_name)
+        self.last_activity.pop(formula_name, None)
+        self.reaping[formula_name] = []
+        self.send(formula, ReapFormulaMessage(self.name))
+
+    def receiveMsg_FormulaStateMessage(self, message: FormulaStateMessage,
+                                       sender: ActorAddress):
+        """
+        Stop the reaped formula that sent its state, and park the state until
+        the reports of its sensor resume
+        """
+        self.send(sender, ActorExitRequest())
+        formula_name = message.sender_name
+        messages = self.reaping.pop(formula_name, None)
+        if messages is None:
+            return
+        formula_id = self.formula_name_service.get_formula_id(formula_name)
+        self.formula_name_service.remove_formula(formula_name)
+        self.parked[formula_id] = (time.monotonic(), message.state)
+        if self.max_formulas > 0:
+            while len(self.parked) > PARKED_STATES_PER_FORMULA * self.max_formulas:
+                self.parked.popitem(last=False)
+        if messages:
+            new_name = self._gen_formula_name(formula_id)
+            formula = self._create_formula(formula_id, new_name)
+            self.formula_name_service.add(formula_id, new_name)
+            self.formula_waiting_service.add(new_name, formula)
+            for report in messages:
+                self.formula_waiting_service.add_message(new_name, report)
+
+    def receiveMsg_WakeupMessage(self, _: WakeupMessage, __: ActorAddress):
+        """
+        Reap the formulas that did not receive any report for too long and
+        forget the states parked for too long
+        """
+        now = time.monotonic()
+        for formula_name in [name for name in self.formula_pool
+                             if now - self.last_activity.get(name, now) >= self.idle_timeout]:
+            self._reap(formula_name)
+        expired = now - PARKED_STATE_TIMEOUTS * self.idle_timeout
+        for formula_id in [formula_id for formula_id, (parked_at, _) in self.parked.items()
+                           if parked_at < expired]:
+            del self.parked[formula_id]
+        self.wakeupAfter(timedelta(seconds=self.idle_timeout / 2))
+
+    def receiveMsg_ProcfsReport(self, message: ProcfsReport,
+                                sender: ActorAddress):
+        """
+        When receiving a procfs report, split it into one report per shard and
+        dispatch them, or dispatch it unchanged without shards
+        """
+        if self.shards == 1:
+            self.receiveMsg_Report(message, sender)
+            return
+        for report in split_procfs_report(message, self.shards):
+            self.receiveMsg_Report(report, sender)
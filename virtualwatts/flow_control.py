@@ -0,0 +1,128 @@
+# MIT License
+
+# Copyright (c) 2021 PowerAPI
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Module that define the credit based flow control between the formula and
+its pushers
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from .aggregation import EnergyWindow
+from .context import BackpressurePolicy
+
+
+class PusherFlowControl:
+    """
+    Count the ticks sent to a pusher and not acknowledged yet.
+
+    After the estimations of each tick, the formula asks the pusher for an
+    acknowledgement, that the pusher sends once it saved them. While max_pending
+    ticks are unacknowledged, the pusher is behind and the formula applies
+    the backpressure policy to the next ticks.
+    """
+
+    __slots__ = ('name', 'max_pending', 'policy', 'sample_duration', 'sent',
+                 'acked', 'dropped', 'coalesced', 'behind', 'window',
+                 'window_end')
+
+    def __init__(self, name: str, max_pending: int,
+                 policy: BackpressurePolicy, sample_duration: timedelta):
+        """
+        :param name: Name of the pusher
+        :param max_pending: Number of unacknowledged ticks above which the
+                            pusher is behind
+        :param policy: What to do with the ticks of a pusher that is behind
+        :param sample_duration: Time covered by one tick
+        """
+        self.name = name
+        self.max_pending = max_pending
+        self.policy = policy
+        self.sample_duration = sample_duration
+        self.sent = 0
+        self.acked = 0
+        self.dropped = 0
+        self.coalesced = 0
+        #: True from the first tick held until the pusher is ready again
+        self.behind = False
+        self.window: Optional[EnergyWindow] = None
+        self.window_end = None
+
+    @property
+    def pending(self) -> int:
+        """
+        :return: The number of ticks sent and not acknowledged yet
+        """
+        return self.sent - self.acked
+
+    def ready(self) -> bool:
+        """
+        :return: True if the pusher can receive the next tick
+        """
+        return self.pending < self.max_pending
+
+    def ack(self, tick: int) -> bool:
+        """
+        Acknowledge every tick up to the given one
+        :return: True if the pusher was behind and is ready again
+        """
+        self.acked = max(self.acked, tick)
+        if self.behind and self.ready():
+            self.behind = False
+            return True
+        return False
+
+    def hold(self, timestamp: datetime, powers: Dict[str, float]):
+        """
+        Apply the policy to a tick the pusher can't receive : drop it or add
+        it to the coalesced window
+        """
+        self.behind = True
+        if self.policy is BackpressurePolicy.DROP:
+            self.dropped += len(powers)
+            return
+        if self.window is None:
+            self.window = EnergyWindow(timestamp, self.sample_duration,
+                                       self.sample_duration)
+        self.window.add(timestamp, powers)
+        self.window_end = timestamp
+        self.coalesced += len(powers)
+
+    def release(self) -> Optional[EnergyWindow]:
+        """
+        :return: The window coalescing the held ticks, if any, and forget it
+        """
+        window = self.window
+        if window is not None:
+            window.duration = (self.window_end - window.start +
+                               self.sample_duration)
+        self.window = None
+        self.window_end = None
+        return window
+
+    def statistics(self) -> Dict:
+        """
+        :return: The counters of the flow control
+        """
+        return {'sent': self.sent, 'pending': self.pending,
+                'dropped': self.dropped, 'coalesced': self.coalesced}
@@ -0,0 +1,93 @@
+# MIT License
+
+# Copyright (c) 2021 PowerAPI
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Generators of the VirtualWatts pullers and pushers
+
+Importing powerapi.cli.generator imports every database module of PowerAPI
+and their client libraries, this module is thus only imported when
+VirtualWatts starts its actors
+"""
+
+from typing import Dict
+
+from powerapi.cli.generator import PullerGenerator, PusherGenerator
+
+from virtualwatts.pusher import (VirtualWattsPusherActor,
+                                 VirtualWattsPusherStartMessage)
+
+
+def _columnar_db(db_config: Dict):
+    # the output modules are only imported when they are used
+    from virtualwatts.columnar import ColumnarDB  # pylint: disable=import-outside-toplevel
+    return ColumnarDB(db_config["model"], db_config["filename"],
+                      db_config["row_group_size"],
+                      db_config["flush_interval"])
+
+
+def _binary_socket_db(db_config: Dict):
+    from virtualwatts.wire import BinarySocketDB  # pylint: disable=import-outside-toplevel
+    return BinarySocketDB(db_config["model"], db_config["port"])
+
+
+def _tail_file_db(db_config: Dict):
+    from virtualwatts.tail import TailFileDB  # pylint: disable=import-outside-toplevel
+    return TailFileDB(db_config["model"], db_config["filename"])
+
+
+class VirtualWattsPullerGenerator(PullerGenerator):
+    """
+    Generate puller actors from config, with the VirtualWatts inputs
+    """
+
+    def __init__(self, report_filter, report_modifier_list=()):
+        PullerGenerator.__init__(self, report_filter,
+                                 list(report_modifier_list))
+        self.add_db_factory("binary_socket", _binary_socket_db)
+        self.add_db_factory("tailfile", _tail_file_db)
+
+
+class VirtualWattsPusherGenerator(PusherGenerator):
+    """
+    Generate VirtualWatts pusher actors, that can handle PowerReportBatch,
+    from config
+    """
+
+    def __init__(self, bulk_size: int = 1, flush_interval: float = 1.0):
+        """
+        :param bulk_size: Number of reports saved by each write of a pusher
+        :param flush_interval: Maximum time (in seconds) a report is buffered
+                               by a pusher
+        """
+        PusherGenerator.__init__(self)
+        self.add_db_factory("columnar", _columnar_db)
+        self.bulk_size = bulk_size
+        self.flush_interval = flush_interval
+
+    def _actor_factory(self, _):
+        return VirtualWattsPusherActor
+
+    def _start_message_factory(self, name, db, _model, _stream_mode,
+                               _level_logger):
+        return VirtualWattsPusherStartMessage("system", name, db,
+                                              self.bulk_size,
+                                              self.flush_interval)
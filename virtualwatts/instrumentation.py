@@ -0,0 +1,298 @@
+# MIT License
+
+# Copyright (c) 2021 PowerAPI
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Module that define the optional instrumentation of the VirtualWatts formula
+"""
+
+import json
+import logging
+import threading
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional
+
+from powerapi.exception import PowerAPIExceptionWithMessage
+
+
+#: Stages of the formula pipeline that are timed
+SYNC_WAIT = 'sync_wait'
+ATTRIBUTION = 'attribution'
+FANOUT = 'fanout'
+END_TO_END_LAG = 'end_to_end_lag'
+STAGES = (SYNC_WAIT, ATTRIBUTION, FANOUT, END_TO_END_LAG)
+
+#: Upper bounds (in seconds) of the histogram buckets, from 1µs to 100s
+DEFAULT_BUCKETS = (0.000001, 0.0000025, 0.000005, 0.00001, 0.000025, 0.00005,
+                   0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+                   0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 25.0, 50.0, 100.0)
+
+
+class UnknownInstrumentationSink(PowerAPIExceptionWithMessage):
+    """
+    Exception raised when the requested instrumentation sink can't be used
+    """
+
+
+class Histogram:
+    """
+    Latency histogram with fixed buckets, as exposed by Prometheus
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        """
+        :param buckets: Sorted upper bounds of the buckets (in seconds)
+        """
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        """
+        Add a duration (in seconds) to the histogram
+        """
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        :return: The upper bound of the bucket holding the q quantile, None if
+                 the histogram is empty and inf if it is above the last bucket
+        """
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+    def snapshot(self) -> Dict:
+        """
+        :return: The content of the histogram as a json serializable dict
+        """
+        p99 = self.quantile(0.99)
+        return {'count': self.count, 'sum': self.sum,
+                'p50': self.quantile(0.5),
+                'p99': None if p99 == float('inf') else p99,
+                'buckets': dict(zip(map(str, self.buckets), self.counts))}
+
+
+class FormulaInstrumentation:
+    """
+    Histograms of the time spent by the reports in each stage of a formula
+    """
+
+    def __init__(self, formula_name: str, sink: 'InstrumentationSink'):
+        """
+        :param formula_name: Name of the instrumented formula
+        :param sink: Sink the histograms are flushed to
+        """
+        self.formula_name = formula_name
+        self.sink = sink
+        self.histograms = {stage: Histogram() for stage in STAGES}
+
+    def observe(self, stage: str, value: float):
+        """
+        Add a duration (in seconds) to the histogram of the given stage
+        """
+        self.histograms[stage].observe(value)
+
+    def flush(self):
+        """
+        Give the histograms to the sink
+        """
+        self.sink.flush(self.formula_name, self.histograms)
+
+    def close(self):
+        """
+        Release the resources of the sink
+        """
+        self.sink.close()
+
+
+class InstrumentationSink:
+    """
+    Destination of the histograms of a formula
+    """
+
+    #: Name used to select the sink from the cli
+    name = None
+
+    def flush(self, formula_name: str, histograms: Dict[str, Histogram]):
+        """
+        Export the histograms of a formula
+        """
+        raise NotImplementedError()
+
+    def close(self):
+        """
+        Release the resources of the sink
+        """
+
+
+class LogInstrumentationSink(InstrumentationSink):
+    """
+    Log a summary (count, mean, p50 and p99) of each histogram
+    """
+
+    name = 'log'
+
+    def __init__(self, log: Callable[[str], None] = logging.info):
+        """
+        :param log: Function used to log the summary
+        """
+        self.log = log
+
+    def flush(self, formula_name: str, histograms: Dict[str, Histogram]):
+        summaries = []
+        for stage, histogram in histograms.items():
+            mean = histogram.sum / histogram.count if histogram.count else 0
+            summaries.append('%s: count=%d mean=%.6fs p50<=%ss p99<=%ss' % (
+                stage, histogram.count, mean, histogram.quantile(0.5),
+                histogram.quantile(0.99)))
+        self.log('instrumentation ' + formula_name + ' : ' +
+                 ', '.join(summaries))
+
+
+class FileInstrumentationSink(InstrumentationSink):
+    """
+    Append a json snapshot of the histograms to a file at each flush
+    """
+
+    name = 'file'
+
+    def __init__(self, filename: str):
+        """
+        :param filename: Name of the file the snapshots are appended to
+        """
+        self.filename = filename
+
+    def flush(self, formula_name: str, histograms: Dict[str, Histogram]):
+        snapshot = {'formula': formula_name,
+                    'histograms': {stage: histogram.snapshot()
+                                   for stage, histogram in histograms.items()}}
+        with open(self.filename, 'a') as output:
+            output.write(json.dumps(snapshot) + '\n')
+
+
+class PrometheusInstrumentationSink(InstrumentationSink):
+    """
+    Expose the histograms with the Prometheus text format on an http endpoint
+    served by a thread of the formula process.
+
+    Each formula runs in its own process : the first free port starting from
+    the given one is used and logged.
+    """
+
+    name = 'prometheus'
+
+    #: Number of ports tried after the given one
+    max_port_attempts = 64
+
+    def __init__(self, port: int, address: str = '127.0.0.1'):
+        """
+        :param port: First port tried by the http server
+        :param address: Address the http server listen on
+        """
+        self.exposition = b''
+        self.server = self._bind(address, port)
+        self.port = self.server.server_address[1]
+        thread = threading.Thread(target=self.server.serve_forever,
+                                  daemon=True)
+        thread.start()
+
+    def _bind(self, address: str, port: int):
+        # only loaded by the formulas that expose their instrumentation
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer  # pylint: disable=import-outside-toplevel
+        sink = self
+
+        class Handler(BaseHTTPRequestHandler):
+            """
+            Answer the last exposition to every GET request
+            """
+            def do_GET(self):  # pylint: disable=invalid-name
+                """
+                Send the metrics
+                """
+                body = sink.exposition
+                self.send_response(200)
+                self.send_header('Content-Type',
+                                 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *_):
+                pass
+
+        error = None
+        for attempt in range(self.max_port_attempts if port else 1):
+            try:
+                return ThreadingHTTPServer((address, port + attempt), Handler)
+            except OSError as exn:
+                error = exn
+        raise UnknownInstrumentationSink('unable to expose the instrumentation'
+                                         ' endpoint : ' + str(error))
+
+    def flush(self, formula_name: str, histograms: Dict[str, Histogram]):
+        lines: List[str] = []
+        for stage, histogram in histograms.items():
+            metric = 'virtualwatts_' + stage + '_seconds'
+            labels = 'formula="' + formula_name + '"'
+            lines.append('# TYPE ' + metric + ' histogram')
+            cumulated = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulated += count
+                lines.append('%s_bucket{%s,le="%s"} %d' % (metric, labels,
+                                                           bound, cumulated))
+            lines.append('%s_bucket{%s,le="+Inf"} %d' % (metric, labels,
+                                                         histogram.count))
+            lines.append('%s_sum{%s} %r' % (metric, labels, histogram.sum))
+            lines.append('%s_count{%s} %d' % (metric, labels, histogram.count))
+        self.exposition = ('\n'.join(lines) + '\n').encode()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def get_instrumentation_sink(name: str, filename: str = None,
+                             port: int = 0, log=logging.info) -> InstrumentationSink:
+    """
+    :param name: Name of the sink (log, file or prometheus)
+    :param filename: File used by the file sink
+    :param port: First port tried by the prometheus sink
+    :param log: Function used by the log sink
+    :return: An instrumentation sink
+    """
+    if name == LogInstrumentationSink.name:
+        return LogInstrumentationSink(log)
+    if name == FileInstrumentationSink.name:
+        return FileInstrumentationSink(filename)
+    if name == PrometheusInstrumentationSink.name:
+        return PrometheusInstrumentationSink(port)
+    raise UnknownInstrumentationSink('unknown instrumentation sink ' + str(name))
@@ -0,0 +1,133 @@
+# MIT License
+
+# Copyright (c) 2021 PowerAPI
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Module that define the messages handled by the VirtualWatts actors
+"""
+
+from typing import Dict
+
+from powerapi.message import Message
+
+
+class GetSyncStatisticsMessage(Message):
+    """
+    Message used to ask the formula for the statistics of its sync
+    """
+
+    def __str__(self):
+        return 'GetSyncStatisticsMessage'
+
+
+class SyncStatisticsMessage(Message):
+    """
+    Message sent by the formula with the statistics of its sync
+    """
+
+    def __init__(self, sender_name: str, statistics: Dict):
+        """
+        :param statistics: Number of formed pairs and number of buffered,
+                           evicted and unpaired reports of each type
+        """
+        Message.__init__(self, sender_name)
+        self.statistics = statistics
+
+    def __str__(self):
+        return 'SyncStatisticsMessage : ' + str(self.statistics)
+
+
+class AckRequestMessage(Message):
+    """
+    Message sent by the formula to a pusher after the estimations of a tick,
+    to know when the pusher saved them
+    """
+
+    def __init__(self, sender_name: str, pusher: str, tick: int):
+        """
+        :param pusher: Name the formula gives to the pusher
+        :param tick: Number of the tick
+        """
+        Message.__init__(self, sender_name)
+        self.pusher = pusher
+        self.tick = tick
+
+    def __str__(self):
+        return 'AckRequestMessage(%s, %d)' % (self.pusher, self.tick)
+
+
+class AckMessage(Message):
+    """
+    Message sent by a pusher when it saved the estimations of every tick up
+    to the acknowledged one
+    """
+
+    def __init__(self, sender_name: str, pusher: str, tick: int):
+        """
+        :param pusher: Name the formula gives to the pusher
+        :param tick: Number of the acknowledged tick
+        """
+        Message.__init__(self, sender_name)
+        self.pusher = pusher
+        self.tick = tick
+
+    def __str__(self):
+        return 'AckMessage(%s, %d)' % (self.pusher, self.tick)
+
+
+class ReapFormulaMessage(Message):
+    """
+    Message sent by the dispatcher to a formula it is about to stop, to get
+    the state the formula needs to resume the estimation of its sensor
+    """
+
+    def __str__(self):
+        return 'ReapFormulaMessage'
+
+
+class FormulaStateMessage(Message):
+    """
+    Message carrying the state of a stopped formula : sent by the formula to
+    the dispatcher when it is reaped, and back to a new formula when the
+    reports of its sensor resume. The unfinished aggregation window is not
+    part of the state, the formula sends it before being reaped.
+    """
+
+    def __init__(self, sender_name: str, state: Dict):
+        """
+        :param state: The sync, target table, delta filter and energy balance
+                      of the formula (keys sync, targets, delta and balance)
+        """
+        Message.__init__(self, sender_name)
+        self.state = state
+
+    def __str__(self):
+        return 'FormulaStateMessage(%s)' % self.sender_name
+
+
+class FlushMessage(Message):
+    """
+    Message used to ask a pusher to save the reports it buffered. The pusher
+    answer with an OKMessage once they are saved
+    """
+
+    def __str__(self):
+        return 'FlushMessage'
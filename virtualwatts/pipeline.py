@@ -0,0 +1,162 @@
+# MIT License
+
+# Copyright (c) 2021 PowerAPI
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Module that define the estimation pipeline of the formula, shared by the
+VirtualWatts actor, the offline replay and the asyncio runtime
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from powerapi.report import PowerReport, ProcfsReport
+
+from .aggregation import EnergyAggregator, EnergyWindow, target_max_idle
+from .attribution import get_attribution_engine, report_cpu_usage
+from .balance import EnergyBalance
+from .context import VirtualWattsFormulaConfig
+from .delta import DeltaFilter
+from .selection import TargetSelector
+from .targets import TargetTable
+
+#: Timestamp, power of each target and, for an aggregation window, metadata
+#: of each target, of the estimations to send
+Estimation = Tuple[datetime, Dict[str, float], Optional[Dict[str, Dict]]]
+
+
+class EstimationPipeline:
+    """
+    Compute the estimations of one sensor from its synced pairs.
+
+    The power of each pair is split between its targets, only the selected
+    targets are kept, completed by the power they are not attributed with
+    the energy balance. The estimations are then aggregated over time
+    windows and, with the delta output, only the targets whose power changed
+    are kept.
+    """
+
+    def __init__(self, config: VirtualWattsFormulaConfig):
+        """
+        :param config: Configuration of the formula
+        :raise UnknownAttributionEngine: If the attribution engine can't be
+                                         used
+        """
+        self.engine = get_attribution_engine(config.attribution_engine)
+        window = timedelta(seconds=config.aggregation_window)
+        self.targets = TargetTable(
+            target_max_idle(window, config.sampling_interval))
+        self.aggregator = None
+        if config.aggregation_window > 0:
+            self.aggregator = EnergyAggregator(
+                window, config.sampling_interval, self.targets)
+        self.selector = None
+        if config.min_usage_share > 0 or config.top_targets > 0:
+            self.selector = TargetSelector(config.min_usage_share,
+                                           config.top_targets)
+        self.balance = None
+        if config.energy_balance or config.idle_baseline:
+            self.balance = EnergyBalance(config.idle_baseline,
+                                         config.idle_baseline_half_life)
+        self.delta = None
+        if config.delta_output:
+            self.delta = DeltaFilter(
+                self.targets, config.delta_relative_epsilon,
+                config.delta_absolute_epsilon,
+                timedelta(seconds=config.delta_max_silence))
+        # the target table is only used by the aggregator and the delta
+        # filter, the default path does not pay for the interning
+        self._interned = self.aggregator is not None or self.delta is not None
+
+    def attribute(self, pairs: Iterable[Tuple[PowerReport, ProcfsReport]]) -> List[Dict[str, float]]:
+        """
+        :return: The power consumption of each target, for each synced pair
+        """
+        return self.engine.attribute_many(
+            (pw_report.power, use_report.usage, report_cpu_usage(use_report))
+            for pw_report, use_report in pairs)
+
+    def estimate(self, pw_report: PowerReport, use_report: ProcfsReport,
+                 powers: Dict[str, float]) -> Optional[Estimation]:
+        """
+        :param powers: Power consumption of each target attributed from the
+                       pair of reports
+        :return: The estimations to send for this pair, None if there is
+                 nothing to send yet
+        """
+        timestamp = pw_report.timestamp
+        if self.selector is not None:
+            powers = self.selector.select(pw_report.power, powers)
+        if self.balance is not None:
+            powers = self.balance.balance(pw_report.power, use_report.usage,
+                                          report_cpu_usage(use_report), powers)
+        if self._interned:
+            self.targets.update(powers)
+        if self.aggregator is not None:
+            window = self.aggregator.add(timestamp, powers)
+            return None if window is None else self._window_estimation(window)
+        if self.delta is not None:
+            powers = self.delta.filter(timestamp, powers)
+            if not powers:
+                return None
+        return timestamp, powers, None
+
+    def flush(self) -> Optional[Estimation]:
+        """
+        :return: The estimations of the unfinished aggregation window, if any
+        """
+        if self.aggregator is None:
+            return None
+        window = self.aggregator.flush()
+        return None if window is None else self._window_estimation(window)
+
+    def _window_estimation(self, window: EnergyWindow) -> Optional[Estimation]:
+        """
+        :return: The mean power and the energy of each target over a window
+        """
+        powers = window.powers()
+        if self.delta is not None:
+            powers = self.delta.filter(window.start, powers)
+            if not powers:
+                return None
+        return window.start, powers, window.metadata()
+
+    def state(self) -> Dict:
+        """
+        :return: The state needed to resume the estimations in another
+                 pipeline : the target table, the delta filter and the
+                 energy balance
+        """
+        return {'targets': self.targets, 'delta': self.delta,
+                'balance': self.balance}
+
+    def restore(self, state: Dict):
+        """
+        Resume the estimations from the state of another pipeline with the
+        same configuration
+        """
+        self.targets = state['targets']
+        if self.aggregator is not None:
+            self.aggregator.targets = self.targets
+        if self.delta is not None:
+            self.delta = state['delta']
+        if self.balance is not None:
+            self.balance = state['balance']
@@ -0,0 +1,191 @@
+# MIT License
+
+# Copyright (c) 2021 PowerAPI
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Module that define the VirtualWatts pusher actor
+"""
+
+from datetime import timedelta
+from typing import List, Tuple
+
+from thespian.actors import ActorAddress, ActorExitRequest, WakeupMessage
+
+from powerapi.exception import PowerAPIExceptionWithMessage, PowerAPIException
+from powerapi.database import BaseDB
+from powerapi.message import EndMessage, OKMessage, PusherStartMessage
+from powerapi.pusher import PusherActor
+from powerapi.report import BadInputData, PowerReport
+
+from virtualwatts.message import AckMessage, AckRequestMessage, FlushMessage
+from virtualwatts.report import PowerReportBatch
+
+
+class VirtualWattsPusherStartMessage(PusherStartMessage):
+    """
+    Message used to start a VirtualWattsPusherActor
+    """
+
+    def __init__(self, sender_name: str, name: str, database: BaseDB,
+                 bulk_size: int = 1, flush_interval: float = 1.0):
+        """
+        :param bulk_size: Number of reports saved by each write to the
+                          database. 1 to save each report when it is received
+        :param flush_interval: Maximum time (in seconds) a report is kept
+                               before being saved
+        """
+        PusherStartMessage.__init__(self, sender_name, name, database)
+        self.bulk_size = bulk_size
+        self.flush_interval = flush_interval
+
+
+class VirtualWattsPusherActor(PusherActor):
+    """
+    PusherActor that can also save the PowerReportBatch sent by the
+    VirtualWatts formula with a single bulk write.
+
+    When started with a bulk size greater than one, the received reports are
+    buffered and saved with a single bulk write once the buffer is full, or
+    once the oldest report waited for the flush interval. The acknowledgments
+    asked by the formula are delayed until their reports are saved.
+    """
+
+    def __init__(self):
+        PusherActor.__init__(self)
+        self.bulk_size = 1
+        self.flush_interval = 1.0
+        self.buffer: List[PowerReport] = []
+        self.pending_acks: List[Tuple[ActorAddress, AckMessage]] = []
+        self.wakeup_pending = False
+
+    def _initialization(self, start_message: PusherStartMessage):
+        PusherActor._initialization(self, start_message)
+        if isinstance(start_message, VirtualWattsPusherStartMessage):
+            self.bulk_size = start_message.bulk_size
+            self.flush_interval = start_message.flush_interval
+
+    def _save_many(self, reports: List[PowerReport], description: str):
+        try:
+            self.database.save_many(reports)
+            self.log_debug(description + ' saved to database')
+        except BadInputData as exn:
+            log_line = 'BadinputData exception raised for report'
+            log_line += str(exn.input_data) + ' with message : ' + exn.msg
+            self.log_warning(log_line)
+        except PowerAPIExceptionWithMessage as exn:
+            log_line = 'exception ' + str(exn) + ' was raised while trying'
+            log_line += ' to save ' + description
+            log_line += ' with message : ' + str(exn.msg)
+            self.log_warning(log_line)
+        except PowerAPIException as exn:
+            self.log_warning('exception ' + str(exn) + ' was raised while'
+                             ' trying to save ' + description)
+
+    def _buffer(self, reports: List[PowerReport]):
+        """
+        Add reports to the buffer and save it if it is full
+        """
+        self.buffer.extend(reports)
+        if len(self.buffer) >= self.bulk_size:
+            self._flush()
+        elif not self.wakeup_pending:
+            self.wakeup_pending = True
+            self.wakeupAfter(timedelta(seconds=self.flush_interval))
+
+    def _flush(self):
+        """
+        Save the buffered reports and send the acknowledgments waiting for
+        them
+        """
+        if self.buffer:
+            reports = self.buffer
+            self.buffer = []
+            self._save_many(reports, str(len(reports)) + ' reports')
+        for address, ack in self.pending_acks:
+            self.send(address, ack)
+        self.pending_acks = []
+
+    def receiveMsg_PowerReport(self, message: PowerReport,
+                               sender: ActorAddress):
+        """
+        When receiving a PowerReport save it to database, or buffer it
+        """
+        if self.bulk_size <= 1:
+            PusherActor.receiveMsg_PowerReport(self, message, sender)
+            return
+        self._buffer([message])
+
+    def receiveMsg_PowerReportBatch(self, message: PowerReportBatch,
+                                    _: ActorAddress):
+        """
+        When receiving a PowerReportBatch save all its reports to database,
+        or buffer them
+        """
+        self.log_debug('received message ' + str(message))
+        if self.bulk_size <= 1:
+            self._save_many(message.to_power_reports(), str(message))
+            return
+        self._buffer(message.to_power_reports())
+
+    def receiveMsg_WakeupMessage(self, _: WakeupMessage, __: ActorAddress):
+        """
+        Save the buffered reports once the flush interval is over
+        """
+        self.wakeup_pending = False
+        self._flush()
+
+    def receiveMsg_FlushMessage(self, _: FlushMessage, sender: ActorAddress):
+        """
+        Save the buffered reports and answer once they are saved
+        """
+        self._flush()
+        self.send(sender, OKMessage(self.name))
+
+    def receiveMsg_AckRequestMessage(self, message: AckRequestMessage,
+                                     sender: ActorAddress):
+        """
+        Acknowledge the reports received before the request once they are
+        saved
+        """
+        ack = AckMessage(self.name, message.pusher, message.tick)
+        if self.buffer:
+            self.pending_acks.append((sender, ack))
+        else:
+            self.send(sender, ack)
+
+    def receiveMsg_EndMessage(self, message: EndMessage, sender: ActorAddress):
+        """
+        Save the buffered reports before ending
+        """
+        self._flush()
+        PusherActor.receiveMsg_EndMessage(self, message, sender)
+
+    def receiveMsg_ActorExitRequest(self, message: ActorExitRequest,
+                                    sender: ActorAddress):
+        """
+        Save the buffered reports and close the database, if it need to be,
+        before exiting
+        """
+        self._flush()
+        close = getattr(self.database, 'close', None)
+        if close is not None:
+            close()
+        PusherActor.receiveMsg_ActorExitRequest(self, message, sender)
@@ -0,0 +1,882 @@
+# MIT License
+
+# Copyright (c) 2021 PowerAPI
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Offline replay of stored power and procfs reports through the VirtualWatts
+formula, without actor system
+"""
+
+import argparse
+import csv
+import heapq
+import json
+import logging
+import math
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+from operator import attrgetter
+from typing import BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Type
+
+try:
+    import bson
+except ImportError:
+    bson = None
+
+from powerapi.exception import PowerAPIExceptionWithMessage
+from powerapi.report import BadInputData, PowerReport, ProcfsReport, Report
+
+from .aggregation import EPOCH
+from .columnar import ColumnarWriter
+from .context import SyncMode, VirtualWattsFormulaConfig
+from .pipeline import EstimationPipeline
+from .sync import get_sync
+
+REPORT_TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S.%f"
+
+#: Size of the file block under which the search of a timestamp stops
+SEEK_BLOCK = 65536
+
+
+class ReplayException(PowerAPIExceptionWithMessage):
+    """
+    Exception raised when the reports can't be replayed
+    """
+
+    def __reduce__(self):
+        # raised by the workers of parallel_replay, that send it pickled
+        return ReplayException, (self.msg,)
+
+
+#: Exceptions raised by the decoding of an invalid line of a report file
+DECODE_ERRORS = (ValueError, KeyError, TypeError, BadInputData)
+
+
+def _from_extended_json(document: Dict):
+    """
+    Hook of the json decoder converting the MongoDB extended json types
+    ($date, $numberLong, ...) of mongoexport documents. Dates are converted
+    to naive UTC datetimes, as returned by pymongo.
+    """
+    if len(document) != 1:
+        return document
+    key, content = next(iter(document.items()))
+    convert = _EXTENDED_JSON_TYPES.get(key)
+    return document if convert is None else convert(content)
+
+
+def _extended_json_date(content) -> datetime:
+    """
+    :return: The naive UTC datetime of an ISO-8601 date or of a number of
+             milliseconds since the epoch
+    """
+    if isinstance(content, str):
+        date = datetime.fromisoformat(content.replace('Z', '+00:00'))
+        if date.tzinfo is not None:
+            date = date.astimezone(timezone.utc).replace(tzinfo=None)
+        return date
+    return datetime(1970, 1, 1) + timedelta(milliseconds=int(content))
+
+
+#: Conversion of the content of each MongoDB extended json type
+_EXTENDED_JSON_TYPES = {
+    '$date': _extended_json_date,
+    '$numberLong': int,
+    '$numberInt': int,
+    '$numberDouble': float,
+    '$numberDecimal': float,
+    '$oid': str,
+}
+
+
+def _parse_timestamp(value: str) -> datetime:
+    """
+    :return: The datetime of a timestamp formatted as in the json reports or
+             given in milliseconds, as PowerAPI does
+    """
+    try:
+        return datetime.strptime(value, REPORT_TIMESTAMP_FORMAT)
+    except ValueError:
+        return datetime.fromtimestamp(int(value) / 1000)
+
+
+def _json_line_timestamp(line: bytes) -> datetime:
+    """
+    :return: The timestamp of the report stored in a json line
+    """
+    value = json.loads(line, object_hook=_from_extended_json)['timestamp']
+    return value if isinstance(value, datetime) else _parse_timestamp(value)
+
+
+def _csv_line_timestamp(header: bytes) -> Callable[[bytes], datetime]:
+    """
+    :return: A function returning the timestamp of a line of a csv file with
+             the given header
+    """
+    index = next(csv.reader([header.decode()])).index('timestamp')
+
+    def line_timestamp(line: bytes) -> datetime:
+        return _parse_timestamp(next(csv.reader([line.decode()]))[index])
+    return line_timestamp
+
+
+def _line_number(input_file: BinaryIO, offset: int) -> int:
+    """
+    :return: The number of the line of a file starting at the given offset
+    """
+    input_file.seek(0)
+    number = 1
+    while offset > 0:
+        block = input_file.read(min(offset, SEEK_BLOCK))
+        if not block:
+            break
+        number += block.count(b'\n')
+        offset -= len(block)
+    return number
+
+
+def _error_reason(exn: Exception) -> str:
+    return exn.msg if isinstance(exn, BadInputData) else str(exn)
+
+
+def _bad_line(input_file: BinaryIO, offset: int, index: int, exn: Exception) -> ReplayException:
+    """
+    :return: The exception reporting an invalid line of a file, the index-th
+             one after the line starting at the given offset
+    """
+    line = _line_number(input_file, offset) + index
+    return ReplayException('bad line %d in %s : %s' % (line, input_file.name, _error_reason(exn)))
+
+
+def _seek(input_file: BinaryIO, start: datetime,
+          line_timestamp: Callable[[bytes], datetime], data_start: int = 0):
+    """
+    Move a time sorted line file close before its first line with a timestamp
+    greater or equal to start, with a binary search on the file offset. At
+    most SEEK_BLOCK bytes and one line are read before this line.
+
+    :param data_start: Offset of the first line holding a report
+    """
+    low = data_start
+    high = os.fstat(input_file.fileno()).st_size
+    while high - low > SEEK_BLOCK:
+        middle = (low + high) // 2
+        input_file.seek(middle)
+        input_file.readline()
+        offset = input_file.tell()
+        line = input_file.readline()
+        try:
+            newer = not line.strip() or line_timestamp(line) >= start
+        except DECODE_ERRORS as exn:
+            raise _bad_line(input_file, offset, 0, exn) from exn
+        if newer:
+            high = middle
+        else:
+            low = middle
+    input_file.seek(low)
+    if low > data_start:
+        input_file.readline()
+
+
+def _is_json_array(input_file: BinaryIO) -> bool:
+    first = input_file.read(1)
+    while first.isspace():
+        first = input_file.read(1)
+    input_file.seek(0)
+    return first == b'['
+
+
+def _iter_json_reports(filename: str, report_type: Type[Report],
+                       start: Optional[datetime] = None) -> Iterator[Report]:
+    """
+    Iterate over the reports of a json array or a json lines file. Json
+    lines files are read from the given timestamp.
+    """
+    with open(filename, 'rb') as input_file:
+        if _is_json_array(input_file):
+            try:
+                documents = json.load(input_file, object_hook=_from_extended_json)
+            except ValueError as exn:
+                raise ReplayException('bad json array in ' + filename + ' : ' + str(exn)) from exn
+            for index, document in enumerate(documents):
+                try:
+                    report = report_type.from_json(document)
+                except DECODE_ERRORS as exn:
+                    raise ReplayException('bad report %d in %s : %s' % (index, filename,
+                                                                        _error_reason(exn))) from exn
+                yield report
+            return
+        if start is not None:
+            _seek(input_file, start, _json_line_timestamp)
+        data_start = input_file.tell()
+        decoder = json.JSONDecoder(object_hook=_from_extended_json)
+        for index, line in enumerate(input_file):
+            if line.strip():
+                try:
+                    report = report_type.from_json(decoder.decode(line.decode()))
+                except DECODE_ERRORS as exn:
+                    raise _bad_line(input_file, data_start, index, exn) from exn
+                yield report
+
+
+def _iter_csv_reports(filename: str, report_type: Type[Report],
+                      start: Optional[datetime] = None) -> Iterator[Report]:
+    """
+    Iterate over the reports of a csv file, from the given timestamp.
+
+    Power reports are stored one per line, with the columns timestamp,
+    sensor, target and power. Procfs reports are stored one line per cgroup,
+    with the columns timestamp, sensor, target, cgroup, usage and
+    global_cpu_usage, consecutive lines of a same sensor and timestamp
+    forming one report.
+    """
+    with open(filename, 'rb') as input_file:
+        header = input_file.readline()
+        if start is not None:
+            _seek(input_file, start, _csv_line_timestamp(header), input_file.tell())
+        data_start = input_file.tell()
+        fieldnames = next(csv.reader([header.decode()]), None)
+        if fieldnames is None:
+            return
+        rows = csv.DictReader((line.decode() for line in input_file),
+                              fieldnames=fieldnames)
+        try:
+            if report_type is PowerReport:
+                for row in rows:
+                    yield PowerReport(_parse_timestamp(row['timestamp']), row['sensor'],
+                                      row['target'], float(row['power']), {})
+                return
+
+            report = None
+            for row in rows:
+                timestamp = _parse_timestamp(row['timestamp'])
+                if report is None or report.timestamp != timestamp or report.sensor != row['sensor']:
+                    if report is not None:
+                        yield report
+                    report = ProcfsReport(timestamp, row['sensor'], row['target'], {},
+                                          float(row['global_cpu_usage']))
+                report.usage[row['cgroup']] = float(row['usage'])
+            if report is not None:
+                yield report
+        except DECODE_ERRORS as exn:
+            raise _bad_line(input_file, data_start, rows.line_num - 1, exn) from exn
+
+
+def _iter_reports(filename: str, report_type: Type[Report],
+                  start: Optional[datetime] = None) -> Iterator[Report]:
+    if filename.endswith('.csv'):
+        yield from _iter_csv_reports(filename, report_type, start)
+    elif filename.endswith('.bson'):
+        if bson is None:
+            raise ReplayException('pymongo is required to read ' + filename)
+        with open(filename, 'rb') as input_file:
+            try:
+                for document in bson.decode_file_iter(input_file):
+                    yield report_type.from_mongodb(document)
+            except (bson.errors.InvalidBSON,) + DECODE_ERRORS as exn:
+                raise ReplayException('bad document in ' + filename + ' : ' + _error_reason(exn)) from exn
+    else:
+        yield from _iter_json_reports(filename, report_type, start)
+
+
+def read_reports(filename: str, report_type: Type[Report],
+                 start: Optional[datetime] = None,
+                 end: Optional[datetime] = None) -> Iterator[Report]:
+    """
+    Iterate over the reports stored in a file, in the order of the file.
+
+    The format is given by the extension of the file :
+     - .csv : csv file (see _iter_csv_reports)
+     - .bson : mongodump of a collection (require pymongo)
+     - other : json lines or json array, as written by the sensors or by
+       mongoexport
+
+    :param start: Skip the reports older than start. Csv and json lines
+                  files are sorted by timestamp and directly read from start.
+    :param end: Stop at the first report newer or equal to end
+    """
+    if not os.path.exists(filename):
+        raise ReplayException('file ' + filename + ' not found')
+
+    for report in _iter_reports(filename, report_type, start):
+        if start is not None and report.timestamp < start:
+            continue
+        if end is not None and report.timestamp >= end:
+            return
+        yield report
+
+
+def _last_line(input_file: BinaryIO) -> bytes:
+    """
+    :return: The last non empty line of a file
+    """
+    size = os.fstat(input_file.fileno()).st_size
+    block = SEEK_BLOCK
+    while True:
+        input_file.seek(max(0, size - block))
+        lines = input_file.read().splitlines()
+        lines = [line for line in lines if line.strip()]
+        if block >= size or len(lines) > 1:
+            return lines[-1] if lines else b''
+        block *= 2
+
+
+def time_range(filename: str, report_type: Type[Report]) -> Tuple[datetime, datetime]:
+    """
+    :return: The timestamp of the first and of the last report of a time
+             sorted file. Only csv and json lines files are not fully read.
+    """
+    if not os.path.exists(filename):
+        raise ReplayException('file ' + filename + ' not found')
+
+    with open(filename, 'rb') as input_file:
+        if filename.endswith('.csv'):
+            try:
+                line_timestamp = _csv_line_timestamp(input_file.readline())
+            except DECODE_ERRORS as exn:
+                raise _bad_line(input_file, 0, 0, exn) from exn
+        elif not filename.endswith('.bson') and not _is_json_array(input_file):
+            line_timestamp = _json_line_timestamp
+        else:
+            line_timestamp = None
+
+        if line_timestamp is not None:
+            offset = input_file.tell()
+            first = input_file.readline()
+            while first and not first.strip():
+                offset = input_file.tell()
+                first = input_file.readline()
+            if not first:
+                raise ReplayException('no report in ' + filename)
+            try:
+                first_timestamp = line_timestamp(first)
+            except DECODE_ERRORS as exn:
+                raise _bad_line(input_file, offset, 0, exn) from exn
+            try:
+                return first_timestamp, line_timestamp(_last_line(input_file))
+            except DECODE_ERRORS as exn:
+                raise ReplayException('bad last line in ' + filename + ' : ' + _error_reason(exn)) from exn
+
+    timestamps = [report.timestamp for report in _iter_reports(filename, report_type)]
+    if not timestamps:
+        raise ReplayException('no report in ' + filename)
+    return min(timestamps), max(timestamps)
+
+
+def merge_reports(*streams: Iterable[Report]) -> Iterator[Report]:
+    """
+    Merge time sorted report streams into one time sorted stream
+    """
+    return heapq.merge(*streams, key=attrgetter('timestamp'))
+
+
+class ReplayFormula:
+    """
+    Pair the reports of one sensor and compute their estimations with the
+    pipeline of the VirtualWattsFormulaActor, and return the estimations
+    instead of sending them
+    """
+
+    def __init__(self, config: VirtualWattsFormulaConfig):
+        """
+        :param config: Configuration of the formula
+        """
+        self.config = config
+        self.sync = get_sync(
+            config.sync_mode,
+            config.delay_threshold,
+            max_power_reports=config.sync_max_power_reports,
+            max_procfs_reports=config.sync_max_procfs_reports,
+            eviction_policy=config.sync_eviction_policy,
+            max_age=config.sync_max_age * config.sampling_interval)
+        self.pipeline = EstimationPipeline(config)
+
+    def process(self, report: Report) -> List[PowerReport]:
+        """
+        Add a report to the sync
+        :return: The estimations computed from the pairs it formed
+        """
+        self.sync.add_report(report)
+        pairs = []
+        pair = self.sync.request()
+        while pair is not None:
+            pairs.append(pair)
+            pair = self.sync.request()
+        if not pairs:
+            return []
+
+        output = []
+        for (pw_report, use_report), powers in zip(pairs, self.pipeline.attribute(pairs)):
+            estimation = self.pipeline.estimate(pw_report, use_report, powers)
+            if estimation is not None:
+                output.extend(self._reports(*estimation))
+        return output
+
+    def flush(self) -> List[PowerReport]:
+        """
+        :return: The estimations of the unfinished aggregation window
+        """
+        estimation = self.pipeline.flush()
+        return [] if estimation is None else self._reports(*estimation)
+
+    @staticmethod
+    def _reports(timestamp: datetime, powers: Dict[str, float],
+                 metadata: Optional[Dict[str, Dict]]) -> List[PowerReport]:
+        return [PowerReport(timestamp, "virtualwatts", target, power,
+                            {} if metadata is None else metadata[target])
+                for target, power in powers.items()]
+
+
+class ReplayWriter:
+    """
+    Buffer the estimations and save them with one bulk write every
+    bulk_size reports
+    """
+
+    def __init__(self, bulk_size: int = 10000):
+        """
+        :param bulk_size: Number of reports saved by each write
+        """
+        self.bulk_size = bulk_size
+        self.written = 0
+        self._buffer: List[PowerReport] = []
+
+    def add(self, reports: List[PowerReport]):
+        """
+        Add reports to the buffer and save it if it is full
+        """
+        if self.buffer(reports):
+            self.flush()
+
+    def buffer(self, reports: List[PowerReport]) -> bool:
+        """
+        Add reports to the buffer without saving it
+        :return: True if the buffer is full and must be flushed
+        """
+        self._buffer.extend(reports)
+        return len(self._buffer) >= self.bulk_size
+
+    def flush(self):
+        """
+        Save the buffered reports
+        """
+        if self._buffer:
+            self._save_many(self._buffer)
+            self.written += len(self._buffer)
+            self._buffer = []
+
+    def close(self):
+        """
+        Save the buffered reports and release the output
+        """
+        self.flush()
+
+    def _save_many(self, reports: List[PowerReport]):
+        raise NotImplementedError()
+
+
+def power_report_to_json(report: PowerReport) -> Dict:
+    """
+    :return: The report as a json document that PowerReport.from_json read
+    """
+    return {'timestamp': report.timestamp.strftime(REPORT_TIMESTAMP_FORMAT),
+            'sensor': report.sensor, 'target': report.target,
+            'power': report.power, 'metadata': report.metadata}
+
+
+class JsonLinesReplayWriter(ReplayWriter):
+    """
+    Write one json document per line
+    """
+
+    def __init__(self, filename: str, bulk_size: int = 10000):
+        ReplayWriter.__init__(self, bulk_size)
+        self.output = open(filename, 'w')  # pylint: disable=consider-using-with
+
+    def _save_many(self, reports):
+        self.output.write(''.join(json.dumps(power_report_to_json(report)) + '\n'
+                                  for report in reports))
+
+    def close(self):
+        ReplayWriter.close(self)
+        self.output.close()
+
+
+class CsvReplayWriter(ReplayWriter):
+    """
+    Write one csv line per report, with the timestamp in milliseconds and
+    the given metadata as extra columns
+    """
+
+    def __init__(self, filename: str, metadata: List[str] = (),
+                 bulk_size: int = 10000):
+        ReplayWriter.__init__(self, bulk_size)
+        self.metadata = list(metadata)
+        self.output = open(filename, 'w', newline='')  # pylint: disable=consider-using-with
+        self.writer = csv.writer(self.output)
+        self.writer.writerow(['timestamp', 'sensor', 'target', 'power'] + self.metadata)
+
+    def _save_many(self, reports):
+        rows = []
+        timestamp, milliseconds = None, None
+        for report in reports:
+            if report.timestamp != timestamp:
+                timestamp = report.timestamp
+                milliseconds = int(timestamp.timestamp() * 1000)
+            row = [milliseconds, report.sensor, report.target, report.power]
+            for key in self.metadata:
+                row.append(report.metadata.get(key))
+            rows.append(row)
+        self.writer.writerows(rows)
+
+    def close(self):
+        ReplayWriter.close(self)
+        self.output.close()
+
+
+class ColumnarReplayWriter(ReplayWriter):
+    """
+    Write the reports in a columnar file, one row group per bulk
+    """
+
+    def __init__(self, filename: str, bulk_size: int = 10000):
+        ReplayWriter.__init__(self, bulk_size)
+        output = open(filename, 'wb')  # pylint: disable=consider-using-with
+        self.writer = ColumnarWriter(output, row_group_size=sys.maxsize, flush_interval=math.inf)
+
+    def _save_many(self, reports):
+        self.writer.write(reports)
+        self.writer.flush()
+
+    def close(self):
+        ReplayWriter.close(self)
+        self.writer.output.close()
+
+
+class DatabaseReplayWriter(ReplayWriter):
+    """
+    Save the reports in a PowerAPI database with its save_many method
+    """
+
+    def __init__(self, database, bulk_size: int = 10000):
+        """
+        :param database: Connected PowerAPI database
+        """
+        ReplayWriter.__init__(self, bulk_size)
+        self.database = database
+
+    def _save_many(self, reports):
+        self.database.save_many(reports)
+
+    def close(self):
+        ReplayWriter.close(self)
+        close = getattr(self.database, 'close', None)
+        if close is not None:
+            close()
+
+
+def replay(power_reports: Iterable[PowerReport],
+           procfs_reports: Iterable[ProcfsReport],
+           config: VirtualWattsFormulaConfig, writer: ReplayWriter,
+           start: Optional[datetime] = None,
+           end: Optional[datetime] = None) -> Dict:
+    """
+    Merge the two time sorted report streams and compute the estimations of
+    every sensor, as fast as possible
+
+    :param writer: Writer the estimations are given to. It is not closed.
+    :param start: If given with end, only the estimations with a timestamp
+                  in [start, end) are written
+    :return: Statistics of the replay
+    """
+    formulas: Dict[str, ReplayFormula] = {}
+    count = 0
+    begin = time.perf_counter()
+    for report in merge_reports(power_reports, procfs_reports):
+        count += 1
+        formula = formulas.get(report.sensor)
+        if formula is None:
+            formula = formulas[report.sensor] = ReplayFormula(config)
+        estimations = formula.process(report)
+        if start is not None and estimations:
+            estimations = [estimation for estimation in estimations
+                           if start <= estimation.timestamp < end]
+        writer.add(estimations)
+    for formula in formulas.values():
+        estimations = formula.flush()
+        if start is not None:
+            estimations = [estimation for estimation in estimations
+                           if start <= estimation.timestamp < end]
+        writer.add(estimations)
+    writer.flush()
+
+    return {'reports': count, 'written': writer.written,
+            'sensors': len(formulas),
+            'pairs': sum(formula.sync.pairs for formula in formulas.values()),
+            'duration': time.perf_counter() - begin}
+
+
+def replay_overlap(config: VirtualWattsFormulaConfig) -> timedelta:
+    """
+    :return: Time read before and after a chunk to pair its reports. Pairs
+             around the chunk boundaries are the same as in a sequential
+             replay as long as a report can only be paired with one report,
+             which is the case when the sampling interval is greater than
+             twice the delay threshold.
+    """
+    if config.sync_mode == SyncMode.INTERPOLATE:
+        return max(config.delay_threshold,
+                   config.sync_max_age * config.sampling_interval)
+    return config.delay_threshold
+
+
+def replay_chunks(first: datetime, last: datetime, duration: timedelta,
+                  alignment: Optional[timedelta] = None) -> List[Tuple[datetime, datetime]]:
+    """
+    Split a time range in chunks aligned on the epoch
+    :param alignment: If given, the duration of the chunks is rounded up to
+                      a multiple of it, so that an aggregation window never
+                      overlap two chunks
+    :return: The (start, end) of each chunk
+    """
+    if alignment is not None:
+        duration = -(-duration // alignment) * alignment
+    start = EPOCH + ((first - EPOCH) // duration) * duration
+    chunks = []
+    while start <= last:
+        chunks.append((start, start + duration))
+        start += duration
+    return chunks
+
+
+def partition_filename(filename: str, index: int) -> str:
+    """
+    :return: The name of the file of the estimations of a chunk
+    """
+    root, extension = os.path.splitext(filename)
+    return '%s.%04d%s' % (root, index, extension)
+
+
+def replay_chunk(args: argparse.Namespace, index: int, start: datetime,
+                 end: datetime) -> Dict:
+    """
+    Replay the reports of one chunk and write its estimations in its own
+    partition, or in the database. Run by the workers of parallel_replay.
+    :return: Statistics of the replay of the chunk
+    """
+    config = config_from_args(args)
+    overlap = replay_overlap(config)
+    chunk_args = argparse.Namespace(**vars(args))
+    if args.output_format != 'mongodb':
+        chunk_args.output = partition_filename(args.output, index)
+    writer = create_writer(chunk_args)
+    try:
+        return replay(read_reports(args.power, PowerReport, start - overlap, end + overlap),
+                      read_reports(args.procfs, ProcfsReport, start - overlap, end + overlap),
+                      config, writer, start, end)
+    finally:
+        writer.close()
+
+
+def _concatenate(output: str, partitions: List[str], skip_header: bool):
+    """
+    Concatenate the partitions in the output file and remove them
+    """
+    with open(output, 'wb') as output_file:
+        for index, partition in enumerate(partitions):
+            with open(partition, 'rb') as input_file:
+                if skip_header and index > 0:
+                    input_file.readline()
+                shutil.copyfileobj(input_file, output_file)
+            os.remove(partition)
+
+
+def parallel_replay(args: argparse.Namespace) -> Dict:
+    """
+    Split the time range of the reports in chunks and replay them in a pool
+    of args.workers processes. Each worker read the reports of its chunk,
+    plus the replay overlap on both sides, and only write the estimations of
+    its chunk.
+
+    The partitions are then concatenated in the output file, in time order,
+    unless args.partitioned is set.
+    :return: Statistics of the replay. The reports and pairs of the
+             overlaps are counted in the two chunks sharing them.
+    :raise ReplayException: If the idle baseline is enabled, as the static
+                            power regression of each chunk would only see
+                            the reports of its chunk
+    """
+    if args.idle_baseline:
+        raise ReplayException('--idle-baseline can only be replayed by a single worker')
+    begin = time.perf_counter()
+    config = config_from_args(args)
+    power_range = time_range(args.power, PowerReport)
+    procfs_range = time_range(args.procfs, ProcfsReport)
+    first = min(power_range[0], procfs_range[0])
+    last = max(power_range[1], procfs_range[1])
+
+    if args.chunk_duration > 0:
+        duration = timedelta(seconds=args.chunk_duration)
+    else:
+        duration = max((last - first) / (args.workers * 4), config.sampling_interval)
+    alignment = None
+    if config.aggregation_window > 0:
+        alignment = timedelta(seconds=config.aggregation_window)
+    chunks = replay_chunks(first, last, duration, alignment)
+
+    with ProcessPoolExecutor(args.workers) as executor:
+        results = list(executor.map(replay_chunk, [args] * len(chunks), range(len(chunks)),
+                                    [start for start, _ in chunks], [end for _, end in chunks]))
+
+    if args.output_format != 'mongodb' and not args.partitioned:
+        _concatenate(args.output, [partition_filename(args.output, index) for index in range(len(chunks))],
+                     args.output_format == 'csv')
+
+    statistics = {key: sum(result[key] for result in results)
+                  for key in ('reports', 'written', 'pairs')}
+    statistics['sensors'] = max(result['sensors'] for result in results)
+    statistics['chunks'] = len(chunks)
+    statistics['duration'] = time.perf_counter() - begin
+    return statistics
+
+
+def generate_replay_parser() -> argparse.ArgumentParser:
+    """
+    :return: The parser of the replay command line parameters
+    """
+    parser = argparse.ArgumentParser(
+        prog='virtualwatts replay',
+        description='Compute the VirtualWatts estimations from stored reports')
+    parser.add_argument('--power', required=True,
+                        help='File of power reports sorted by timestamp')
+    parser.add_argument('--procfs', required=True,
+                        help='File of procfs reports sorted by timestamp')
+    parser.add_argument('--output', required=True,
+                        help='Output file, or database name for mongodb')
+    parser.add_argument('--output-format', default='jsonl',
+                        choices=('jsonl', 'csv', 'columnar', 'mongodb'))
+    parser.add_argument('--uri', help='URI of the mongodb output')
+    parser.add_argument('--collection', default='virtualwatts',
+                        help='Collection of the mongodb output')
+    parser.add_argument('--bulk-size', type=int, default=10000,
+                        help='Number of estimations saved by each write (a row group of the columnar output)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Number of processes replaying the reports in parallel '
+                        '(1 with --idle-baseline)')
+    parser.add_argument('--chunk-duration', type=float, default=0,
+                        help='Length (in seconds) of the time chunks replayed by the workers '
+                        '(0 to use four chunks per worker)')
+    parser.add_argument('--partitioned', action='store_true',
+                        help='Keep the output of each chunk in its own file instead of merging them')
+    parser.add_argument('--delay-threshold', type=float, default=250.0,
+                        help='Delay threshold for the sync of reports (in miliseconds)')
+    parser.add_argument('--sensor-reports-sampling-interval', type=int,
+                        default=500,
+                        help='The time interval between two measurements (in milliseconds)')
+    parser.add_argument('--sync-mode', default='nearest',
+                        choices=('nearest', 'interpolate'))
+    parser.add_argument('--sync-max-age', type=int, default=10,
+                        help='Maximal gap, in sampling intervals, the power is interpolated over')
+    parser.add_argument('--attribution-engine', default='python',
+                        choices=('python', 'numpy'))
+    parser.add_argument('--aggregation-window', type=float, default=0,
+                        help='Length (in seconds) of the aggregation windows (0 to disable)')
+    parser.add_argument('--min-usage-share', type=float, default=0.0,
+                        help='Minimal share of the VM power a target must use to get its own estimation')
+    parser.add_argument('--top-targets', type=int, default=0,
+                        help='Number of greatest consumers that get their own estimation (0 for all)')
+    parser.add_argument('--energy-balance', action='store_true',
+                        help='Send the power not attributed to the targets as the unattributed target')
+    parser.add_argument('--idle-baseline', action='store_true',
+                        help='Send the static power of the VM, estimated online, as the idle target')
+    return parser
+
+
+def config_from_args(args: argparse.Namespace) -> VirtualWattsFormulaConfig:
+    """
+    :return: The formula configuration given by the replay parameters
+    """
+    return VirtualWattsFormulaConfig(
+        args.sensor_reports_sampling_interval,
+        timedelta(milliseconds=args.delay_threshold),
+        attribution_engine=args.attribution_engine,
+        sync_mode=args.sync_mode,
+        sync_max_age=args.sync_max_age,
+        aggregation_window=args.aggregation_window,
+        min_usage_share=args.min_usage_share,
+        top_targets=args.top_targets,
+        energy_balance=args.energy_balance,
+        idle_baseline=args.idle_baseline)
+
+
+def create_writer(args: argparse.Namespace) -> ReplayWriter:
+    """
+    :return: The writer of the output given by the replay parameters
+    """
+    if args.output_format == 'csv':
+        metadata = ['energy', 'window', 'samples'] if args.aggregation_window > 0 else []
+        return CsvReplayWriter(args.output, metadata, args.bulk_size)
+    if args.output_format == 'columnar':
+        return ColumnarReplayWriter(args.output, args.bulk_size)
+    if args.output_format == 'mongodb':
+        if args.uri is None:
+            raise ReplayException('--uri is required by the mongodb output')
+        from powerapi.database import MongoDB  # pylint: disable=import-outside-toplevel
+        database = MongoDB(PowerReport, args.uri, args.output, args.collection)
+        database.connect()
+        return DatabaseReplayWriter(database, args.bulk_size)
+    return JsonLinesReplayWriter(args.output, args.bulk_size)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Run the replay command
+    :return: The exit code of the command
+    """
+    args = generate_replay_parser().parse_args(argv)
+    try:
+        if args.workers > 1:
+            statistics = parallel_replay(args)
+        else:
+            writer = create_writer(args)
+            try:
+                statistics = replay(read_reports(args.power, PowerReport),
+                                    read_reports(args.procfs, ProcfsReport),
+                                    config_from_args(args), writer)
+            finally:
+                writer.close()
+    except (ReplayException, BadInputData) as exn:
+        logging.error(exn.msg)
+        return -1
+
+    logging.info('replayed %d reports of %d sensors in %.2fs : %d pairs, %d estimations written',
+                 statistics['reports'], statistics['sensors'], statistics['duration'],
+                 statistics['pairs'], statistics['written'])
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
@@ -21,3 +21,6 @@
 # SOFTWARE.
 
 __version__ = "0.1.0"
+
+from virtualwatts.report.power_report_batch import PowerReportBatch
+from virtualwatts.report.procfs_report_shard import ProcfsReportShard
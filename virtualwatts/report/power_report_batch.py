@@ -0,0 +1,79 @@
+# MIT License
+
+# Copyright (c) 2021 PowerAPI
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Module that define the report used to send a whole tick of VirtualWatts
+estimations in one message
+"""
+
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from powerapi.message import Message
+from powerapi.report import PowerReport
+
+
+class PowerReportBatch(Message):
+    """
+    Gather the power estimation of every target computed from one synced pair
+    of reports.
+
+    Pushers receive a single message per synced pair instead of one
+    PowerReport per target and can save its content with one bulk write.
+    """
+
+    def __init__(self, timestamp: datetime, sensor: str,
+                 powers: Dict[str, float],
+                 metadata: Optional[Dict[str, Dict]] = None):
+        """
+        :param timestamp: Timestamp of the estimations
+        :param sensor: Sensor name of the estimations
+        :param powers: Estimated power of each target
+        :param metadata: Metadata of the report of each target (none if None)
+        """
+        Message.__init__(self, None)
+        self.timestamp = timestamp
+        self.sensor = sensor
+        self.powers = powers
+        self.metadata = metadata
+
+    def __str__(self):
+        return 'PowerReportBatch(%s, %s, %d targets)' % (self.timestamp,
+                                                         self.sensor,
+                                                         len(self.powers))
+
+    def __repr__(self):
+        return self.__str__()
+
+    def __len__(self):
+        return len(self.powers)
+
+    def to_power_reports(self) -> List[PowerReport]:
+        """
+        :return: The PowerReport of each target of the batch
+        """
+        if self.metadata is None:
+            return [PowerReport(self.timestamp, self.sensor, target, power, {})
+                    for target, power in self.powers.items()]
+        return [PowerReport(self.timestamp, self.sensor, target, power,
+                            self.metadata.get(target, {}))
+                for target, power in self.powers.items()]
@@ -0,0 +1,54 @@
+# MIT License
+
+# Copyright (c) 2021 PowerAPI
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Module that define the procfs report sent to one shard of the formula
+"""
+
+from datetime import datetime
+from typing import Dict
+
+from powerapi.report import ProcfsReport
+
+
+class ProcfsReportShard(ProcfsReport):
+    """
+    ProcfsReport that only contains the usage of the targets handled by one
+    shard of the formula, and the usage sum of all the targets of the report
+    it is split from
+    """
+
+    def __init__(self, timestamp: datetime, sensor: str, target: str,
+                 usage: Dict, global_cpu_usage: float, shard: int,
+                 usage_total: float):
+        """
+        :param shard: Index of the formula shard the report is sent to
+        :param usage_total: Sum of the usage of the targets of every shard
+        """
+        ProcfsReport.__init__(self, timestamp, sensor, target, usage,
+                              global_cpu_usage)
+        self.shard = shard
+        self.usage_total = usage_total
+
+    def __repr__(self) -> str:
+        return 'ProcfsReportShard(%s, %s, %s, %d, %s)' % (self.timestamp, self.sensor, self.target, self.shard,
+                                                          sorted(self.usage.keys()))
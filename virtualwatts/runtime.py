@@ -0,0 +1,300 @@
+# MIT License
+
+# Copyright (c) 2021 PowerAPI
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Module that define a single process runtime of the formula, built on asyncio
+tasks instead of Thespian actors
+"""
+
+import asyncio
+import json
+import logging
+from typing import Dict, List, Optional, Type
+
+from powerapi.database import BaseDB, DBError
+from powerapi.report import BadInputData, Report
+from powerapi.utils import JsonStream
+
+from .context import VirtualWattsFormulaConfig
+from .replay import ReplayFormula, ReplayWriter
+from .wire import iter_frames, WireFormatError
+
+#: Time (in seconds) between two polls of an input without new report
+POLL_INTERVAL = 0.5
+
+#: Number of reads in a row that end without a complete json object after
+#: which a socket connection is closed, because it doesn't send json objects
+MAX_INCOMPLETE_READS = 256
+
+
+class ReportSource:
+    """
+    Input of the runtime, that put the reports it reads in a queue
+    """
+
+    def __init__(self, name: str, report_modifiers: List = ()):
+        """
+        :param name: Name of the input, used in the logs
+        :param report_modifiers: PowerAPI report modifiers applied to the
+                                 reports before they are queued
+        """
+        self.name = name
+        self.report_modifiers = list(report_modifiers)
+
+    def _modify(self, report: Report) -> Report:
+        for modifier in self.report_modifiers:
+            report = modifier.modify_report(report)
+        return report
+
+    async def run(self, queue: asyncio.Queue):
+        """
+        Put the reports in the queue until the input is empty or the source
+        is closed. The queue is bounded, so a slow formula slows the source
+        down instead of buffering its reports.
+        """
+        raise NotImplementedError()
+
+    def close(self):
+        """
+        Stop reading the input
+        """
+
+
+class SocketSource(ReportSource):
+    """
+    Server socket the sensors push their json reports to, as the PowerAPI
+    socket input, that listens on every interface
+    """
+
+    def __init__(self, name: str, report_type: Type[Report], port: int,
+                 host: str = '0.0.0.0', report_modifiers: List = ()):
+        ReportSource.__init__(self, name, report_modifiers)
+        self.report_type = report_type
+        self.port = port
+        self.host = host
+        self.server = None
+        self._closed = None
+
+    async def run(self, queue):
+        self._closed = asyncio.Event()
+
+        async def read_connection(stream_reader, writer):
+            try:
+                async for report in self._read(stream_reader):
+                    await queue.put(self._modify(report))
+            finally:
+                writer.close()
+
+        self.server = await asyncio.start_server(read_connection,
+                                                 host=self.host, port=self.port)
+        if not self.port:
+            self.port = self.server.sockets[0].getsockname()[1]
+        await self._closed.wait()
+
+    async def _read(self, stream_reader: asyncio.StreamReader):
+        """
+        :return: Asynchronous iterator over the reports of a connection
+        """
+        stream = JsonStream(stream_reader)
+        incomplete_reads = 0
+        while True:
+            json_str = await stream.read_json_object()
+            if json_str is None:
+                # the object can be split between two reads, as in the
+                # callback of the PowerAPI socket database
+                if stream_reader.at_eof():
+                    return
+                incomplete_reads += 1
+                if incomplete_reads > MAX_INCOMPLETE_READS:
+                    logging.warning('%s : no json object received, connection closed', self.name)
+                    return
+                continue
+            incomplete_reads = 0
+            try:
+                yield self.report_type.from_json(json.loads(json_str))
+            except (BadInputData, ValueError) as exn:
+                logging.warning('%s : invalid report %s (%s)', self.name,
+                                json_str, exn)
+
+    def close(self):
+        if self.server is not None:
+            self.server.close()
+        if self._closed is not None:
+            self._closed.set()
+
+
+class BinarySocketSource(SocketSource):
+    """
+    Server socket the sensors push their procfs reports to, encoded with the
+    binary wire format
+    """
+
+    async def _read(self, stream_reader: asyncio.StreamReader):
+        try:
+            async for report in iter_frames(stream_reader):
+                yield report
+        except WireFormatError as exn:
+            logging.warning('%s : %s, connection closed', self.name, exn.msg)
+
+
+class DatabaseSource(ReportSource):
+    """
+    PowerAPI database read by a thread of the default executor, for the
+    inputs that have no asyncio API (mongodb, csv...)
+    """
+
+    def __init__(self, name: str, database: BaseDB, stream_mode: bool,
+                 report_modifiers: List = ()):
+        ReportSource.__init__(self, name, report_modifiers)
+        self.database = database
+        self.stream_mode = stream_mode
+        self._closed = False
+
+    async def run(self, queue):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.database.connect)
+        iterator = self.database.iter(self.stream_mode)
+        while not self._closed:
+            try:
+                report = await loop.run_in_executor(None, next, iterator, None)
+            except BadInputData as exn:
+                logging.warning('%s : invalid report %s (%s)', self.name,
+                                exn.input_data, exn.msg)
+                continue
+            if report is not None:
+                await queue.put(self._modify(report))
+            elif self.stream_mode:
+                await asyncio.sleep(POLL_INTERVAL)
+            else:
+                logging.info('%s : input source empty', self.name)
+                return
+
+    def close(self):
+        self._closed = True
+
+
+class AsyncioRuntime:
+    """
+    Read the inputs, pair and attribute the reports of each sensor and save
+    the estimations in the outputs, in a single process.
+
+    Every stage is an asyncio task, linked to the next one by a bounded
+    queue : the reports are never pickled and a slow output slows the inputs
+    down instead of filling the memory. The outputs are written by threads
+    of the default executor so that the event loop never waits for them.
+    """
+
+    def __init__(self, config: VirtualWattsFormulaConfig,
+                 sources: List[ReportSource], writers: Dict[str, ReplayWriter],
+                 queue_size: int = 1024, flush_interval: float = 1.0):
+        """
+        :param config: Configuration of the formulas
+        :param sources: Inputs of the reports
+        :param writers: Output of the estimations, by name
+        :param queue_size: Capacity of the queues between the tasks
+        :param flush_interval: Maximal time (in seconds) an estimation is
+                               buffered by a writer
+        """
+        self.config = config
+        self.sources = sources
+        self.writers = writers
+        self.queue_size = queue_size
+        self.flush_interval = flush_interval
+        self.formulas: Dict[str, ReplayFormula] = {}
+        self.reports = 0
+        self._reports_queue: Optional[asyncio.Queue] = None
+
+    async def run(self):
+        """
+        Run until stop is called or every input is empty, then save the
+        unfinished aggregation windows and close the outputs
+        """
+        self._reports_queue = asyncio.Queue(self.queue_size)
+        output_queues = {name: asyncio.Queue(self.queue_size)
+                         for name in self.writers}
+        writer_tasks = [asyncio.create_task(self._write(name, queue))
+                        for name, queue in output_queues.items()]
+        formula_task = asyncio.create_task(
+            self._compute(list(output_queues.values())))
+        try:
+            await asyncio.gather(*(source.run(self._reports_queue)
+                                   for source in self.sources))
+        finally:
+            await self._reports_queue.put(None)
+            await formula_task
+            await asyncio.gather(*writer_tasks)
+
+    def stop(self):
+        """
+        Close the inputs, the queued reports are still processed
+        """
+        for source in self.sources:
+            source.close()
+
+    def _formula(self, sensor: str) -> ReplayFormula:
+        formula = self.formulas.get(sensor)
+        if formula is None:
+            formula = self.formulas[sensor] = ReplayFormula(self.config)
+        return formula
+
+    async def _compute(self, output_queues: List[asyncio.Queue]):
+        queue = self._reports_queue
+        while True:
+            report = await queue.get()
+            if report is None:
+                break
+            self.reports += 1
+            estimations = self._formula(report.sensor).process(report)
+            if estimations:
+                for output in output_queues:
+                    await output.put(estimations)
+
+        for formula in self.formulas.values():
+            estimations = formula.flush()
+            if estimations:
+                for output in output_queues:
+                    await output.put(estimations)
+        for output in output_queues:
+            await output.put(None)
+
+    async def _write(self, name: str, queue: asyncio.Queue):
+        loop = asyncio.get_running_loop()
+        writer = self.writers[name]
+        while True:
+            try:
+                reports = await asyncio.wait_for(queue.get(),
+                                                 self.flush_interval)
+            except asyncio.TimeoutError:
+                await self._save(loop, name, writer.flush)
+                continue
+            if reports is None:
+                break
+            if writer.buffer(reports):
+                await self._save(loop, name, writer.flush)
+        await self._save(loop, name, writer.close)
+
+    @staticmethod
+    async def _save(loop, name, save):
+        try:
+            await loop.run_in_executor(None, save)
+        except DBError as exn:
+            logging.warning('%s : estimations not saved (%s)', name, exn.msg)
@@ -0,0 +1,75 @@
+# MIT License
+
+# Copyright (c) 2021 PowerAPI
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Module that define the selection of the targets whose estimation is sent
+"""
+
+import heapq
+import math
+from operator import itemgetter
+from typing import Dict
+
+#: Target of the estimation gathering the power of the targets not selected
+OTHER_TARGET = 'other'
+
+
+class TargetSelector:
+    """
+    Only keep the targets that use a minimal share of the VM power and/or
+    the top consumers.
+
+    The power of the other targets is summed into a single OTHER_TARGET
+    estimation, so that the sum of the estimations sent is still the power
+    attributed to the targets.
+    """
+
+    def __init__(self, min_share: float = 0.0, top: int = 0):
+        """
+        :param min_share: Minimal share of the VM power (0.01 for 1%) a target
+                          must use to be kept
+        :param top: Number of greatest consumers kept (0 : all)
+        """
+        self.min_share = min_share
+        self.top = top
+
+    def select(self, power: float, powers: Dict[str, float]) -> Dict[str, float]:
+        """
+        :param power: Power consumption of the VM
+        :param powers: Power consumption of each target
+        :return: The power of the selected targets and of the OTHER_TARGET
+        """
+        kept = powers
+        threshold = self.min_share * power
+        if threshold > 0:
+            kept = {target: value for target, value in powers.items()
+                    if value >= threshold}
+        if 0 < self.top < len(kept):
+            # heap of size top, cheaper than sorting thousands of targets
+            kept = dict(heapq.nlargest(self.top, kept.items(),
+                                       key=itemgetter(1)))
+        if len(kept) == len(powers):
+            return powers
+        other = math.fsum(value for target, value in powers.items()
+                          if target not in kept)
+        kept[OTHER_TARGET] = kept.get(OTHER_TARGET, 0.0) + other
+        return kept
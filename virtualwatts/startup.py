@@ -0,0 +1,167 @@
+# MIT License
+
+# Copyright (c) 2021 PowerAPI
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Module that define the profiling of the imports done at startup
+
+Importing this module with --profile-startup in the command line install the
+profiler, so it must be imported before the other modules of the command.
+"""
+
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+#: Flag of the command line that enable the profiler
+PROFILE_STARTUP_FLAG = '--profile-startup'
+
+
+class _TimedLoader:
+    """
+    Loader that time the execution of the module loaded by another one
+    """
+
+    def __init__(self, profiler: 'ImportProfiler', loader):
+        self._profiler = profiler
+        self._loader = loader
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+    def create_module(self, spec):
+        """
+        Let the wrapped loader create the module
+        """
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        """
+        Execute the module with the wrapped loader, and record the time spent
+        """
+        # the wrapped loader is given back to the module once it is loaded
+        module.__loader__ = self._loader
+        if module.__spec__ is not None:
+            module.__spec__.loader = self._loader
+        self._profiler.start(module.__name__)
+        try:
+            self._loader.exec_module(module)
+        finally:
+            self._profiler.stop(module.__name__)
+
+
+class ImportProfiler:
+    """
+    Meta path finder that record the time spent importing each module, as
+    python -X importtime does, but from inside the process
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        #: (self time, cumulative time) of each module, in seconds
+        self.timings: Dict[str, Tuple[float, float]] = {}
+        self._stack: List[List] = []
+        self._finding = False
+
+    def install(self):
+        """
+        Profile the next imports
+        """
+        if self not in sys.meta_path:
+            sys.meta_path.insert(0, self)
+
+    def uninstall(self):
+        """
+        Stop profiling the imports
+        """
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+
+    def find_spec(self, fullname, path, target=None):
+        """
+        Find the module with the other finders and wrap its loader
+        """
+        if self._finding:
+            return None
+        self._finding = True
+        try:
+            for finder in sys.meta_path:
+                if finder is self or not hasattr(finder, 'find_spec'):
+                    continue
+                spec = finder.find_spec(fullname, path, target)
+                if spec is not None:
+                    if spec.loader is not None and hasattr(spec.loader, 'exec_module'):
+                        spec.loader = _TimedLoader(self, spec.loader)
+                    return spec
+            return None
+        finally:
+            self._finding = False
+
+    def start(self, name: str):
+        """
+        Record the beginning of the execution of a module
+        """
+        self._stack.append([name, time.perf_counter(), 0.0])
+
+    def stop(self, name: str):
+        """
+        Record the end of the execution of a module
+        """
+        _, begin, children = self._stack.pop()
+        cumulative = time.perf_counter() - begin
+        self.timings[name] = (cumulative - children, cumulative)
+        if self._stack:
+            self._stack[-1][2] += cumulative
+
+    def report(self, limit: Optional[int] = 30) -> str:
+        """
+        :param limit: Number of modules reported (None : all)
+        :return: The import time of the slowest modules, in milliseconds
+        """
+        ranked = sorted(self.timings.items(), key=lambda item: item[1][1],
+                        reverse=True)
+        elapsed = time.perf_counter() - self.started
+        imports = sum(own for own, _ in self.timings.values())
+        lines = ['startup took %.1f ms, %d modules imported in %.1f ms'
+                 % (elapsed * 1000, len(self.timings), imports * 1000),
+                 '%10s | %10s | module' % ('self (ms)', 'cumul (ms)')]
+        for name, (own, cumulative) in ranked[:limit]:
+            lines.append('%10.1f | %10.1f | %s'
+                         % (own * 1000, cumulative * 1000, name))
+        return '\n'.join(lines)
+
+
+#: Profiler of the current process, None when the startup is not profiled
+PROFILER: Optional[ImportProfiler] = None
+
+if PROFILE_STARTUP_FLAG in sys.argv:
+    PROFILER = ImportProfiler()
+    PROFILER.install()
+
+
+def report_startup():
+    """
+    Write the import time of each module on the standard error, as python
+    -X importtime does, and stop the profiler, if the startup is profiled
+    """
+    if PROFILER is not None:
+        PROFILER.uninstall()
+        print(PROFILER.report(), file=sys.stderr)
@@ -0,0 +1,393 @@
+# MIT License
+
+# Copyright (c) 2021 PowerAPI
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Module that define the synchronizer used to pair the power and procfs reports
+received by the VirtualWatts formula
+"""
+
+import copy
+from bisect import bisect_left, bisect_right
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from powerapi.report import PowerReport, ProcfsReport, Report
+from powerapi.utils.sync import WrongFormatReport, WrongTypeParameter
+
+from .context import SyncEvictionPolicy, SyncMode
+
+
+class ReportBuffer:
+    """
+    Buffer of reports sorted by timestamp
+
+    Reports are stored in two parallel lists. Removing the oldest reports only
+    move a start index and the lists are compacted once half of them is
+    unused, which make the eviction amortized constant time.
+
+    The buffer also count the reports dropped by the sync : evicted reports
+    were dropped to respect the buffer limits, unpaired reports were dropped
+    because they could not be paired anymore.
+    """
+
+    COMPACT_THRESHOLD = 64
+
+    def __init__(self, max_size: Optional[int] = None):
+        """
+        :param max_size: Maximal number of buffered reports (None or 0: no
+                         limit)
+        """
+        self.max_size = max_size or None
+        self.evicted = 0
+        self.unpaired = 0
+        self._timestamps: List[datetime] = []
+        self._reports: List[Report] = []
+        self._start = 0
+
+    def __len__(self):
+        return len(self._timestamps) - self._start
+
+    def __iter__(self):
+        return iter(self._reports[self._start:])
+
+    def is_full(self) -> bool:
+        """
+        :return: True if no report can be inserted without exceeding max_size
+        """
+        return self.max_size is not None and len(self) >= self.max_size
+
+    def insert(self, report: Report):
+        """
+        Insert the report at the position given by its timestamp
+        """
+        timestamp = report.timestamp
+        if len(self) == 0 or timestamp >= self._timestamps[-1]:
+            self._timestamps.append(timestamp)
+            self._reports.append(report)
+        else:
+            index = bisect_right(self._timestamps, timestamp, self._start)
+            self._timestamps.insert(index, timestamp)
+            self._reports.insert(index, report)
+
+    def nearest(self, timestamp: datetime) -> Optional[int]:
+        """
+        :return: The position of the report with the closest timestamp or None
+                 if the buffer is empty
+        """
+        if len(self) == 0:
+            return None
+        index = bisect_left(self._timestamps, timestamp, self._start)
+        if index == len(self._timestamps):
+            index -= 1
+        elif index > self._start and timestamp - self._timestamps[index - 1] <= self._timestamps[index] - timestamp:
+            index -= 1
+        return index - self._start
+
+    def timestamp(self, position: int) -> datetime:
+        """
+        :return: The timestamp of the report at the given position
+        """
+        return self._timestamps[self._start + position]
+
+    def pop(self, position: int) -> Tuple[Report, List[Report]]:
+        """
+        Remove the report at the given position and every older report
+        :return: The report at the given position and the removed older reports
+        """
+        index = self._start + position
+        report = self._reports[index]
+        older = self._reports[self._start:index]
+        self._start = index + 1
+        self._compact()
+        return report, older
+
+    def pop_oldest(self) -> Report:
+        """
+        Remove the oldest report
+        :return: The removed report
+        """
+        return self.pop(0)[0]
+
+    def evict_older_than(self, timestamp: datetime) -> List[Report]:
+        """
+        Remove the reports with a timestamp strictly lower than the given one
+        :return: The removed reports
+        """
+        index = bisect_left(self._timestamps, timestamp, self._start)
+        evicted = self._reports[self._start:index]
+        self._start = index
+        self._compact()
+        return evicted
+
+    def pop_until(self, timestamp: datetime) -> List[Report]:
+        """
+        Remove the reports with a timestamp lower or equal to the given one
+        :return: The removed reports
+        """
+        index = bisect_right(self._timestamps, timestamp, self._start)
+        removed = self._reports[self._start:index]
+        self._start = index
+        self._compact()
+        return removed
+
+    def statistics(self) -> Dict[str, int]:
+        """
+        :return: The number of buffered, evicted and unpaired reports
+        """
+        return {'buffered': len(self), 'evicted': self.evicted, 'unpaired': self.unpaired}
+
+    def _compact(self):
+        if self._start > self.COMPACT_THRESHOLD and self._start * 2 > len(self._timestamps):
+            del self._timestamps[:self._start]
+            del self._reports[:self._start]
+            self._start = 0
+
+
+class VirtualWattsSync:
+    """
+    Pair PowerReport and ProcfsReport using their timestamp
+
+    When a report is received, it is paired with the report of the other type
+    that has the closest timestamp, if their timestamps differ by at most the
+    delay. Each report is used in at most one pair. Reports older than the
+    paired one, or too old to be paired with any future report, are dropped.
+
+    The number of buffered reports of each type can be bounded. When a buffer
+    is full, the eviction policy choose the dropped report :
+     - drop-oldest : the oldest buffered report
+     - drop-newest : the received report
+     - max-age : the buffered reports older than max_age, then the oldest one
+    """
+
+    def __init__(self, delay: timedelta, max_power_reports: Optional[int] = None,
+                 max_procfs_reports: Optional[int] = None,
+                 eviction_policy: SyncEvictionPolicy = SyncEvictionPolicy.DROP_OLDEST,
+                 max_age: Optional[timedelta] = None):
+        """
+        :param delay: Maximal delay allowed between two reports to pair them
+        :param max_power_reports: Maximal number of buffered power reports
+        :param max_procfs_reports: Maximal number of buffered procfs reports
+        :param eviction_policy: Policy used to drop reports
+        :param max_age: Maximal age of a buffered report with the max-age
+                        policy
+        """
+        if not isinstance(delay, timedelta):
+            raise WrongTypeParameter('delay')
+        if eviction_policy == SyncEvictionPolicy.MAX_AGE and not isinstance(max_age, timedelta):
+            raise WrongTypeParameter('max_age')
+
+        self.delay = delay
+        self.eviction_policy = eviction_policy
+        self.max_age = max_age
+        self.power_buffer = ReportBuffer(max_power_reports)
+        self.procfs_buffer = ReportBuffer(max_procfs_reports)
+        self.pair_ready = deque()
+        self.pairs = 0
+
+    def add_report(self, report: Report):
+        """
+        Receive a new report and pair it if possible, store it otherwise
+        """
+        if isinstance(report, PowerReport):
+            self.add_power_report(report)
+        elif isinstance(report, ProcfsReport):
+            self.add_procfs_report(report)
+        else:
+            raise WrongFormatReport(type(report))
+
+    def add_power_report(self, report: PowerReport):
+        """
+        Receive a new PowerReport and pair it if possible, store it otherwise
+        """
+        procfs_report = self._match(report, self.power_buffer, self.procfs_buffer)
+        if procfs_report is not None:
+            self.pair_ready.append((report, procfs_report))
+
+    def add_procfs_report(self, report: ProcfsReport):
+        """
+        Receive a new ProcfsReport and pair it if possible, store it otherwise
+        """
+        power_report = self._match(report, self.procfs_buffer, self.power_buffer)
+        if power_report is not None:
+            self.pair_ready.append((power_report, report))
+
+    def _match(self, report: Report, own_buffer: ReportBuffer, other_buffer: ReportBuffer) -> Optional[Report]:
+        """
+        :return: The report of other_buffer paired with the given report, None
+                 if the report was stored in own_buffer
+        """
+        timestamp = report.timestamp
+        position = other_buffer.nearest(timestamp)
+        if position is not None and abs(other_buffer.timestamp(position) - timestamp) <= self.delay:
+            matched, older = other_buffer.pop(position)
+            other_buffer.unpaired += len(older)
+            self.pairs += 1
+            return matched
+
+        other_buffer.unpaired += len(other_buffer.evict_older_than(timestamp - self.delay))
+        self._store(report, own_buffer)
+        return None
+
+    def _store(self, report: Report, buffer: ReportBuffer):
+        """
+        Insert the report in the buffer and apply the eviction policy
+        """
+        if self.eviction_policy == SyncEvictionPolicy.MAX_AGE:
+            buffer.evicted += len(buffer.evict_older_than(report.timestamp - self.max_age))
+
+        if buffer.is_full():
+            buffer.evicted += 1
+            if self.eviction_policy == SyncEvictionPolicy.DROP_NEWEST:
+                return
+            buffer.pop_oldest()
+        buffer.insert(report)
+
+    def request(self) -> Optional[Tuple[PowerReport, ProcfsReport]]:
+        """
+        Request a pair of report
+        :return: The oldest (PowerReport, ProcfsReport) pair or None if there
+                 is no pair available
+        """
+        if self.pair_ready:
+            return self.pair_ready.popleft()
+        return None
+
+    def statistics(self) -> Dict:
+        """
+        :return: The number of formed pairs and the number of buffered,
+                 evicted and unpaired reports of each type
+        """
+        return {'pairs': self.pairs,
+                'power': self.power_buffer.statistics(),
+                'procfs': self.procfs_buffer.statistics()}
+
+
+class InterpolatedSync(VirtualWattsSync):
+    """
+    Pair each ProcfsReport with the power linearly interpolated at its
+    timestamp between the two PowerReports around it
+
+    Only the two last PowerReports are kept. A ProcfsReport newer than the
+    last PowerReport waits in the procfs buffer for the next one. When there
+    is no PowerReport on both sides of a ProcfsReport, or when they are more
+    than max_gap apart, the ProcfsReport is paired with the nearest
+    PowerReport if their timestamps differ by at most the delay, and is
+    dropped otherwise.
+
+    The PowerReport of a pair is a copy of the newest PowerReport used, with
+    the timestamp of the ProcfsReport and the interpolated power.
+    """
+
+    #: Number of PowerReports kept to interpolate the power
+    POWER_ANCHORS = 2
+
+    def __init__(self, delay: timedelta, max_power_reports: Optional[int] = None,
+                 max_procfs_reports: Optional[int] = None,
+                 eviction_policy: SyncEvictionPolicy = SyncEvictionPolicy.DROP_OLDEST,
+                 max_age: Optional[timedelta] = None,
+                 max_gap: Optional[timedelta] = None):
+        """
+        :param max_power_reports: Ignored, only two PowerReports are kept
+        :param max_gap: Maximal delay between two PowerReports to interpolate
+                        the power between them (None: no limit)
+        """
+        VirtualWattsSync.__init__(self, delay, self.POWER_ANCHORS,
+                                  max_procfs_reports, eviction_policy, max_age)
+        self.max_gap = max_gap
+
+    def add_power_report(self, report: PowerReport):
+        """
+        Receive a new PowerReport and pair the waiting ProcfsReports that are
+        older than it
+        """
+        if self.power_buffer.is_full():
+            self.power_buffer.pop_oldest()
+        self.power_buffer.insert(report)
+
+        anchors = list(self.power_buffer)
+        for procfs_report in self.procfs_buffer.pop_until(anchors[-1].timestamp):
+            self._pair(procfs_report, anchors)
+
+    def add_procfs_report(self, report: ProcfsReport):
+        """
+        Receive a new ProcfsReport and pair it if there is a newer
+        PowerReport, store it otherwise
+        """
+        anchors = list(self.power_buffer)
+        if anchors and report.timestamp <= anchors[-1].timestamp:
+            self._pair(report, anchors)
+        else:
+            self._store(report, self.procfs_buffer)
+
+    def _pair(self, report: ProcfsReport, anchors: List[PowerReport]):
+        """
+        Pair the ProcfsReport with the power at its timestamp or drop it
+        """
+        power_report = self._power_at(report.timestamp, anchors)
+        if power_report is None:
+            self.procfs_buffer.unpaired += 1
+            return
+        self.pairs += 1
+        self.pair_ready.append((power_report, report))
+
+    def _power_at(self, timestamp: datetime, anchors: List[PowerReport]) -> Optional[PowerReport]:
+        """
+        :return: A PowerReport holding the power at the given timestamp, None
+                 if it can't be estimated
+        """
+        for before, after in zip(anchors, anchors[1:]):
+            if before.timestamp <= timestamp <= after.timestamp:
+                gap = after.timestamp - before.timestamp
+                if self.max_gap is None or gap <= self.max_gap:
+                    ratio = (timestamp - before.timestamp) / gap if gap else 1
+                    power = before.power + (after.power - before.power) * ratio
+                    return self._copy(after, timestamp, power)
+
+        nearest = min(anchors, key=lambda anchor: abs(anchor.timestamp - timestamp))
+        if abs(nearest.timestamp - timestamp) <= self.delay:
+            return self._copy(nearest, timestamp, nearest.power)
+        return None
+
+    @staticmethod
+    def _copy(report: PowerReport, timestamp: datetime, power: float) -> PowerReport:
+        power_report = copy.copy(report)
+        power_report.timestamp = timestamp
+        power_report.power = power
+        return power_report
+
+
+def get_sync(mode: SyncMode, delay: timedelta, max_power_reports: Optional[int] = None,
+             max_procfs_reports: Optional[int] = None,
+             eviction_policy: SyncEvictionPolicy = SyncEvictionPolicy.DROP_OLDEST,
+             max_age: Optional[timedelta] = None) -> VirtualWattsSync:
+    """
+    :param mode: Pairing mode of the sync
+    :return: A sync pairing the reports with the given mode. The interpolated
+             sync don't interpolate between power reports more than max_age
+             apart.
+    """
+    if SyncMode(mode) == SyncMode.INTERPOLATE:
+        return InterpolatedSync(delay, max_power_reports, max_procfs_reports,
+                                eviction_policy, max_age, max_gap=max_age)
+    return VirtualWattsSync(delay, max_power_reports, max_procfs_reports,
+                            eviction_policy, max_age)
@@ -0,0 +1,266 @@
+# MIT License
+
+# Copyright (c) 2021 PowerAPI
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""
+Module that define an input following a file the sensor appends its json
+reports to, one per line, as tail -F does
+"""
+
+import ctypes
+import ctypes.util
+import json
+import os
+import select
+from collections import deque
+from typing import Deque, List, Optional, Type
+
+from powerapi.database import BaseDB, DBError
+from powerapi.database.base_db import IterDB
+from powerapi.report import BadInputData, Report
+
+#: Maximum time (in seconds) the iterator waits for new lines in stream mode
+WAIT_TIMEOUT = 0.1
+
+IN_MODIFY = 0x2
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+#: Events of the watched directory after which the file is read again
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+
+class Inotify:
+    """
+    inotify watch of a directory, used to wait for changes of a file instead
+    of polling it
+    """
+
+    def __init__(self, fd: int):
+        self.fd = fd
+
+    @staticmethod
+    def watch(directory: str) -> Optional['Inotify']:
+        """
+        :return: A watch of the directory, or None if inotify is not available
+        """
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+            fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        except (OSError, AttributeError):
+            return None
+        if fd < 0:
+            return None
+        if libc.inotify_add_watch(fd, os.fsencode(directory), WATCH_MASK) < 0:
+            os.close(fd)
+            return None
+        return Inotify(fd)
+
+    def wait(self, timeout: float) -> bool:
+        """
+        Wait for changes in the directory and consume their events
+        :return: True if the directory changed
+        """
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return False
+        try:
+            while os.read(self.fd, 4096):
+                pass
+        except BlockingIOError:
+            pass
+        return True
+
+    def close(self):
+        """
+        Remove the watch
+        """
+        os.close(self.fd)
+
+
+class TailFileIterDB(IterDB):
+    """
+    Iterator over the reports appended to a file
+
+    The file is read from the offset where the previous read stopped, and
+    only when inotify tells it changed, when available. A line without its
+    newline is kept until it is completed, unless it already holds a whole
+    json object. The file is read from its beginning again if it is
+    truncated or replaced.
+    """
+
+    def __init__(self, db, report_type: Type[Report], stream_mode: bool,
+                 filename: str, wait_timeout: float = WAIT_TIMEOUT):
+        IterDB.__init__(self, db, report_type, stream_mode)
+        self.filename = filename
+        self.wait_timeout = wait_timeout
+        self.file = None
+        self.inode = None
+        self.offset = 0
+        self.lines: Deque[bytes] = deque()
+        self.mtime = None
+        self._partial = b''
+        self._whole_partial = False
+        self.inotify = Inotify.watch(os.path.dirname(os.path.abspath(filename)))
+        self._changed = True
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> Report:
+        """
+        :raise StopIteration: When no new report was appended
+        :raise BadInputData: If a line is not a valid report
+        """
+        if not self.lines and not self._read() and self.stream_mode and \
+           self.inotify is not None and self.inotify.wait(self.wait_timeout):
+            self._changed = True
+            self._read()
+        if not self.lines:
+            raise StopIteration()
+        line = self.lines.popleft()
+        try:
+            return self.report_type.from_json(json.loads(line))
+        except ValueError as exn:
+            raise BadInputData('invalid json line : ' + str(exn), line) from exn
+
+    def _read(self) -> bool:
+        """
+        Read the bytes appended to the file since the last read
+        :return: True if new lines were read
+        """
+        if self.inotify is not None:
+            if not self._changed and not self.inotify.wait(0):
+                return False
+            self._changed = False
+        try:
+            stat = os.stat(self.filename)
+        except FileNotFoundError:
+            return False
+        if stat.st_ino != self.inode:
+            self._reopen()
+        elif stat.st_size < self.offset or \
+                (stat.st_size == self.offset and stat.st_mtime_ns != self.mtime):
+            self._rewind()
+        elif stat.st_size == self.offset:
+            return False
+        self.mtime = stat.st_mtime_ns
+        appended = self.file.read()
+        if self._whole_partial:
+            self._whole_partial = False
+            if not appended.startswith(b'\n'):
+                # the whole file was rewritten, not appended to
+                self._rewind()
+                appended = self.file.read()
+        self.offset += len(appended)
+        self._split(appended)
+        if not self.stream_mode or self.offset >= stat.st_size:
+            self._end_lines()
+        return bool(self.lines)
+
+    def _split(self, data: bytes):
+        lines = (self._partial + data).split(b'\n')
+        self._partial = lines.pop()
+        self.lines.extend(line for line in lines if line.strip())
+
+    def _end_lines(self):
+        """
+        Take the last line if it is a whole json object even without newline,
+        as written by sensors that rewrite the file for each report
+        """
+        partial = self._partial.strip()
+        if not partial.endswith(b'}'):
+            return
+        try:
+            json.loads(partial)
+        except ValueError:
+            return
+        self.lines.append(partial)
+        self._partial = b''
+        self._whole_partial = True
+
+    def _rewind(self):
+        self.file.seek(0)
+        self.offset = 0
+        self._partial = b''
+
+    def _reopen(self):
+        if self.file is not None:
+            # lines appended to the replaced file before it was replaced
+            self._split(self.file.read())
+            self._end_lines()
+            self._close_file()
+        self.file = open(self.filename, 'rb', buffering=0)  # pylint: disable=consider-using-with
+        self.inode = os.fstat(self.file.fileno()).st_ino
+        self.offset = 0
+        self._partial = b''
+        self._whole_partial = False
+
+    def _close_file(self):
+        self.file.close()
+        self.file = None
+        self.inode = None
+
+    def close(self):
+        """
+        Close the file and the inotify watch
+        """
+        if self.file is not None:
+            self._close_file()
+        if self.inotify is not None:
+            self.inotify.close()
+            self.inotify = None
+
+
+class TailFileDB(BaseDB):
+    """
+    Input following a file the sensor appends its json reports to, one per
+    line
+    """
+
+    def __init__(self, report_type: Type[Report], filename: str,
+                 wait_timeout: float = WAIT_TIMEOUT):
+        """
+        :param filename: Name of the followed file
+        :param wait_timeout: Maximum time (in seconds) waited for new lines
+                             in stream mode, when inotify is available
+        """
+        BaseDB.__init__(self, report_type)
+        self.filename = filename
+        self.wait_timeout = wait_timeout
+
+    def connect(self):
+        """
+        Check that the directory of the file exists, the file can be created
+        later by the sensor
+        """
+        if not os.path.isdir(os.path.dirname(os.path.abspath(self.filename))):
+            raise DBError('File error : directory of ' + self.filename + ' not found')
+
+    def iter(self, stream_mode: bool) -> TailFileIterDB:
+        return TailFileIterDB(self, self.report_type, stream_mode,
+                              self.filename, self.wait_timeout)
+
+    def save(self, report: Report):
+        raise DBError('TailFileDB do not support save method')
+
+    def save_many(self, reports: List[Report]):
+        raise DBError('TailFileDB do not support save_many method')
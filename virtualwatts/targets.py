@@ -0,0 +1,189 @@
+# MIT License
+
+# Copyright (c) 2021 PowerAPI
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Module that define the interning of the target names into small integer ids
+"""
+
+import heapq
+from array import array
+from typing import Dict, Iterable, List, Optional
+
+#: Number of updates (synced pairs) after which a target that is not seen
+#: anymore is pruned, one minute with the default sampling interval
+DEFAULT_MAX_IDLE = 120
+
+
+class TargetTable:
+    """
+    Bidirectional table between the target names and small integer ids.
+
+    The ids of the targets that are not seen for max_idle updates are
+    released and given to the next new targets, so the ids stay lower than
+    the number of targets alive at the same time and can index arrays.
+    """
+
+    def __init__(self, max_idle: int = 0):
+        """
+        :param max_idle: Number of updates after which a target that is not
+                         seen anymore is pruned, 0 to never prune
+        """
+        self.max_idle = max_idle
+        self.tick = 0
+        self._ids: Dict[str, int] = {}
+        self._names: List[Optional[str]] = []
+        self._last_seen = array('q')
+        self._free: List[int] = []
+        self._tracked: List['TargetArray'] = []
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._ids
+
+    @property
+    def capacity(self) -> int:
+        """
+        :return: The number of ids given so far, greater than every id
+        """
+        return len(self._names)
+
+    def intern(self, name: str) -> int:
+        """
+        :return: The id of the target, a new one if the target is unknown
+        """
+        target_id = self._ids.get(name)
+        if target_id is not None:
+            self._last_seen[target_id] = self.tick
+            return target_id
+        if self._free:
+            target_id = heapq.heappop(self._free)
+            self._names[target_id] = name
+            self._last_seen[target_id] = self.tick
+        else:
+            target_id = len(self._names)
+            self._names.append(name)
+            self._last_seen.append(self.tick)
+        self._ids[name] = target_id
+        return target_id
+
+    def get(self, name: str) -> Optional[int]:
+        """
+        :return: The id of the target, None if it is unknown
+        """
+        return self._ids.get(name)
+
+    def name(self, target_id: int) -> str:
+        """
+        :return: The name of the target with the given id
+        """
+        name = self._names[target_id]
+        if name is None:
+            raise KeyError(target_id)
+        return name
+
+    def track(self, values: 'TargetArray'):
+        """
+        Give back its default value to a target in the array each time its id
+        is released, so that the next target using this id starts afresh
+        """
+        self._tracked.append(values)
+
+    def update(self, names: Iterable[str]) -> List[int]:
+        """
+        Start a new update, intern the targets seen during this update and
+        prune the ones that are idle for too long
+        :return: The id of each target
+        """
+        self.tick += 1
+        ids = [self.intern(name) for name in names]
+        if self.max_idle > 0 and self.tick % self.max_idle == 0:
+            self.prune()
+        return ids
+
+    def prune(self) -> List[int]:
+        """
+        Release the ids of the targets not seen during the last max_idle
+        updates
+        :return: The released ids
+        """
+        oldest = self.tick - self.max_idle
+        last_seen = self._last_seen
+        pruned = [name for name, target_id in self._ids.items()
+                  if last_seen[target_id] < oldest]
+        released = []
+        for name in pruned:
+            target_id = self._ids.pop(name)
+            self._names[target_id] = None
+            heapq.heappush(self._free, target_id)
+            for values in self._tracked:
+                values.reset(target_id)
+            released.append(target_id)
+        return released
+
+
+class TargetArray:
+    """
+    Float value of each target, stored in an array indexed by the target ids
+    """
+
+    __slots__ = ('values', 'default')
+
+    def __init__(self, default: float = 0.0):
+        self.values = array('d')
+        self.default = default
+
+    def _grow(self, target_id: int):
+        missing = target_id + 1 - len(self.values)
+        if missing > 0:
+            self.values.extend([self.default] * missing)
+
+    def get(self, target_id: int) -> float:
+        """
+        :return: The value of the target, the default one if it was never set
+        """
+        if target_id < len(self.values):
+            return self.values[target_id]
+        return self.default
+
+    def set(self, target_id: int, value: float):
+        """
+        Set the value of the target
+        """
+        self._grow(target_id)
+        self.values[target_id] = value
+
+    def add(self, target_id: int, value: float):
+        """
+        Add a value to the one of the target
+        """
+        self._grow(target_id)
+        self.values[target_id] += value
+
+    def reset(self, target_id: int):
+        """
+        Give back its default value to the target, for example when its id is
+        released
+        """
+        if target_id < len(self.values):
+            self.values[target_id] = self.default
@@ -1,763 +1,256 @@
+import datetime
+import heapq
+import json
+import random
+import socket
+
 import pytest
 
 
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S.%f"
+
+
+def constant_usage(values):
+    """
+    Usage distribution that always give the same usage to a target
+    :param values: usage of each target
+    """
+    return lambda _, target: values[target]
+
+
+def uniform_usage(low=0.0, high=10.0):
+    """
+    Usage distribution that draw the usage of each target uniformly
+    """
+    return lambda rand, _: round(rand.uniform(low, high), 2)
+
+
+def idle_usage(idle_ratio=0.9, idle_value=0.01, busy_low=1.0, busy_high=50.0):
+    """
+    Usage distribution where most of the targets are idle
+    :param idle_ratio: probability for a target to be idle
+    """
+    def draw(rand, _):
+        if rand.random() < idle_ratio:
+            return idle_value
+        return round(rand.uniform(busy_low, busy_high), 2)
+    return draw
+
+
+def pareto_usage(alpha=1.16, scale=0.1, high=100.0):
+    """
+    Usage distribution where a few targets use most of the cpu
+    """
+    return lambda rand, _: round(min(high, scale * rand.paretovariate(alpha)), 2)
+
+
+class VirtualWattsTimeline:
+    """
+    Parameterized timeline of power and procfs reports
+
+    Reports are generated lazily, in the json format of the sensors, so
+    timelines of millions of reports can be streamed without being stored.
+    Each sensor use its own random generator : the power and procfs streams
+    are reproducible and independent from each other.
+    """
+
+    def __init__(self, targets=4, duration=20.0, interval=500, skew=0,
+                 jitter=0, drop_rate=0, usage=None, untracked_usage=1.0,
+                 power=42, sensor="formula_group", seed=0,
+                 start=datetime.datetime(2021, 9, 14, 12, 37, 37)):
+        """
+        :param targets: number of targets or list of target names
+        :param duration: duration of the timeline (in seconds)
+        :param interval: sampling interval of the sensors (in milliseconds)
+        :param skew: offset of the procfs sensor clock (in milliseconds)
+        :param jitter: maximal random shift of a timestamp (in milliseconds)
+        :param drop_rate: probability for a sample to be dropped
+        :param usage: usage distribution, function that take the random
+                      generator and the target name and return its usage
+                      (default : uniform between 0 and 10)
+        :param untracked_usage: cpu usage of the processes that are not
+                                targets
+        :param power: power of the VM, or function that take the random
+                      generator and the tick index and return the power
+        :param sensor: sensor name of the reports
+        :param seed: seed of the random generators
+        :param start: timestamp of the first tick
+        """
+        if isinstance(targets, int):
+            targets = ["cgroup_" + str(i) for i in range(targets)]
+        self.targets = list(targets)
+        self.ticks = int(round(duration * 1000 / interval))
+        self.interval = interval
+        self.skew = skew
+        self.jitter = jitter
+        self.drop_rate = drop_rate
+        self.usage = usage if usage is not None else uniform_usage()
+        self.untracked_usage = untracked_usage
+        self.power = power
+        self.sensor = sensor
+        self.seed = seed
+        self.start = start
+
+    def _timestamps(self, rand, offset):
+        for tick in range(self.ticks):
+            dropped = rand.random() < self.drop_rate
+            shift = rand.uniform(-self.jitter, self.jitter) if self.jitter else 0
+            if not dropped:
+                yield tick, self.start + datetime.timedelta(
+                    milliseconds=self.interval * tick + offset + shift)
+
+    def power_reports(self):
+        """
+        :return: iterator on the power reports
+        """
+        rand = random.Random(self.seed)
+        for tick, timestamp in self._timestamps(rand, 0):
+            power = self.power(rand, tick) if callable(self.power) else self.power
+            yield {
+                "timestamp": timestamp.strftime(TIMESTAMP_FORMAT),
+                "sensor": self.sensor,
+                "target": "all",
+                "power": power,
+            }
+
+    def procfs_reports(self):
+        """
+        :return: iterator on the procfs reports
+        """
+        rand = random.Random(self.seed + 1)
+        for _, timestamp in self._timestamps(rand, self.skew):
+            usage = {target: self.usage(rand, target)
+                     for target in self.targets}
+            yield {
+                "timestamp": timestamp.strftime(TIMESTAMP_FORMAT),
+                "sensor": self.sensor,
+                "target": self.targets,
+                "usage": usage,
+                "global_cpu_usage": sum(usage.values()) + self.untracked_usage,
+            }
+
+    def reports(self):
+        """
+        :return: iterator on the power and procfs reports, sorted by timestamp
+        """
+        return heapq.merge(self.power_reports(), self.procfs_reports(),
+                           key=lambda report: report["timestamp"])
+
+
+def write_json_lines(filename, reports):
+    """
+    Write the reports in a file, one json document per line
+    :return: number of written reports
+    """
+    count = 0
+    with open(filename, "w") as file_obj:
+        for report in reports:
+            file_obj.write(json.dumps(report) + "\n")
+            count += 1
+    return count
+
+
+def send_json_stream(port, reports, host="127.0.0.1"):
+    """
+    Send the reports, as fast as possible, to a socket puller
+    :return: number of sent reports
+    """
+    count = 0
+    with socket.create_connection((host, port)) as sock:
+        for report in reports:
+            sock.sendall(bytes(json.dumps(report) + "\n", "utf-8"))
+            count += 1
+    return count
+
+
+FIXTURE_USAGE = {
+    "firefox_cgroup": 8.36,
+    "emacs_cgroup": 5.52,
+    "zsh_cgroup": 0.01,
+    "mongo_cgroup": 0.64,
+}
+
+
+#: Reports recorded on a VM running the four cgroups of FIXTURE_USAGE : the
+#: timestamp shared by the power and procfs reports, the usage of
+#: firefox_cgroup and the global cpu usage of the VM
+FIXTURE_SAMPLES = [
+    ("2021-09-14T12:37:37.168817", 8.36, 27.610000000000014),
+    ("2021-09-14T12:37:37.669237", 8.36, 27.600000000000012),
+    ("2021-09-14T12:37:38.170142", 8.36, 27.600000000000012),
+    ("2021-09-14T12:37:38.670338", 8.36, 27.600000000000012),
+    ("2021-09-14T12:37:39.171321", 8.36, 27.600000000000012),
+    ("2021-09-14T12:37:39.671572", 8.36, 27.610000000000014),
+    ("2021-09-14T12:37:40.172503", 8.36, 27.600000000000012),
+    ("2021-09-14T12:37:40.672693", 8.36, 27.610000000000014),
+    ("2021-09-14T12:37:41.173552", 8.36, 27.600000000000012),
+    ("2021-09-14T12:37:41.673815", 8.36, 27.600000000000012),
+    ("2021-09-14T12:37:42.174560", 8.36, 27.600000000000012),
+    ("2021-09-14T12:37:42.674690", 8.36, 27.600000000000012),
+    ("2021-09-14T12:37:43.175441", 8.36, 27.600000000000012),
+    ("2021-09-14T12:37:43.675743", 8.36, 27.600000000000012),
+    ("2021-09-14T12:37:44.176551", 8.36, 27.600000000000012),
+    ("2021-09-14T12:37:44.677307", 8.36, 27.610000000000014),
+    ("2021-09-14T12:37:45.178049", 8.36, 27.610000000000014),
+    ("2021-09-14T12:37:45.678310", 8.36, 27.610000000000014),
+    ("2021-09-14T12:37:46.179120", 8.36, 27.600000000000012),
+    ("2021-09-14T12:37:46.679308", 8.36, 27.610000000000014),
+    ("2021-09-14T12:37:47.180223", 8.36, 27.610000000000014),
+    ("2021-09-14T12:37:47.680468", 8.36, 27.610000000000014),
+    ("2021-09-14T12:37:48.181316", 8.36, 27.610000000000014),
+    ("2021-09-14T12:37:48.681683", 8.36, 27.600000000000012),
+    ("2021-09-14T12:37:49.182522", 8.36, 27.600000000000012),
+    ("2021-09-14T12:37:49.682731", 8.36, 27.610000000000014),
+    ("2021-09-14T12:37:50.183680", 8.36, 27.610000000000014),
+    ("2021-09-14T12:37:50.683812", 8.36, 27.610000000000014),
+    ("2021-09-14T12:37:51.184792", 8.36, 27.610000000000014),
+    ("2021-09-14T12:37:51.685027", 8.36, 27.610000000000014),
+    ("2021-09-14T12:37:52.185709", 8.36, 27.610000000000014),
+    ("2021-09-14T12:37:52.686065", 8.36, 27.610000000000014),
+    ("2021-09-14T12:37:53.186929", 8.36, 27.600000000000012),
+    ("2021-09-14T12:37:53.687190", 8.35, 27.600000000000012),
+    ("2021-09-14T12:37:54.188031", 8.35, 27.600000000000012),
+    ("2021-09-14T12:37:54.688674", 8.35, 27.59000000000001),
+    ("2021-09-14T12:37:55.189489", 8.35, 27.59000000000001),
+    ("2021-09-14T12:37:55.690299", 8.35, 27.59000000000001),
+    ("2021-09-14T12:37:56.191124", 8.35, 27.59000000000001),
+]
+
+
+def fixture_timeline():
+    """
+    Generated timeline close to the recorded fixtures : four cgroups with a
+    constant usage and a VM that consume 42 W, sampled every 500 ms during
+    19.5 s, without the jitter of the recorded timestamps
+    """
+    return VirtualWattsTimeline(
+        targets=list(FIXTURE_USAGE), duration=19.5, interval=500,
+        usage=constant_usage(FIXTURE_USAGE), untracked_usage=13.07,
+        power=42, start=datetime.datetime(2021, 9, 14, 12, 37, 37, 168817))
+
+
 @pytest.fixture
 def virtualwatts_procfs_timeline():
     """
     Timeline of procfs report for the tests
     """
-
-    return [
-        {
-            "timestamp": "2021-09-14T12:37:37.168817",
-            "sensor": "formula_group",
-            "target": ["firefox_cgroup", "emacs_cgroup",
-                       "zsh_cgroup", "mongo_cgroup"],
-            "usage": {
-                "firefox_cgroup": 8.36,
-                "emacs_cgroup": 5.52,
-                "zsh_cgroup": 0.01,
-                "mongo_cgroup": 0.64,
-            },
-            "global_cpu_usage": 27.610000000000014,
-        },
-        {
-            "timestamp": "2021-09-14T12:37:37.669237",
-            "sensor": "formula_group",
-            "target": ["firefox_cgroup", "emacs_cgroup",
-                       "zsh_cgroup", "mongo_cgroup"],
-            "usage": {
-                "firefox_cgroup": 8.36,
-                "emacs_cgroup": 5.52,
-                "zsh_cgroup": 0.01,
-                "mongo_cgroup": 0.64,
-            },
-            "global_cpu_usage": 27.600000000000012,
-        },
-        {
-            "timestamp": "2021-09-14T12:37:38.170142",
-            "sensor": "formula_group",
-            "target": ["firefox_cgroup", "emacs_cgroup",
-                       "zsh_cgroup", "mongo_cgroup"],
-            "usage": {
-                "firefox_cgroup": 8.36,
-                "emacs_cgroup": 5.52,
-                "zsh_cgroup": 0.01,
-                "mongo_cgroup": 0.64,
-            },
-            "global_cpu_usage": 27.600000000000012,
-        },
-        {
-            "timestamp": "2021-09-14T12:37:38.670338",
-            "sensor": "formula_group",
-            "target": ["firefox_cgroup", "emacs_cgroup",
-                       "zsh_cgroup", "mongo_cgroup"],
-            "usage": {
-                "firefox_cgroup": 8.36,
-                "emacs_cgroup": 5.52,
-                "zsh_cgroup": 0.01,
-                "mongo_cgroup": 0.64,
-            },
-            "global_cpu_usage": 27.600000000000012,
-        },
-        {
-            "timestamp": "2021-09-14T12:37:39.171321",
-            "sensor": "formula_group",
-            "target": ["firefox_cgroup", "emacs_cgroup",
-                       "zsh_cgroup", "mongo_cgroup"],
-            "usage": {
-                "firefox_cgroup": 8.36,
-                "emacs_cgroup": 5.52,
-                "zsh_cgroup": 0.01,
-                "mongo_cgroup": 0.64,
-            },
-            "global_cpu_usage": 27.600000000000012,
-        },
-        {
-            "timestamp": "2021-09-14T12:37:39.671572",
-            "sensor": "formula_group",
-            "target": ["firefox_cgroup", "emacs_cgroup",
-                       "zsh_cgroup", "mongo_cgroup"],
-            "usage": {
-                "firefox_cgroup": 8.36,
-                "emacs_cgroup": 5.52,
-                "zsh_cgroup": 0.01,
-                "mongo_cgroup": 0.64,
-            },
-            "global_cpu_usage": 27.610000000000014,
-        },
-        {
-            "timestamp": "2021-09-14T12:37:40.172503",
-            "sensor": "formula_group",
-            "target": ["firefox_cgroup", "emacs_cgroup",
-                       "zsh_cgroup", "mongo_cgroup"],
-            "usage": {
-                "firefox_cgroup": 8.36,
-                "emacs_cgroup": 5.52,
-                "zsh_cgroup": 0.01,
-                "mongo_cgroup": 0.64,
-            },
-            "global_cpu_usage": 27.600000000000012,
-        },
-        {
-            "timestamp": "2021-09-14T12:37:40.672693",
-            "sensor": "formula_group",
-            "target": ["firefox_cgroup", "emacs_cgroup",
-                       "zsh_cgroup", "mongo_cgroup"],
-            "usage": {
-                "firefox_cgroup": 8.36,
-                "emacs_cgroup": 5.52,
-                "zsh_cgroup": 0.01,
-                "mongo_cgroup": 0.64,
-            },
-            "global_cpu_usage": 27.610000000000014,
-        },
-        {
-            "timestamp": "2021-09-14T12:37:41.173552",
-            "sensor": "formula_group",
-            "target": ["firefox_cgroup", "emacs_cgroup",
-                       "zsh_cgroup", "mongo_cgroup"],
-            "usage": {
-                "firefox_cgroup": 8.36,
-                "emacs_cgroup": 5.52,
-                "zsh_cgroup": 0.01,
-                "mongo_cgroup": 0.64,
-            },
-            "global_cpu_usage": 27.600000000000012,
-        },
-        {
-            "timestamp": "2021-09-14T12:37:41.673815",
-            "sensor": "formula_group",
-            "target": ["firefox_cgroup", "emacs_cgroup",
-                       "zsh_cgroup", "mongo_cgroup"],
-            "usage": {
-                "firefox_cgroup": 8.36,
-                "emacs_cgroup": 5.52,
-                "zsh_cgroup": 0.01,
-                "mongo_cgroup": 0.64,
-            },
-            "global_cpu_usage": 27.600000000000012,
-        },
-        {
-            "timestamp": "2021-09-14T12:37:42.174560",
-            "sensor": "formula_group",
-            "target": ["firefox_cgroup", "emacs_cgroup",
-                       "zsh_cgroup", "mongo_cgroup"],
-            "usage": {
-                "firefox_cgroup": 8.36,
-                "emacs_cgroup": 5.52,
-                "zsh_cgroup": 0.01,
-                "mongo_cgroup": 0.64,
-            },
-            "global_cpu_usage": 27.600000000000012,
-        },
-        {
-            "timestamp": "2021-09-14T12:37:42.674690",
-            "sensor": "formula_group",
-            "target": ["firefox_cgroup", "emacs_cgroup",
-                       "zsh_cgroup", "mongo_cgroup"],
-            "usage": {
-                "firefox_cgroup": 8.36,
-                "emacs_cgroup": 5.52,
-                "zsh_cgroup": 0.01,
-                "mongo_cgroup": 0.64,
-            },
-            "global_cpu_usage": 27.600000000000012,
-        },
-        {
-            "timestamp": "2021-09-14T12:37:43.175441",
-            "sensor": "formula_group",
-            "target": ["firefox_cgroup", "emacs_cgroup",
-                       "zsh_cgroup", "mongo_cgroup"],
-            "usage": {
-                "firefox_cgroup": 8.36,
-                "emacs_cgroup": 5.52,
-                "zsh_cgroup": 0.01,
-                "mongo_cgroup": 0.64,
-            },
-            "global_cpu_usage": 27.600000000000012,
-        },
-        {
-            "timestamp": "2021-09-14T12:37:43.675743",
-            "sensor": "formula_group",
-            "target": ["firefox_cgroup", "emacs_cgroup",
-                       "zsh_cgroup", "mongo_cgroup"],
-            "usage": {
-                "firefox_cgroup": 8.36,
-                "emacs_cgroup": 5.52,
-                "zsh_cgroup": 0.01,
-                "mongo_cgroup": 0.64,
-            },
-            "global_cpu_usage": 27.600000000000012,
-        },
-        {
-            "timestamp": "2021-09-14T12:37:44.176551",
-            "sensor": "formula_group",
-            "target": ["firefox_cgroup", "emacs_cgroup",
-                       "zsh_cgroup", "mongo_cgroup"],
-            "usage": {
-                "firefox_cgroup": 8.36,
-                "emacs_cgroup": 5.52,
-                "zsh_cgroup": 0.01,
-                "mongo_cgroup": 0.64,
-            },
-            "global_cpu_usage": 27.600000000000012,
-        },
-        {
-            "timestamp": "2021-09-14T12:37:44.677307",
-            "sensor": "formula_group",
-            "target": ["firefox_cgroup", "emacs_cgroup",
-                       "zsh_cgroup", "mongo_cgroup"],
-            "usage": {
-                "firefox_cgroup": 8.36,
-                "emacs_cgroup": 5.52,
-                "zsh_cgroup": 0.01,
-                "mongo_cgroup": 0.64,
-            },
-            "global_cpu_usage": 27.610000000000014,
-        },
-        {
-            "timestamp": "2021-09-14T12:37:45.178049",
-            "sensor": "formula_group",
-            "target": ["firefox_cgroup", "emacs_cgroup",
-                       "zsh_cgroup", "mongo_cgroup"],
-            "usage": {
-                "firefox_cgroup": 8.36,
-                "emacs_cgroup": 5.52,
-                "zsh_cgroup": 0.01,
-                "mongo_cgroup": 0.64,
-            },
-            "global_cpu_usage": 27.610000000000014,
-        },
-        {
-            "timestamp": "2021-09-14T12:37:45.678310",
-            "sensor": "formula_group",
-            "target": ["firefox_cgroup", "emacs_cgroup",
-                       "zsh_cgroup", "mongo_cgroup"],
-            "usage": {
-                "firefox_cgroup": 8.36,
-                "emacs_cgroup": 5.52,
-                "zsh_cgroup": 0.01,
-                "mongo_cgroup": 0.64,
-            },
-            "global_cpu_usage": 27.610000000000014,
-        },
-        {
-            "timestamp": "2021-09-14T12:37:46.179120",
-            "sensor": "formula_group",
-            "target": ["firefox_cgroup", "emacs_cgroup",
-                       "zsh_cgroup", "mongo_cgroup"],
-            "usage": {
-                "firefox_cgroup": 8.36,
-                "emacs_cgroup": 5.52,
-                "zsh_cgroup": 0.01,
-                "mongo_cgroup": 0.64,
-            },
-            "global_cpu_usage": 27.600000000000012,
-        },
-        {
-            "timestamp": "2021-09-14T12:37:46.679308",
-            "sensor": "formula_group",
-            "target": ["firefox_cgroup", "emacs_cgroup",
-                       "zsh_cgroup", "mongo_cgroup"],
-            "usage": {
-                "firefox_cgroup": 8.36,
-                "emacs_cgroup": 5.52,
-                "zsh_cgroup": 0.01,
-                "mongo_cgroup": 0.64,
-            },
-            "global_cpu_usage": 27.610000000000014,
-        },
-        {
-            "timestamp": "2021-09-14T12:37:47.180223",
-            "sensor": "formula_group",
-            "target": ["firefox_cgroup", "emacs_cgroup",
-                       "zsh_cgroup", "mongo_cgroup"],
-            "usage": {
-                "firefox_cgroup": 8.36,
-                "emacs_cgroup": 5.52,
-                "zsh_cgroup": 0.01,
-                "mongo_cgroup": 0.64,
-            },
-            "global_cpu_usage": 27.610000000000014,
-        },
-        {
-            "timestamp": "2021-09-14T12:37:47.680468",
-            "sensor": "formula_group",
-            "target": ["firefox_cgroup", "emacs_cgroup",
-                       "zsh_cgroup", "mongo_cgroup"],
-            "usage": {
-                "firefox_cgroup": 8.36,
-                "emacs_cgroup": 5.52,
-                "zsh_cgroup": 0.01,
-                "mongo_cgroup": 0.64,
-            },
-            "global_cpu_usage": 27.610000000000014,
-        },
-        {
-            "timestamp": "2021-09-14T12:37:48.181316",
-            "sensor": "formula_group",
-            "target": ["firefox_cgroup", "emacs_cgroup",
-                       "zsh_cgroup", "mongo_cgroup"],
-            "usage": {
-                "firefox_cgroup": 8.36,
-                "emacs_cgroup": 5.52,
-                "zsh_cgroup": 0.01,
-                "mongo_cgroup": 0.64,
-            },
-            "global_cpu_usage": 27.610000000000014,
-        },
-        {
-            "timestamp": "2021-09-14T12:37:48.681683",
-            "sensor": "formula_group",
-            "target": ["firefox_cgroup", "emacs_cgroup",
-                       "zsh_cgroup", "mongo_cgroup"],
-            "usage": {
-                "firefox_cgroup": 8.36,
-                "emacs_cgroup": 5.52,
-                "zsh_cgroup": 0.01,
-                "mongo_cgroup": 0.64,
-            },
-            "global_cpu_usage": 27.600000000000012,
-        },
-        {
-            "timestamp": "2021-09-14T12:37:49.182522",
-            "sensor": "formula_group",
-            "target": ["firefox_cgroup", "emacs_cgroup",
-                       "zsh_cgroup", "mongo_cgroup"],
-            "usage": {
-                "firefox_cgroup": 8.36,
-                "emacs_cgroup": 5.52,
-                "zsh_cgroup": 0.01,
-                "mongo_cgroup": 0.64,
-            },
-            "global_cpu_usage": 27.600000000000012,
-        },
-        {
-            "timestamp": "2021-09-14T12:37:49.682731",
-            "sensor": "formula_group",
-            "target": ["firefox_cgroup", "emacs_cgroup",
-                       "zsh_cgroup", "mongo_cgroup"],
-            "usage": {
-                "firefox_cgroup": 8.36,
-                "emacs_cgroup": 5.52,
-                "zsh_cgroup": 0.01,
-                "mongo_cgroup": 0.64,
-            },
-            "global_cpu_usage": 27.610000000000014,
-        },
-        {
-            "timestamp": "2021-09-14T12:37:50.183680",
-            "sensor": "formula_group",
-            "target": ["firefox_cgroup", "emacs_cgroup",
-                       "zsh_cgroup", "mongo_cgroup"],
-            "usage": {
-                "firefox_cgroup": 8.36,
-                "emacs_cgroup": 5.52,
-                "zsh_cgroup": 0.01,
-                "mongo_cgroup": 0.64,
-            },
-            "global_cpu_usage": 27.610000000000014,
-        },
-        {
-            "timestamp": "2021-09-14T12:37:50.683812",
-            "sensor": "formula_group",
-            "target": ["firefox_cgroup", "emacs_cgroup",
-                       "zsh_cgroup", "mongo_cgroup"],
-            "usage": {
-                "firefox_cgroup": 8.36,
-                "emacs_cgroup": 5.52,
-                "zsh_cgroup": 0.01,
-                "mongo_cgroup": 0.64,
-            },
-            "global_cpu_usage": 27.610000000000014,
-        },
-        {
-            "timestamp": "2021-09-14T12:37:51.184792",
-            "sensor": "formula_group",
-            "target": ["firefox_cgroup", "emacs_cgroup",
-                       "zsh_cgroup", "mongo_cgroup"],
-            "usage": {
-                "firefox_cgroup": 8.36,
-                "emacs_cgroup": 5.52,
-                "zsh_cgroup": 0.01,
-                "mongo_cgroup": 0.64,
-            },
-            "global_cpu_usage": 27.610000000000014,
-        },
-        {
-            "timestamp": "2021-09-14T12:37:51.685027",
-            "sensor": "formula_group",
-            "target": ["firefox_cgroup", "emacs_cgroup",
-                       "zsh_cgroup", "mongo_cgroup"],
-            "usage": {
-                "firefox_cgroup": 8.36,
-                "emacs_cgroup": 5.52,
-                "zsh_cgroup": 0.01,
-                "mongo_cgroup": 0.64,
-            },
-            "global_cpu_usage": 27.610000000000014,
-        },
-        {
-            "timestamp": "2021-09-14T12:37:52.185709",
-            "sensor": "formula_group",
-            "target": ["firefox_cgroup", "emacs_cgroup",
-                       "zsh_cgroup", "mongo_cgroup"],
-            "usage": {
-                "firefox_cgroup": 8.36,
-                "emacs_cgroup": 5.52,
-                "zsh_cgroup": 0.01,
-                "mongo_cgroup": 0.64,
-            },
-            "global_cpu_usage": 27.610000000000014,
-        },
-        {
-            "timestamp": "2021-09-14T12:37:52.686065",
-            "sensor": "formula_group",
-            "target": ["firefox_cgroup", "emacs_cgroup",
-                       "zsh_cgroup", "mongo_cgroup"],
-            "usage": {
-                "firefox_cgroup": 8.36,
-                "emacs_cgroup": 5.52,
-                "zsh_cgroup": 0.01,
-                "mongo_cgroup": 0.64,
-            },
-            "global_cpu_usage": 27.610000000000014,
-        },
-        {
-            "timestamp": "2021-09-14T12:37:53.186929",
-            "sensor": "formula_group",
-            "target": ["firefox_cgroup", "emacs_cgroup",
-                       "zsh_cgroup", "mongo_cgroup"],
-            "usage": {
-                "firefox_cgroup": 8.36,
-                "emacs_cgroup": 5.52,
-                "zsh_cgroup": 0.01,
-                "mongo_cgroup": 0.64,
-            },
-            "global_cpu_usage": 27.600000000000012,
-        },
-        {
-            "timestamp": "2021-09-14T12:37:53.687190",
-            "sensor": "formula_group",
-            "target": ["firefox_cgroup", "emacs_cgroup",
-                       "zsh_cgroup", "mongo_cgroup"],
-            "usage": {
-                "firefox_cgroup": 8.35,
-                "emacs_cgroup": 5.52,
-                "zsh_cgroup": 0.01,
-                "mongo_cgroup": 0.64,
-            },
-            "global_cpu_usage": 27.600000000000012,
-        },
-        {
-            "timestamp": "2021-09-14T12:37:54.188031",
-            "sensor": "formula_group",
-            "target": ["firefox_cgroup", "emacs_cgroup",
-                       "zsh_cgroup", "mongo_cgroup"],
-            "usage": {
-                "firefox_cgroup": 8.35,
-                "emacs_cgroup": 5.52,
-                "zsh_cgroup": 0.01,
-                "mongo_cgroup": 0.64,
-            },
-            "global_cpu_usage": 27.600000000000012,
-        },
-        {
-            "timestamp": "2021-09-14T12:37:54.688674",
-            "sensor": "formula_group",
-            "target": ["firefox_cgroup", "emacs_cgroup",
-                       "zsh_cgroup", "mongo_cgroup"],
-            "usage": {
-                "firefox_cgroup": 8.35,
-                "emacs_cgroup": 5.52,
-                "zsh_cgroup": 0.01,
-                "mongo_cgroup": 0.64,
-            },
-            "global_cpu_usage": 27.59000000000001,
-        },
-        {
-            "timestamp": "2021-09-14T12:37:55.189489",
-            "sensor": "formula_group",
-            "target": ["firefox_cgroup", "emacs_cgroup",
-                       "zsh_cgroup", "mongo_cgroup"],
-            "usage": {
-                "firefox_cgroup": 8.35,
-                "emacs_cgroup": 5.52,
-                "zsh_cgroup": 0.01,
-                "mongo_cgroup": 0.64,
-            },
-            "global_cpu_usage": 27.59000000000001,
-        },
-        {
-            "timestamp": "2021-09-14T12:37:55.690299",
-            "sensor": "formula_group",
-            "target": ["firefox_cgroup", "emacs_cgroup",
-                       "zsh_cgroup", "mongo_cgroup"],
-            "usage": {
-                "firefox_cgroup": 8.35,
-                "emacs_cgroup": 5.52,
-                "zsh_cgroup": 0.01,
-                "mongo_cgroup": 0.64,
-            },
-            "global_cpu_usage": 27.59000000000001,
-        },
-        {
-            "timestamp": "2021-09-14T12:37:56.191124",
-            "sensor": "formula_group",
-            "target": ["firefox_cgroup", "emacs_cgroup",
-                       "zsh_cgroup", "mongo_cgroup"],
-            "usage": {
-                "firefox_cgroup": 8.35,
-                "emacs_cgroup": 5.52,
-                "zsh_cgroup": 0.01,
-                "mongo_cgroup": 0.64,
-            },
-            "global_cpu_usage": 27.59000000000001,
-        },
-    ]
+    return [{
+        "timestamp": timestamp,
+        "sensor": "formula_group",
+        "target": list(FIXTURE_USAGE),
+        "usage": dict(FIXTURE_USAGE, firefox_cgroup=firefox_usage),
+        "global_cpu_usage": global_cpu_usage,
+    } for timestamp, firefox_usage, global_cpu_usage in FIXTURE_SAMPLES]
 
 
 @pytest.fixture
 def virtualwatts_power_timeline():
     """
-    Timeline of procfs report for the tests
+    Timeline of power report for the tests
     """
-
-    return [
-        {
-            "timestamp": "2021-09-14T12:37:37.168817",
-            "sensor": "formula_group",
-            "target": "all",
-            "power": 42,
-        },
-        {
-            "timestamp": "2021-09-14T12:37:37.669237",
-            "sensor": "formula_group",
-            "target": "all",
-            "power": 42,
-        },
-        {
-            "timestamp": "2021-09-14T12:37:38.170142",
-            "sensor": "formula_group",
-            "target": "all",
-            "power": 42,
-        },
-        {
-            "timestamp": "2021-09-14T12:37:38.670338",
-            "sensor": "formula_group",
-            "target": "all",
-            "power": 42,
-        },
-        {
-            "timestamp": "2021-09-14T12:37:39.171321",
-            "sensor": "formula_group",
-            "target": "all",
-            "power": 42,
-        },
-        {
-            "timestamp": "2021-09-14T12:37:39.671572",
-            "sensor": "formula_group",
-            "target": "all",
-            "power": 42,
-        },
-        {
-            "timestamp": "2021-09-14T12:37:40.172503",
-            "sensor": "formula_group",
-            "target": "all",
-            "power": 42,
-        },
-        {
-            "timestamp": "2021-09-14T12:37:40.672693",
-            "sensor": "formula_group",
-            "target": "all",
-            "power": 42,
-        },
-        {
-            "timestamp": "2021-09-14T12:37:41.173552",
-            "sensor": "formula_group",
-            "target": "all",
-            "power": 42,
-        },
-        {
-            "timestamp": "2021-09-14T12:37:41.673815",
-            "sensor": "formula_group",
-            "target": "all",
-            "power": 42,
-        },
-        {
-            "timestamp": "2021-09-14T12:37:42.174560",
-            "sensor": "formula_group",
-            "target": "all",
-            "power": 42,
-        },
-        {
-            "timestamp": "2021-09-14T12:37:42.674690",
-            "sensor": "formula_group",
-            "target": "all",
-            "power": 42,
-        },
-        {
-            "timestamp": "2021-09-14T12:37:43.175441",
-            "sensor": "formula_group",
-            "target": "all",
-            "power": 42,
-        },
-        {
-            "timestamp": "2021-09-14T12:37:43.675743",
-            "sensor": "formula_group",
-            "target": "all",
-            "power": 42,
-        },
-        {
-            "timestamp": "2021-09-14T12:37:44.176551",
-            "sensor": "formula_group",
-            "target": "all",
-            "power": 42,
-        },
-        {
-            "timestamp": "2021-09-14T12:37:44.677307",
-            "sensor": "formula_group",
-            "target": "all",
-            "power": 42,
-        },
-        {
-            "timestamp": "2021-09-14T12:37:45.178049",
-            "sensor": "formula_group",
-            "target": "all",
-            "power": 42,
-        },
-        {
-            "timestamp": "2021-09-14T12:37:45.678310",
-            "sensor": "formula_group",
-            "target": "all",
-            "power": 42,
-        },
-        {
-            "timestamp": "2021-09-14T12:37:46.179120",
-            "sensor": "formula_group",
-            "target": "all",
-            "power": 42,
-        },
-        {
-            "timestamp": "2021-09-14T12:37:46.679308",
-            "sensor": "formula_group",
-            "target": "all",
-            "power": 42,
-        },
-        {
-            "timestamp": "2021-09-14T12:37:47.180223",
-            "sensor": "formula_group",
-            "target": "all",
-            "power": 42,
-        },
-        {
-            "timestamp": "2021-09-14T12:37:47.680468",
-            "sensor": "formula_group",
-            "target": "all",
-            "power": 42,
-        },
-        {
-            "timestamp": "2021-09-14T12:37:48.181316",
-            "sensor": "formula_group",
-            "target": "all",
-            "power": 42,
-        },
-        {
-            "timestamp": "2021-09-14T12:37:48.681683",
-            "sensor": "formula_group",
-            "target": "all",
-            "power": 42,
-        },
-        {
-            "timestamp": "2021-09-14T12:37:49.182522",
-            "sensor": "formula_group",
-            "target": "all",
-            "power": 42,
-        },
-        {
-            "timestamp": "2021-09-14T12:37:49.682731",
-            "sensor": "formula_group",
-            "target": "all",
-            "power": 42,
-        },
-        {
-            "timestamp": "2021-09-14T12:37:50.183680",
-            "sensor": "formula_group",
-            "target": "all",
-            "power": 42,
-        },
-        {
-            "timestamp": "2021-09-14T12:37:50.683812",
-            "sensor": "formula_group",
-            "target": "all",
-            "power": 42,
-        },
-        {
-            "timestamp": "2021-09-14T12:37:51.184792",
-            "sensor": "formula_group",
-            "target": "all",
-            "power": 42,
-        },
-        {
-            "timestamp": "2021-09-14T12:37:51.685027",
-            "sensor": "formula_group",
-            "target": "all",
-            "power": 42,
-        },
-        {
-            "timestamp": "2021-09-14T12:37:52.185709",
-            "sensor": "formula_group",
-            "target": "all",
-            "power": 42,
-        },
-        {
-            "timestamp": "2021-09-14T12:37:52.686065",
-            "sensor": "formula_group",
-            "target": "all",
-            "power": 42,
-        },
-        {
-            "timestamp": "2021-09-14T12:37:53.186929",
-            "sensor": "formula_group",
-            "target": "all",
-            "power": 42,
-        },
-        {
-            "timestamp": "2021-09-14T12:37:53.687190",
-            "sensor": "formula_group",
-            "target": "all",
-            "power": 42,
-        },
-        {
-            "timestamp": "2021-09-14T12:37:54.188031",
-            "sensor": "formula_group",
-            "target": "all",
-            "power": 42,
-        },
-        {
-            "timestamp": "2021-09-14T12:37:54.688674",
-            "sensor": "formula_group",
-            "target": "all",
-            "power": 42,
-        },
-        {
-            "timestamp": "2021-09-14T12:37:55.189489",
-            "sensor": "formula_group",
-            "target": "all",
-            "power": 42,
-        },
-        {
-            "timestamp": "2021-09-14T12:37:55.690299",
-            "sensor": "formula_group",
-            "target": "all",
-            "power": 42,
-        },
-        {
-            "timestamp": "2021-09-14T12:37:56.191124",
-            "sensor": "formula_group",
-            "target": "all",
-            "power": 42,
-        },
-
-    ]
+    return [{
+        "timestamp": timestamp,
+        "sensor": "formula_group",
+        "target": "all",
+        "power": 42,
+    } for timestamp, _, _ in FIXTURE_SAMPLES]
@@ -0,0 +1,277 @@
+# MIT License
+
+# Copyright (c) 2021 PowerAPI
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""
+Module that define the binary wire format the sensors can use to send their
+procfs reports through a socket, instead of json
+
+The stream is a sequence of frames. Each frame starts with a header
+(FRAME_HEADER : length of the frame after its header and frame type) :
+ - a TARGETS_FRAME adds names to the target dictionary of the connection :
+   the id of the first added name, the number of names, then each name as
+   its utf-8 length (uint16) followed by its bytes. Ids are given in order
+   and must extend the dictionary.
+ - a REPORT_FRAME holds a report (REPORT_HEADER : timestamp in microseconds
+   since the epoch, global cpu usage, number of targets with a usage, length
+   of the sensor name, number of names of the report target and whether the
+   target is a list of names or a single one), the sensor name, the ids
+   (uint32) of the target names, the ids of the targets with a usage then
+   their usage (float64).
+
+Every integer and float is little-endian. The dictionary is specific to the
+connection : a sensor sends each target name once, when it first sees it.
+"""
+
+import asyncio
+import logging
+import struct
+import sys
+from array import array
+from datetime import timedelta
+from typing import Dict, List
+
+from powerapi.database import DBError, SocketDB
+from powerapi.database.socket_db import IterSocketDB
+from powerapi.report import ProcfsReport
+
+from .aggregation import EPOCH
+
+FRAME_HEADER = struct.Struct('<IB')
+TARGETS_HEADER = struct.Struct('<II')
+REPORT_HEADER = struct.Struct('<qdIHH?')
+NAME_LENGTH = struct.Struct('<H')
+
+TARGETS_FRAME = 1
+REPORT_FRAME = 2
+
+#: Frames longer than this are rejected, to not buffer a corrupted stream
+MAX_FRAME_SIZE = 64 * 1024 * 1024
+#: Number of bytes read from the socket at once
+READ_SIZE = 65536
+
+MICROSECOND = timedelta(microseconds=1)
+
+
+class WireFormatError(DBError):
+    """
+    Error raised when a stream can't be decoded
+    """
+
+
+def _array_bytes(values: array) -> bytes:
+    if sys.byteorder != 'little':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _array_from(typecode: str, data) -> array:
+    values = array(typecode)
+    values.frombytes(data)
+    if sys.byteorder != 'little':
+        values.byteswap()
+    return values
+
+
+def _frame(frame_type: int, payload: bytes) -> bytes:
+    if len(payload) > MAX_FRAME_SIZE:
+        raise WireFormatError('frame of %d bytes is too long' % len(payload))
+    return FRAME_HEADER.pack(len(payload), frame_type) + payload
+
+
+class ProcfsFrameEncoder:
+    """
+    Encode the procfs reports of a connection into frames
+    """
+
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+
+    def encode(self, report: ProcfsReport) -> bytes:
+        """
+        :return: The frames of the report, preceded by a TARGETS_FRAME if
+                 some of its targets were not sent yet
+        """
+        ids = self.ids
+        target_list = not isinstance(report.target, str)
+        target_names = report.target if target_list else [report.target]
+        new_names = [name for name in dict.fromkeys(
+            [*target_names, *report.usage]) if name not in ids]
+        frames = b''
+        if new_names:
+            payload = [TARGETS_HEADER.pack(len(ids), len(new_names))]
+            for name in new_names:
+                ids[name] = len(ids)
+                encoded = name.encode()
+                payload.append(NAME_LENGTH.pack(len(encoded)))
+                payload.append(encoded)
+            frames = _frame(TARGETS_FRAME, b''.join(payload))
+
+        sensor = report.sensor.encode()
+        timestamp = (report.timestamp - EPOCH) // MICROSECOND
+        payload = b''.join((
+            REPORT_HEADER.pack(timestamp, report.global_cpu_usage,
+                               len(report.usage), len(sensor),
+                               len(target_names), target_list),
+            sensor,
+            _array_bytes(array('I', [ids[name] for name in target_names])),
+            _array_bytes(array('I', [ids[name] for name in report.usage])),
+            _array_bytes(array('d', report.usage.values()))))
+        return frames + _frame(REPORT_FRAME, payload)
+
+
+class ProcfsFrameDecoder:
+    """
+    Decode the procfs reports of a connection from the bytes read on it, that
+    can cut the frames anywhere
+    """
+
+    def __init__(self):
+        self.names: List[str] = []
+        self._buffer = bytearray()
+
+    def feed(self, data: bytes) -> List[ProcfsReport]:
+        """
+        :param data: Bytes read from the connection
+        :return: The reports of the frames completed by the data
+        :raise WireFormatError: If a frame is invalid. The stream can't be
+                                decoded any further
+        """
+        buffer = self._buffer
+        buffer.extend(data)
+        reports = []
+        position = 0
+        with memoryview(buffer) as view:
+            while len(buffer) - position >= FRAME_HEADER.size:
+                length, frame_type = FRAME_HEADER.unpack_from(view, position)
+                if length > MAX_FRAME_SIZE:
+                    raise WireFormatError('frame of %d bytes is too long' % length)
+                start = position + FRAME_HEADER.size
+                if len(buffer) - start < length:
+                    break
+                frame = view[start:start + length]
+                if frame_type == REPORT_FRAME:
+                    reports.append(self._decode_report(frame))
+                elif frame_type == TARGETS_FRAME:
+                    self._decode_targets(frame)
+                else:
+                    raise WireFormatError('unknown frame type %d' % frame_type)
+                frame.release()
+                position = start + length
+        del buffer[:position]
+        return reports
+
+    def _decode_targets(self, frame: memoryview):
+        try:
+            first, count = TARGETS_HEADER.unpack_from(frame)
+            if first != len(self.names):
+                raise WireFormatError('target id %d given while the dictionary has %d names' % (first, len(self.names)))
+            position = TARGETS_HEADER.size
+            for _ in range(count):
+                length, = NAME_LENGTH.unpack_from(frame, position)
+                position += NAME_LENGTH.size
+                if position + length > len(frame):
+                    raise WireFormatError('truncated target name')
+                self.names.append(str(frame[position:position + length], 'utf-8'))
+                position += length
+        except (struct.error, UnicodeDecodeError) as exn:
+            raise WireFormatError('invalid targets frame : ' + str(exn)) from exn
+
+    def _decode_report(self, frame: memoryview) -> ProcfsReport:
+        try:
+            timestamp, global_cpu_usage, count, sensor_length, target_count, target_list = \
+                REPORT_HEADER.unpack_from(frame)
+            position = REPORT_HEADER.size
+            sensor = str(frame[position:position + sensor_length], 'utf-8')
+            position += sensor_length
+            target_end = position + 4 * target_count
+            ids_end = target_end + 4 * count
+            if ids_end + 8 * count != len(frame) or not (target_list or target_count == 1):
+                raise WireFormatError('invalid report frame of %d bytes' % len(frame))
+            names = self.names
+            target = [names[target_id] for target_id in _array_from('I', frame[position:target_end])]
+            if not target_list:
+                target = target[0]
+            ids = _array_from('I', frame[target_end:ids_end])
+            usages = _array_from('d', frame[ids_end:])
+            usage = dict(zip([names[target_id] for target_id in ids], usages))
+            timestamp = EPOCH + timestamp * MICROSECOND
+        except (struct.error, UnicodeDecodeError, OverflowError) as exn:
+            raise WireFormatError('invalid report frame : ' + str(exn)) from exn
+        except IndexError as exn:
+            raise WireFormatError('unknown target id in report frame') from exn
+        return ProcfsReport(timestamp, sensor, target, usage, global_cpu_usage)
+
+
+async def iter_frames(stream_reader: asyncio.StreamReader):
+    """
+    :return: Asynchronous iterator over the procfs reports decoded from a
+             connection, until it is closed
+    :raise WireFormatError: If a frame is invalid. The connection can't be
+                            decoded any further
+    """
+    decoder = ProcfsFrameDecoder()
+    while True:
+        data = await stream_reader.read(READ_SIZE)
+        if not data:
+            return
+        for report in decoder.feed(data):
+            yield report
+
+
+class BinarySocketDB(SocketDB):
+    """
+    Socket input that receives procfs reports encoded with the binary wire
+    format
+    """
+
+    async def connect(self):
+        if self.report_type is not ProcfsReport:
+            raise DBError('binary socket input only handle ProcfsReport')
+        await SocketDB.connect(self)
+
+    def iter(self, stream_mode):
+        return IterBinarySocketDB(self.report_type, stream_mode, self.queue)
+
+    def _gen_server_callback(self):
+        async def callback(stream_reader, writer):
+            try:
+                async for report in iter_frames(stream_reader):
+                    await self.queue.put(report)
+            except WireFormatError as exn:
+                logging.warning('binary socket input : %s, connection closed',
+                                exn.msg)
+            finally:
+                writer.close()
+
+        return callback
+
+
+class IterBinarySocketDB(IterSocketDB):
+    """
+    Iterator over the reports decoded by a BinarySocketDB
+    """
+
+    async def __anext__(self):
+        try:
+            return await asyncio.wait_for(self.queue.get(), 2)
+        except asyncio.TimeoutError:
+            return None